@@ -1,112 +1,626 @@
 import os
 import json
-from typing import TypedDict, List, Annotated
+import sqlite3
+import time
+import asyncio
+import threading
+import functools
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TypedDict, List, Annotated, Optional
 from dotenv import load_dotenv
 
-# --- 0. SOTA OBSERVABILITY ---
-import phoenix as px
-from phoenix.otel import register
-
-# 1. Launch Dashboard
-session = px.launch_app()
-
-# 2. Connect Pipe
-register(
-    project_name="default",
-    endpoint="http://localhost:6006/v1/traces",
-    auto_instrument=True
-)
-print(f"🕵️  Trace Server Live at: {session.url}")
-
 # --- IMPORTS ---
+# The LLM client, tracer, checkpointer and compiled graph are built lazily by
+# ResurrectorEngine, so importing this module has no side effects
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langchain_core.messages import (
     HumanMessage, BaseMessage, ToolMessage, AIMessage, SystemMessage
 )
-from twilio.rest import Client
+from langchain_core.runnables import RunnableConfig
 
 # Custom Modules
-from sandbox import Sandbox
+from sandbox import Sandbox, ContainerPool
+from git_ops import GitManager
+from code_index import CodeIndex, CONTAINER_ROOT, format_frames
+from context_builder import ContextBuilder
 from observability import ResurrectorTracker
+from run_store import RunStore
+from logger import ThoughtLogger
+from compaction import compact_messages
+from llm_cache import LLMCache
+from pre_review import PreReview, parse_verdict
+from snapshots import WorkspaceSnapshots
+from fix_cache import FixCache, FIX_CACHE_PATH, failure_signature, apply_patch
+from impact_analysis import ImpactAnalyzer
+from tracing import setup_tracing
 
 # --- 1. INITIALIZE ---
 load_dotenv()
 tracker = ResurrectorTracker()
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    temperature=0,
-    max_retries=2,
-)
+# Retries happen in _invoke_llm so the tracker can count them
+LLM_MAX_RETRIES = 2
+LLM_MODEL = "gemini-2.0-flash"
+
+class ResurrectorEngine:
+    """
+    Owns the expensive parts of the agent (tracer, LLM client, run store,
+    checkpointer, compiled graph) and builds each one on first use. Worker
+    processes call warm_up() once and then reuse the compiled graph for every run.
+    `tracing` is "none", "file" or "phoenix" (default: RESURRECTOR_TRACING).
+    """
+
+    def __init__(self, tracing=None):
+        self.tracing = tracing
+        self._lock = threading.RLock()
+        self._tracing_ready = False
+        self._tracer = None
+        self._llm = None
+        self._llm_with_tools = None
+        self._run_store = None
+        self._logger = None
+        self._checkpointer = None
+        self._app = None
+        self._fix_cache = None
+
+    @property
+    def tracer(self):
+        """Sets up tracing once; the Phoenix session or tracer provider, or None."""
+        with self._lock:
+            if not self._tracing_ready:
+                self._tracer = setup_tracing(self.tracing)
+                self._tracing_ready = True
+            return self._tracer
+
+    def chat_model(self, temperature=0):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        self.tracer  # instrumentation has to be in place before the first client is built
+        return ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=temperature, max_retries=0)
+
+    @property
+    def llm(self):
+        with self._lock:
+            if self._llm is None:
+                self._llm = self.chat_model()
+            return self._llm
+
+    @property
+    def llm_with_tools(self):
+        with self._lock:
+            if self._llm_with_tools is None:
+                self._llm_with_tools = self.llm.bind_tools(tools)
+            return self._llm_with_tools
+
+    @property
+    def run_store(self):
+        # Structured run events and per-incident status, tailed by the dashboard
+        with self._lock:
+            if self._run_store is None:
+                self._run_store = RunStore()
+            return self._run_store
+
+    @property
+    def logger(self):
+        """Buffered structured log; records are mirrored into the run store."""
+        with self._lock:
+            if self._logger is None:
+                self._logger = ThoughtLogger(run_store=self.run_store)
+            return self._logger
+
+    @property
+    def checkpointer(self):
+        with self._lock:
+            if self._checkpointer is None:
+                self._checkpointer = _checkpointer()
+            return self._checkpointer
+
+    @property
+    def fix_cache(self):
+        # Approved patches by failure signature, replayed before the agent runs
+        with self._lock:
+            if self._fix_cache is None:
+                self._fix_cache = FixCache(os.getenv("RESURRECTOR_FIX_CACHE_PATH", FIX_CACHE_PATH))
+            return self._fix_cache
+
+    def compile(self, checkpointer=None):
+        """A compiled graph with the given checkpointer (e.g. an async one), with tracing set up."""
+        self.tracer  # instrumentation has to be in place before the first run
+        return workflow.compile(checkpointer=checkpointer)
+
+    @property
+    def app(self):
+        with self._lock:
+            if self._app is None:
+                self._app = self.compile(checkpointer=self.checkpointer)
+            return self._app
+
+    def warm_up(self, with_llm=False):
+        """Builds everything a run needs up front, e.g. in a process pool initializer."""
+        self.app
+        self.logger
+        if with_llm:
+            self.llm_with_tools
+        return self
+
+engine = ResurrectorEngine()
+
+def warm_up(with_llm=False):
+    """Process pool initializer: prebuilds the module's engine once per worker."""
+    engine.warm_up(with_llm=with_llm)
+
+# Module attributes that used to be built at import time, now served by the engine
+_ENGINE_ATTRIBUTES = {"llm": "llm", "llm_with_tools": "llm_with_tools", "app": "app", "checkpointer": "checkpointer", "run_store": "run_store", "session": "tracer"}
+
+def __getattr__(name):
+    if name in _ENGINE_ATTRIBUTES:
+        return getattr(engine, _ENGINE_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- 2. DEFINE STATE ---
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
     review_status: str
+    context_manifest: dict
+    workspace_snapshot: Optional[str]
+    baseline_snapshot: Optional[str]
 
 # --- 3. DEFINE TOOLS ---
-def run_command(command: str):
-    sandbox = Sandbox()
-    return sandbox.run_command(command)
+DEFAULT_WORKSPACE = "./agent_workspace"
+
+# One sandbox (and warm container pool) per workspace, shared by every tool call
+_sandboxes = {}
+_sandboxes_lock = threading.Lock()
+
+def get_sandbox(workspace_path=DEFAULT_WORKSPACE):
+    key = os.path.abspath(workspace_path)
+    with _sandboxes_lock:
+        if key not in _sandboxes:
+            _sandboxes[key] = Sandbox(key)
+        return _sandboxes[key]
+
+def release_sandbox(workspace_path):
+    key = os.path.abspath(workspace_path)
+    with _sandboxes_lock:
+        _sandboxes.pop(key, None)
+        _code_indexes.pop(key, None)
+    ContainerPool.shutdown(key)
+
+# Symbol/call-graph index per workspace, kept current as the agent edits files
+_code_indexes = {}
+
+def get_code_index(workspace_path=DEFAULT_WORKSPACE):
+    key = os.path.abspath(workspace_path)
+    with _sandboxes_lock:
+        if key not in _code_indexes:
+            _code_indexes[key] = CodeIndex(key)
+        return _code_indexes[key]
+
+def _workspace(config):
+    """The incident's workspace, passed through the graph config."""
+    return (config or {}).get("configurable", {}).get("workspace", DEFAULT_WORKSPACE)
+
+def _incident_id(config):
+    return (config or {}).get("configurable", {}).get("incident_id", "default")
+
+def _event(config, kind, message="", **fields):
+    """Queues a structured run record; the logger writes it to JSONL and the run store in the background."""
+    engine.logger.log_record(kind, message, incident_id=_incident_id(config), **fields)
+
+def _set_status(incident, status):
+    try:
+        # Queued records first, so the status change lands after them in the store
+        engine.logger.flush()
+        engine.run_store.set_status(incident["id"], status, workspace=os.path.abspath(incident["workspace"]))
+    except Exception as e:
+        print(f"⚠️ Run store error: {e}")
+
+def _model(config, role):
+    """The chat model for a node: a per-run override (e.g. replayed responses) or the default."""
+    models = (config or {}).get("configurable", {}).get("models") or {}
+    if role in models:
+        return models[role]
+    return engine.llm_with_tools if role == "reason" else engine.llm
+
+class RunGuard:
+    """
+    Cancellation flag and in-flight node count of one async run, passed as
+    configurable["guard"]. Cancelling the run's task does not stop a sync node
+    already running in an executor thread, so teardown cancels the guard (no
+    new node or tool call starts) and waits for the running ones first.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._active = 0
+        self._idle = threading.Condition()
+
+    @contextmanager
+    def node(self):
+        with self._idle:
+            if self.cancelled.is_set():
+                raise RuntimeError("Run cancelled")
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def wait_idle(self, timeout=None):
+        """True once no node is running (False if one still is after `timeout` seconds)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._active == 0, timeout)
+
+def _guard(config):
+    return (config or {}).get("configurable", {}).get("guard")
+
+def _cancelled(config):
+    guard = _guard(config)
+    return guard is not None and guard.cancelled.is_set()
+
+def _guarded(node):
+    """Runs a graph node inside its run's guard, if the run has one."""
+    @functools.wraps(node)
+    def run(state, config):
+        guard = _guard(config)
+        if guard is None:
+            return node(state, config)
+        with guard.node():
+            return node(state, config)
+    return run
+
+# Seconds teardown waits for a cancelled run's running nodes (an LLM call, a test run) to return
+DRAIN_TIMEOUT = 120
+
+async def _drain(guards):
+    """Cancels runs' guards and waits for their in-flight nodes, so their sandboxes and snapshots can go."""
+    for guard in guards:
+        guard.cancel()
+    for guard in guards:
+        if not await asyncio.to_thread(guard.wait_idle, DRAIN_TIMEOUT):
+            print(f"⚠️ A cancelled run still has a node running after {DRAIN_TIMEOUT}s")
+
+def _snapshot(workspace_path):
+    """Snapshot id of the workspace's files, stored with each checkpoint so a resume restores them."""
+    try:
+        return WorkspaceSnapshots(workspace_path).snapshot()
+    except Exception as e:
+        print(f"⚠️ Workspace snapshot failed: {e}")
+        return None
+
+def _restore_workspace(workspace_path, snapshot_id):
+    """Puts the workspace's files back to a snapshot and re-indexes the files that changed."""
+    snapshots = WorkspaceSnapshots(workspace_path)
+    current = snapshots.snapshot()
+    snapshots.restore(snapshot_id)
+    _reindex(workspace_path, current, snapshot_id)
+
+def _reindex(workspace_path, from_id, to_id):
+    """Re-indexes the .py files that differ between two snapshots of the workspace."""
+    index = get_code_index(workspace_path)
+    for path in WorkspaceSnapshots(workspace_path).changed_files(from_id, to_id):
+        if path.endswith(".py"):
+            index.refresh_file(path)
+
+# Verification runs the tests affected by the fix, picked by coverage and imports
+TEST_IMPACT_ENABLED = os.getenv("RESURRECTOR_TEST_IMPACT", "1") != "0"
+
+def _impact_analyzer(workspace_path, baseline_workspace=None):
+    return ImpactAnalyzer(
+        workspace_path, get_sandbox(workspace_path), get_code_index(workspace_path), baseline_workspace=baseline_workspace
+    )
+
+def _collect_test_baseline(workspace_path, snapshot_id):
+    """Per-test coverage of the unfixed workspace (stored per snapshot), for picking tests at review."""
+    if not (TEST_IMPACT_ENABLED and snapshot_id):
+        return
+    try:
+        _impact_analyzer(workspace_path).collect_baseline(snapshot_id)
+    except Exception as e:
+        print(f"⚠️ Test baseline failed: {e}")
+
+def _impacted_tests(state, config):
+    """Runs the tests affected by the changes since the baseline. None when there are none to run."""
+    baseline = state.get("baseline_snapshot")
+    if not (TEST_IMPACT_ENABLED and baseline):
+        return None
+    workspace = _workspace(config)
+    started = time.time()
+    try:
+        changed = WorkspaceSnapshots(workspace).changed_files(baseline, WorkspaceSnapshots(workspace).snapshot())
+        # Speculative candidates are branches at the baseline snapshot: the main workspace's coverage applies
+        baseline_workspace = (config or {}).get("configurable", {}).get("baseline_workspace")
+        result = _impact_analyzer(workspace, baseline_workspace).verify(changed, baseline)
+    except Exception as e:
+        print(f"⚠️ Impacted tests could not run: {e}")
+        return None
+    if result is None:
+        return None
+    tracker.record_call("review:tests", time.time() - started, _incident_id(config))
+    _event(
+        config, "tests", "passed" if result["passed"] else "failed", node="review", step=len(state["messages"]),
+        latency=result["duration"], strategy=result["strategy"], selected=result["selected"],
+        shards=result["shards"], failed=result["failed"]
+    )
+    return result
+
+def run_command(command: str, timeout: int = 60):
+    """Run a shell command in the workspace. Output is capped; the command is killed after `timeout` seconds."""
+    return get_sandbox().run_command(command, timeout=timeout)
 
 def edit_file(file_path: str, content: str):
-    sandbox = Sandbox()
-    return sandbox.edit_file(file_path, content)
+    """Replace the full contents of a workspace file."""
+    return get_sandbox().edit_file(file_path, content)
+
+def read_file(file_path: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+              offset: Optional[int] = None, length: Optional[int] = None):
+    """
+    Read a workspace file, optionally only lines start_line..end_line (1-based, inclusive),
+    or `length` bytes from byte `offset` (e.g. for minified files with very long lines).
+    """
+    return get_sandbox().read_file(file_path, start_line=start_line, end_line=end_line, offset=offset, length=length)
 
-def read_file(file_path: str):
-    sandbox = Sandbox()
-    return sandbox.read_file(file_path)
+def lookup_traceback(traceback: str):
+    """Given a Python traceback, return the source of each failing function in the workspace and where it is called from."""
+    return format_frames(get_code_index().lookup_traceback(traceback))
 
-tools = [run_command, edit_file, read_file]
-llm_with_tools = llm.bind_tools(tools)
+tools = [run_command, edit_file, read_file, lookup_traceback]
 
 # --- 4. DEFINE NODES ---
 
-def reason_node(state: AgentState):
+# Optional response cache: set RESURRECTOR_LLM_CACHE to a SQLite path, or pass
+# an LLMCache as configurable["llm_cache"] for a single run
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def _cache(config):
+    global _llm_cache
+    override = (config or {}).get("configurable", {}).get("llm_cache")
+    if override is not None:
+        return override or None
+    path = os.getenv("RESURRECTOR_LLM_CACHE")
+    if not path:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache(path)
+        return _llm_cache
+
+def _invoke_llm(model, messages, node, config):
+    """
+    Calls the model with retry/backoff, recording latency, tokens and retries per call.
+    Identical prompts are answered from the response cache when one is enabled.
+    """
+    started = time.time()
+    cache = _cache(config)
+    if cache:
+        key = cache.key(model, messages)
+        cached = cache.get(key)
+        tracker.record_cache(cached is not None)
+        if cached is not None:
+            tracker.record_call(f"{node}:cached", time.time() - started, _incident_id(config))
+            return cached
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = model.invoke(messages)
+        except Exception as e:
+            if attempt == LLM_MAX_RETRIES:
+                tracker.record_call(node, time.time() - started, _incident_id(config), retries=attempt, error=e)
+                raise
+            time.sleep(2 ** attempt)
+            continue
+        if cache:
+            cache.put(key, response)
+        input_tokens, output_tokens = tracker.track_usage(response)
+        tracker.record_call(
+            node, time.time() - started, _incident_id(config),
+            input_tokens=input_tokens, output_tokens=output_tokens, retries=attempt
+        )
+        return response
+
+def reason_node(state: AgentState, config: RunnableConfig):
     """The Junior Developer."""
     print("\n🧠 Junior Dev: Thinking...")
     try:
-        response = llm_with_tools.invoke(state["messages"])
+        messages, stats = compact_messages(state["messages"])
+        tracker.record_compaction(stats)
+        started = time.time()
+        response = _invoke_llm(_model(config, "reason"), messages, "reason", config)
+        usage = getattr(response, "usage_metadata", None) or {}
+        _event(
+            config, "reason", str(response.content)[:2000], node="reason", step=len(state["messages"]),
+            latency=round(time.time() - started, 3), input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"),
+            tool_calls=[c["name"] for c in response.tool_calls or []]
+        )
         return {"messages": [response]}
     except Exception as e:
         print(f"❌ LLM ERROR: {e}")
         return {"messages": [AIMessage(content="Error processing. Retrying.")]}
 
-def action_node(state: AgentState):
-    """The Hands."""
+# Seconds a file tool may take; run_command gets its own timeout plus this margin
+TOOL_TIMEOUT = 30
+MAX_PARALLEL_TOOLS = 8
+
+def _run_tool(sandbox, tool_call, config=None):
+    if _cancelled(config):
+        return "Tool Execution Error: run cancelled"
+    try:
+        if tool_call['name'] == "run_command":
+            return sandbox.run_command(**tool_call['args'])
+        elif tool_call['name'] == "edit_file":
+            res = sandbox.edit_file(**tool_call['args'])
+            # Right away, for a lookup_traceback later in this turn; action_node re-indexes the rest
+            if tool_call['args']['file_path'].endswith(".py"):
+                get_code_index(sandbox.workspace_path).refresh_file(tool_call['args']['file_path'])
+            return res
+        elif tool_call['name'] == "read_file":
+            return sandbox.read_file(**tool_call['args'])
+        elif tool_call['name'] == "lookup_traceback":
+            return format_frames(get_code_index(sandbox.workspace_path).lookup_traceback(**tool_call['args']))
+        else:
+            return "Error: Unknown tool."
+    except Exception as e:
+        return f"Tool Execution Error: {str(e)}"
+
+def _tool_footprint(tool_call):
+    """(mode, path) a tool call touches. A path of None means any file in the workspace."""
+    name, args = tool_call['name'], tool_call.get('args') or {}
+    if name == "lookup_traceback":
+        return "read", None
+    if name in ("read_file", "edit_file") and isinstance(args.get("file_path"), str):
+        path = args["file_path"]
+        if path.startswith("/app/"):
+            path = path[len("/app/"):]
+        return ("read" if name == "read_file" else "write"), os.path.normpath(path)
+    return "exec", None
+
+def _conflicts(a, b):
+    (mode_a, path_a), (mode_b, path_b) = a, b
+    if "exec" in (mode_a, mode_b):
+        return True
+    if "write" not in (mode_a, mode_b):
+        return False
+    return path_a is None or path_b is None or path_a == path_b
+
+def _is_tool_error(res):
+    return isinstance(res, str) and res.startswith(("❌", "🐳 Sandbox Error", "Tool Execution Error", "Error:"))
+
+def _tool_timeout(tool_call):
+    if tool_call['name'] == "run_command":
+        return (tool_call.get('args') or {}).get("timeout", Sandbox.DEFAULT_TIMEOUT) + TOOL_TIMEOUT
+    return TOOL_TIMEOUT
+
+def action_node(state: AgentState, config: RunnableConfig):
+    """
+    The Hands. Independent tool calls run concurrently; a call waits for every
+    earlier call it conflicts with (same file with a write, or any shell command).
+    """
+    sandbox = get_sandbox(_workspace(config))
     last_message = state["messages"][-1]
-    tool_results = []
-    
+
     if not last_message.tool_calls:
         return {"messages": []}
 
-    for tool_call in last_message.tool_calls:
-        print(f"🛠️  Tool Call: {tool_call['name']}")
+    calls = last_message.tool_calls
+    footprints = [_tool_footprint(call) for call in calls]
+    deps = [[j for j in range(i) if _conflicts(footprints[i], footprints[j])] for i in range(len(calls))]
+    finished = [threading.Event() for _ in calls]
+    started = [None] * len(calls)
+    results = [None] * len(calls)
+    # Calls given up on (timed out, or blocked by one) that may still be running
+    abandoned = set()
+
+    def worker(i):
         try:
-            if tool_call['name'] == "run_command":
-                res = run_command(**tool_call['args'])
-            elif tool_call['name'] == "edit_file":
-                res = edit_file(**tool_call['args'])
-            elif tool_call['name'] == "read_file":
-                res = read_file(**tool_call['args'])
-            else:
-                res = "Error: Unknown tool."
-        except Exception as e:
-            res = f"Tool Execution Error: {str(e)}"
-        
-        tool_results.append(ToolMessage(
-            tool_call_id=tool_call['id'],
-            name=tool_call['name'],
-            content=str(res)
-        ))
-    return {"messages": tool_results}
-
-def review_node(state: AgentState):
-    """The Critic (Principal Security Engineer)."""
+            for j in deps[i]:
+                finished[j].wait()
+            blocker = next((j for j in deps[i] if j in abandoned), None)
+            if blocker is not None:
+                # The timed-out call may still be running; a conflicting call must not overlap it
+                abandoned.add(i)
+                results[i] = f"Tool Execution Error: blocked by timed-out call {calls[blocker]['name']}"
+                return
+            print(f"🛠️  Tool Call: {calls[i]['name']}")
+            started[i] = time.monotonic()
+            results[i] = _run_tool(sandbox, calls[i], config)
+            error = results[i] if _is_tool_error(results[i]) else None
+            tracker.record_call(f"tool:{calls[i]['name']}", time.monotonic() - started[i], _incident_id(config), error=error)
+            _event(
+                config, "tool", calls[i]['name'], node="act", step=len(state["messages"]),
+                latency=round(time.monotonic() - started[i], 3), ok=error is None, output=str(results[i])[:500]
+            )
+        finally:
+            finished[i].set()
+
+    executor = ThreadPoolExecutor(max_workers=min(len(calls), MAX_PARALLEL_TOOLS))
+    futures = {executor.submit(worker, i): i for i in range(len(calls))}
+    pending = set(futures)
+    timed_out = {}
+    while pending:
+        _, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for future in list(pending):
+            i = futures[future]
+            if started[i] is not None and now - started[i] > _tool_timeout(calls[i]):
+                # Give up on the call; anything waiting on it fails as blocked instead of running
+                timed_out[i] = f"Tool Execution Error: timed out after {_tool_timeout(calls[i])}s"
+                abandoned.add(i)
+                tracker.record_call(f"tool:{calls[i]['name']}", now - started[i], _incident_id(config), error=timed_out[i])
+                _event(config, "tool", calls[i]['name'], node="act", step=len(state["messages"]), latency=round(now - started[i], 3), ok=False, output=timed_out[i])
+                pending.discard(future)
+                finished[i].set()
+    executor.shutdown(wait=False)
+
+    tool_results = [
+        ToolMessage(tool_call_id=call['id'], name=call['name'], content=str(res))
+        for call, res in zip(calls, [timed_out.get(i, r) for i, r in enumerate(results)])
+    ]
+    update = {"messages": tool_results}
+    # A cancelled run's workspace is about to be torn down; don't recreate its snapshot store
+    snapshot = None if _cancelled(config) else _snapshot(sandbox.workspace_path)
+    if snapshot:
+        update["workspace_snapshot"] = snapshot
+        # Shell commands change files too (sed -i, git checkout, generated code)
+        previous = state.get("workspace_snapshot")
+        if previous and previous != snapshot:
+            try:
+                _reindex(sandbox.workspace_path, previous, snapshot)
+            except Exception as e:
+                print(f"⚠️ Re-index failed: {e}")
+    return update
+
+def _rejection(state, config, feedback):
+    """
+    Sends the critic's feedback back to the Junior Dev. With rollback_on_reject
+    the next attempt starts from the original files instead of the rejected ones.
+    """
+    update = {"review_status": "rejected"}
+    baseline = state.get("baseline_snapshot")
+    if (config or {}).get("configurable", {}).get("rollback_on_reject") and baseline:
+        _restore_workspace(_workspace(config), baseline)
+        print(f"⏪ Workspace rolled back to {baseline[:12]}")
+        update["workspace_snapshot"] = baseline
+        feedback += "\nThe workspace has been reset to its original files; start the fix again from there."
+    update["messages"] = [HumanMessage(content=feedback)]
+    return update
+
+def review_node(state: AgentState, config: RunnableConfig):
+    """The Critic (Principal Security Engineer). Clear-cut cases are decided statically, without the LLM."""
     print("\n🛡️  Principal Security Engineer: Reviewing PR...")
-    
+
+    started = time.time()
+    script = (config or {}).get("configurable", {}).get("script")
+    verdict, reasons = PreReview(_workspace(config), verify_script=script).assess(state["messages"])
+    tracker.record_call("review:static", time.time() - started, _incident_id(config))
+
+    tests = _impacted_tests(state, config) if verdict != "reject" else None
+    if tests:
+        print(f"🧪 Impacted tests: {tests['tests']} in {tests['shards']} shard(s), {'passed' if tests['passed'] else 'FAILED'} ({tests['duration']}s)")
+    if tests and not tests["passed"]:
+        print("⚖️  Verdict: REJECTED (impacted tests)")
+        _event(config, "review", "rejected", node="review", step=len(state["messages"]), source="tests", reasons=tests["failed"])
+        failing = "\n".join(f"- {t}" for t in tests["failed"])
+        return _rejection(state, config, f"Tests affected by your change fail:\n{failing}\n\n{tests['output']}\nPlease fix the code (not the tests) and run them again.")
+
+    if verdict == "approve":
+        print(f"⚖️  Verdict: APPROVED (static: {reasons[0]})")
+        _event(config, "review", "approved", node="review", step=len(state["messages"]), source="static", reasons=reasons)
+        return {"review_status": "approved"}
+    if verdict == "reject":
+        print("⚖️  Verdict: REJECTED (static)")
+        _event(config, "review", "rejected", node="review", step=len(state["messages"]), source="static", reasons=reasons)
+        findings = "\n".join(f"- {r}" for r in reasons)
+        return _rejection(state, config, f"Security Review Failed:\n{findings}\nPlease fix these and verify the fix by running the script.")
+
     critic_prompt = """
     You are a Principal Security Engineer reviewing a Junior Developer's fix.
     
@@ -118,20 +632,33 @@ def review_node(state: AgentState):
     If NO, respond "REJECT" and explain why.
     
     NOTE: If the Junior Dev says "I fixed it" and ran the script successfully, just APPROVE it. Don't be too strict.
+
+    Start your reply with the verdict word.
     """
-    
-    messages = state["messages"] + [HumanMessage(content=critic_prompt)]
-    response = llm.invoke(messages)
+    if reasons:
+        critic_prompt += "\nAutomated checks flagged:\n" + "\n".join(f"- {r}" for r in reasons)
+    if tests:
+        critic_prompt += f"\nThe {tests['tests']} test file(s) affected by the change pass"
+        if tests["preexisting"]:
+            critic_prompt += f" (apart from {len(tests['preexisting'])} test(s) that already failed before the fix)"
+        critic_prompt += "."
+
+    history, stats = compact_messages(state["messages"])
+    tracker.record_compaction(stats)
+    messages = history + [HumanMessage(content=critic_prompt)]
+    response = _invoke_llm(_model(config, "review"), messages, "review", config)
     content = response.content.strip()
     
-    status = "approved" if "APPROVE" in content.upper() else "rejected"
+    status = parse_verdict(content)
     print(f"⚖️  Verdict: {status.upper()}")
+    usage = getattr(response, "usage_metadata", None) or {}
+    _event(
+        config, "review", status, node="review", step=len(state["messages"]), source="llm", reasons=reasons,
+        input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"), response=content[:2000]
+    )
     
     if status == "rejected":
-        return {
-            "review_status": "rejected",
-            "messages": [HumanMessage(content=f"Security Review Failed: {content}. Please verify the fix by running the script.")]
-        }
+        return _rejection(state, config, f"Security Review Failed: {content}. Please verify the fix by running the script.")
     
     return {"review_status": "approved"}
 
@@ -147,6 +674,7 @@ def notify_success():
         return
 
     try:
+        from twilio.rest import Client
         client = Client(sid, token)
         client.calls.create(
             twiml='<Response><Say>Resurrector Alert. Pipeline fixed.</Say></Response>',
@@ -158,9 +686,9 @@ def notify_success():
 
 # --- 6. GRAPH SETUP ---
 workflow = StateGraph(AgentState)
-workflow.add_node("reason", reason_node)
-workflow.add_node("act", action_node)
-workflow.add_node("review", review_node)
+workflow.add_node("reason", _guarded(reason_node))
+workflow.add_node("act", _guarded(action_node))
+workflow.add_node("review", _guarded(review_node))
 
 workflow.set_entry_point("reason")
 
@@ -180,25 +708,511 @@ workflow.add_conditional_edges("reason", should_continue, {"act": "act", "review
 workflow.add_edge("act", "reason")
 workflow.add_conditional_edges("review", review_gate, {"reason": "reason", END: END})
 
-app = workflow.compile()
+# Every step is checkpointed per incident (thread_id = incident id), so a
+# crashed or preempted run can be resumed or forked from any step
+CHECKPOINT_DB = os.path.join(".resurrector_cache", "checkpoints.sqlite")
+
+def _checkpointer(path=CHECKPOINT_DB):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return SqliteSaver(conn)
+
 
 # --- 7. RUN ---
-def start_resurrection():
-    print("🚀 Starting Multi-Agent Security Run...")
-    initial_state = {
-        "messages": [
-            SystemMessage(content="You are a Junior DevOps Engineer. Fix the code. IMPORTANT: You must RUN the python script to verify your fix works before submitting."),
-            HumanMessage(content="The pipeline failed. Fix the Python script error.")
-        ],
-        "review_status": "pending"
+DEFAULT_TASK = "The pipeline failed. Fix the Python script error."
+CONTEXT_TOKEN_BUDGET = 4000
+
+# Start every attempt after a rejected review from the original files
+ROLLBACK_ON_REJECT = os.getenv("RESURRECTOR_ROLLBACK_ON_REJECT") == "1"
+
+def _failure_output(incident):
+    """The incident's traceback; if only a script is given, it is run once and its output kept."""
+    if not incident.get("traceback") and incident.get("script"):
+        code, output = get_sandbox(incident["workspace"]).run_script(incident["script"])
+        incident["traceback"] = output if code != 0 else ""
+    return incident.get("traceback") or ""
+
+def _build_context(incident):
+    """
+    Packs the code around the failure into the first prompt so the model
+    doesn't spend turns exploring. Reproduces the failure if only a script is given.
+    """
+    builder = ContextBuilder(get_code_index(incident["workspace"]), budget_tokens=CONTEXT_TOKEN_BUDGET)
+    context, manifest = builder.build(_failure_output(incident))
+    print(f"📦 Context: {len(manifest['items'])} items, {manifest['used_tokens']}/{manifest['budget_tokens']} tokens ({manifest['skipped']} skipped)")
+    return context, manifest
+
+def _initial_state(incident):
+    messages = [
+        SystemMessage(content="You are a Junior DevOps Engineer. Fix the code. IMPORTANT: You must RUN the python script to verify your fix works before submitting."),
+        HumanMessage(content=incident.get("prompt") or DEFAULT_TASK)
+    ]
+    manifest = {}
+    if incident.get("traceback") or incident.get("script"):
+        context, manifest = _build_context(incident)
+        messages.append(HumanMessage(content=f"Relevant code for this failure:\n\n{context}"))
+
+    baseline = _snapshot(incident["workspace"])
+    _collect_test_baseline(incident["workspace"], baseline)
+    return {
+        "messages": messages,
+        "review_status": "pending",
+        "context_manifest": manifest,
+        "workspace_snapshot": baseline,
+        "baseline_snapshot": baseline
     }
-    
+
+def _run_config(incident, checkpoint_id=None, guard=None):
     # Increased recursion limit to prevent crashes during long debug loops
-    app.invoke(initial_state, config={"recursion_limit": 50})
-    
+    config = {
+        "recursion_limit": 50,
+        "configurable": {
+            "thread_id": incident["id"],
+            "workspace": os.path.abspath(incident["workspace"]),
+            "incident_id": incident["id"],
+            "script": incident.get("script"),
+            "models": incident.get("models"),
+            "rollback_on_reject": ROLLBACK_ON_REJECT if incident.get("rollback_on_reject") is None else incident["rollback_on_reject"],
+            "baseline_workspace": incident.get("baseline_workspace"),
+        }
+    }
+    if checkpoint_id:
+        config["configurable"]["checkpoint_id"] = checkpoint_id
+    if guard is not None:
+        config["configurable"]["guard"] = guard
+    return config
+
+def _summarize(incident, status, started, final_state=None, error=None):
+    """The run's summary; its status is also recorded as the incident's final status in the run store."""
+    _set_status(incident, status)
+    messages = (final_state or {}).get("messages", [])
+    last_ai = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+    return {
+        "incident_id": incident["id"],
+        "workspace": incident["workspace"],
+        "status": status,
+        "review_status": (final_state or {}).get("review_status", "pending"),
+        "steps": len(messages),
+        "duration_seconds": round(time.time() - started, 2),
+        "final_message": str(last_ai.content)[:500] if last_ai else "",
+        "context_items": len((final_state or {}).get("context_manifest", {}).get("items", [])),
+        "error": error,
+    }
+
+# Recurring failures: a patch approved for the same failure signature is
+# applied and verified with the script before the agent is started
+FIX_CACHE_ENABLED = os.getenv("RESURRECTOR_FIX_CACHE", "1") != "0"
+
+def _apply_known_fix(incident):
+    """
+    Tries the cached patches for the incident's failure, most reliable first.
+    The first one after which the script exits cleanly is kept and its id
+    returned; the others are rolled back. Returns None on a miss.
+    """
+    enabled = FIX_CACHE_ENABLED if incident.get("fix_cache") is None else incident["fix_cache"]
+    if not (enabled and incident.get("script")):
+        return None
+    workspace = incident["workspace"]
+    started = time.time()
+    signature = failure_signature(_failure_output(incident), get_code_index(workspace))
+    incident["signature"] = signature
+    if signature is None:
+        return None
+
+    fixes = engine.fix_cache.lookup(signature)
+    baseline = _snapshot(workspace) if fixes else None
+    if not baseline:
+        print(f"🗃️  Fix cache miss ({signature['exception']})")
+        return None
+
+    for fix_id, patch in fixes:
+        applied, error = apply_patch(workspace, patch)
+        if applied:
+            code, _ = get_sandbox(workspace).run_script(incident["script"])
+            if code == 0:
+                engine.fix_cache.mark(fix_id, True)
+                _reindex(workspace, baseline, _snapshot(workspace))
+                tracker.record_call("fix_cache", time.time() - started, incident["id"])
+                print(f"🗃️  Fix cache hit: known fix #{fix_id} verified ({signature['exception']})")
+                return fix_id
+            error = f"script exited with {code}"
+        print(f"⚠️ Known fix #{fix_id} did not verify: {error}")
+        engine.fix_cache.mark(fix_id, False)
+        _restore_workspace(workspace, baseline)
+    return None
+
+def _remember_fix(incident, final_state):
+    """Stores an approved run's changes to the workspace as the fix for its failure signature."""
+    signature = incident.get("signature")
+    baseline = final_state.get("baseline_snapshot")
+    if not (signature and baseline) or final_state.get("review_status") != "approved":
+        return
+    try:
+        snapshots = WorkspaceSnapshots(incident["workspace"])
+        patch = snapshots.diff(baseline, snapshots.snapshot())
+        if patch:
+            engine.fix_cache.record(signature, patch, incident["id"])
+    except Exception as e:
+        print(f"⚠️ Fix cache error: {e}")
+
+def _known_fix_summary(incident, fix_id, started):
+    summary = _summarize(incident, "approved", started, {"review_status": "approved"})
+    summary["fix_cache"] = fix_id
+    return summary
+
+def start_resurrection(workspace_path=DEFAULT_WORKSPACE, incident_id="default", prompt=None, traceback=None, script=None, models=None,
+                       rollback_on_reject=None, fix_cache=None):
+    """
+    Runs one incident to completion. `models` optionally overrides the chat
+    models per node ({"reason": ..., "review": ...}), e.g. with replayed responses.
+    `rollback_on_reject` defaults to RESURRECTOR_ROLLBACK_ON_REJECT and
+    `fix_cache` (try known fixes first) to RESURRECTOR_FIX_CACHE.
+    """
+    print("🚀 Starting Multi-Agent Security Run...")
+    incident = {
+        "id": incident_id, "workspace": workspace_path, "prompt": prompt,
+        "traceback": traceback, "script": script, "models": models,
+        "rollback_on_reject": rollback_on_reject, "fix_cache": fix_cache
+    }
+    tracker.reset()
+    started = time.time()
+    _set_status(incident, "running")
+
+    fix_id = _apply_known_fix(incident)
+    if fix_id is not None:
+        summary = _known_fix_summary(incident, fix_id, started)
+        print("\n✅ KNOWN FIX APPLIED")
+        tracker.finish()
+        notify_success()
+        return summary
+
+    # A fresh run replaces the incident's previous checkpoints; use resume_incident to continue them
+    engine.checkpointer.delete_thread(incident_id)
+    final_state = engine.app.invoke(_initial_state(incident), config=_run_config(incident))
+    _remember_fix(incident, final_state)
+    summary = _summarize(incident, final_state.get("review_status", "pending"), started, final_state)
+
     print("\n✅ AGENT RUN COMPLETE")
+    tracker.finish()
     notify_success()
+    return summary
+
+def list_checkpoints(incident_id):
+    """An incident's checkpoints, newest first, with the step, the next node and the workspace snapshot."""
+    return [
+        {
+            "checkpoint_id": state.config["configurable"]["checkpoint_id"],
+            "step": state.metadata.get("step"),
+            "next": list(state.next),
+            "review_status": state.values.get("review_status"),
+            "workspace_snapshot": state.values.get("workspace_snapshot"),
+        }
+        for state in engine.app.get_state_history({"configurable": {"thread_id": incident_id}})
+    ]
+
+def _checkpointed_incident(state, incident_id, workspace_path, script, models):
+    """Rebuilds an incident from a checkpoint and puts its workspace back to the checkpoint's files."""
+    if not state.values:
+        raise ValueError(f"No checkpoint found for incident '{incident_id}'")
+    incident = {
+        "id": incident_id,
+        "workspace": workspace_path or state.metadata.get("workspace", DEFAULT_WORKSPACE),
+        "script": script or state.metadata.get("script"),
+        "models": models,
+        "rollback_on_reject": state.metadata.get("rollback_on_reject"),
+    }
+    snapshot = state.values.get("workspace_snapshot")
+    if snapshot:
+        _restore_workspace(incident["workspace"], snapshot)
+        print(f"⏪ Workspace restored to snapshot {snapshot[:12]}")
+    return incident
+
+def resume_incident(incident_id, workspace_path=None, script=None, models=None):
+    """
+    Continues an interrupted incident from its latest checkpoint. The workspace
+    and script default to the ones the run was started with.
+    """
+    tracker.reset()
+    started = time.time()
+    state = engine.app.get_state({"configurable": {"thread_id": incident_id}})
+    incident = _checkpointed_incident(state, incident_id, workspace_path, script, models)
+    print(f"🔁 Resuming '{incident_id}' at step {state.metadata.get('step')} (next: {', '.join(state.next) or 'done'})")
+    _set_status(incident, "running")
+
+    final_state = engine.app.invoke(None, config=_run_config(incident))
+    summary = _summarize(incident, final_state.get("review_status", "pending"), started, final_state)
+    tracker.finish()
+    return summary
+
+def fork_incident(incident_id, checkpoint_id, workspace_path=None, script=None, models=None):
+    """
+    Re-runs an incident from an earlier checkpoint (see list_checkpoints). The
+    new steps become a branch of the incident's history; the old ones are kept.
+    """
+    tracker.reset()
+    started = time.time()
+    state = engine.app.get_state({"configurable": {"thread_id": incident_id, "checkpoint_id": checkpoint_id}})
+    incident = _checkpointed_incident(state, incident_id, workspace_path, script, models)
+    print(f"🌿 Forking '{incident_id}' from checkpoint {checkpoint_id} (step {state.metadata.get('step')})")
+    _set_status(incident, "running")
+
+    final_state = engine.app.invoke(None, config=_run_config(incident, checkpoint_id=checkpoint_id))
+    summary = _summarize(incident, final_state.get("review_status", "pending"), started, final_state)
+    tracker.finish()
+    return summary
+
+# --- 8. BATCH RUN ---
+def _sparse_paths(traceback):
+    """
+    Sparse-checkout patterns for a failure: the repo's top-level files (entry
+    points, requirements) plus the directories of the files in the traceback.
+    """
+    patterns = ["/*", "!/*/"]
+    for file, _, _ in CodeIndex.parse_traceback(traceback or ""):
+        if file.startswith(CONTAINER_ROOT):
+            directory = os.path.dirname(file[len(CONTAINER_ROOT):])
+            if directory and f"/{directory}/" not in patterns:
+                patterns.append(f"/{directory}/")
+    return patterns
+
+def _clone_options(incident):
+    """
+    GitManager.clone_repo options from an incident's "clone" dict, e.g.
+    {"depth": 1, "filter": "blob:none", "sparse": True, "use_mirror": True}.
+    "sparse": True limits the checkout to the files around the traceback.
+    """
+    options = dict(incident.get("clone") or {})
+    sparse = options.pop("sparse", None)
+    if sparse is True:
+        options["sparse_paths"] = _sparse_paths(incident.get("traceback"))
+    elif sparse:
+        options["sparse_paths"] = list(sparse)
+    return options
+
+def _prepare_incident(incident):
+    """Gives each incident its own workspace, cloning its repo if one is given."""
+    if incident.get("repo_url"):
+        result = GitManager(incident["workspace"]).clone_repo(incident["repo_url"], **_clone_options(incident))
+        if result.startswith("❌"):
+            raise RuntimeError(result)
+    else:
+        os.makedirs(incident["workspace"], exist_ok=True)
+
+@asynccontextmanager
+async def _async_graph():
+    """The graph with an async checkpointer, for runs driven by ainvoke."""
+    os.makedirs(os.path.dirname(CHECKPOINT_DB), exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB) as saver:
+        # Tables are otherwise created on first read/write, and adelete_thread may come first
+        await saver.setup()
+        yield engine.compile(checkpointer=saver), saver
+
+async def _run_incident(incident, semaphore, timeout, graph, saver):
+    started = time.time()
+    incident = dict(incident)
+    incident.setdefault("workspace", os.path.join("workspaces", incident["id"]))
+    guard = RunGuard()
+    async with semaphore:
+        try:
+            _set_status(incident, "running")
+            await asyncio.to_thread(_prepare_incident, incident)
+            checkpoint = await graph.aget_state({"configurable": {"thread_id": incident["id"]}})
+            if incident.get("resume") and checkpoint.values:
+                # Preempted earlier: pick up from the last checkpoint and its files
+                print(f"🔁 [{incident['id']}] Resuming at step {checkpoint.metadata.get('step')}")
+                await asyncio.to_thread(
+                    _checkpointed_incident, checkpoint, incident["id"], incident["workspace"], incident.get("script"), incident.get("models")
+                )
+                initial_state = None
+            else:
+                fix_id = await asyncio.to_thread(_apply_known_fix, incident)
+                if fix_id is not None:
+                    return _known_fix_summary(incident, fix_id, started)
+                print(f"🚀 [{incident['id']}] Starting resurrection in {incident['workspace']}")
+                await saver.adelete_thread(incident["id"])
+                initial_state = await asyncio.to_thread(_initial_state, incident)
+            final_state = await asyncio.wait_for(
+                graph.ainvoke(initial_state, config=_run_config(incident, guard=guard)),
+                timeout=timeout
+            )
+            await asyncio.to_thread(_remember_fix, incident, final_state)
+            status = final_state.get("review_status", "pending")
+            return _summarize(incident, status, started, final_state)
+        except asyncio.TimeoutError:
+            return _summarize(incident, "timeout", started, error=f"Timed out after {timeout}s")
+        except asyncio.CancelledError:
+            return _summarize(incident, "cancelled", started)
+        except Exception as e:
+            return _summarize(incident, "error", started, error=str(e))
+        finally:
+            # A timed-out or cancelled run may still have a node running in a worker thread
+            await _drain([guard])
+            await asyncio.to_thread(release_sandbox, incident["workspace"])
+
+async def resurrect_many(incidents, max_concurrency=4, timeout=600):
+    """
+    Runs several incidents concurrently, each in its own workspace and sandbox.
+    Each incident is a dict with an "id" and optionally "repo_url", "workspace", "prompt",
+    "traceback" and "script" (the failing entry point, run once to capture a traceback).
+    With "resume": True an incident continues from its last checkpoint, if it has one, and
+    "clone" sets shallow/partial/sparse/mirror clone options (see _clone_options), and
+    "fix_cache": False skips the known fixes for the incident's failure.
+    Returns one summary per incident, in input order.
+    """
+    tracker.reset()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with _async_graph() as (graph, saver):
+        tasks = [asyncio.create_task(_run_incident(incident, semaphore, timeout, graph, saver)) for incident in incidents]
+        try:
+            summaries = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # Batch cancelled: stop every incident, then let the caller see the cancellation
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    approved = sum(1 for s in summaries if s["status"] == "approved")
+    print(f"\n✅ BATCH COMPLETE: {approved}/{len(summaries)} incidents approved")
+    tracker.finish()
+    if approved:
+        notify_success()
+    return summaries
+
+def resurrect_batch(incidents, max_concurrency=4, timeout=600):
+    """Synchronous wrapper around resurrect_many."""
+    return asyncio.run(resurrect_many(incidents, max_concurrency=max_concurrency, timeout=timeout))
+
+# --- 9. SPECULATIVE RUN ---
+CANDIDATE_TEMPERATURES = (0.0, 0.5, 1.0)
+CANDIDATES_DIR = os.path.join(".resurrector_cache", "candidates")
+
+def _candidate_models(temperature):
+    """The Junior Dev at a given temperature; the critic stays deterministic."""
+    return {"reason": engine.chat_model(temperature).bind_tools(tools), "review": engine.llm}
+
+async def _run_candidate(candidate, initial_state, graph, timeout):
+    """Runs one candidate to a verdict, then re-runs the failing script in its sandbox to verify it."""
+    started = time.time()
+    _set_status(candidate, "running")
+    guard = candidate["guard"]
+    try:
+        final_state = await asyncio.wait_for(
+            graph.ainvoke(initial_state, config=_run_config(candidate, guard=guard)), timeout=timeout
+        )
+    except asyncio.CancelledError:
+        _set_status(candidate, "cancelled")
+        raise
+    except asyncio.TimeoutError:
+        return _summarize(candidate, "timeout", started, error=f"Timed out after {timeout}s"), False
+    except Exception as e:
+        return _summarize(candidate, "error", started, error=str(e)), False
+
+    summary = _summarize(candidate, final_state.get("review_status", "pending"), started, final_state)
+    if summary["status"] != "approved":
+        return summary, False
+    if candidate.get("script"):
+        def verify():
+            with guard.node():
+                return get_sandbox(candidate["workspace"]).run_script(candidate["script"])
+        code, _ = await asyncio.to_thread(verify)
+        summary["verified"] = code == 0
+    else:
+        summary["verified"] = True
+    return summary, summary["verified"]
+
+async def resurrect_speculative(workspace_path=DEFAULT_WORKSPACE, incident_id="default", prompt=None, traceback=None,
+                                script=None, temperatures=CANDIDATE_TEMPERATURES, prompts=None, models=None, timeout=600):
+    """
+    Races one candidate fix per temperature, each in its own branch of the
+    workspace with its own sandbox. The first candidate that is approved and
+    passes a re-run of `script` wins; the rest are cancelled and their branches
+    discarded, and the winner's files are restored into the main workspace.
+    `prompts` optionally gives each candidate its own task prompt and `models`
+    its own {"reason": ..., "review": ...} models.
+    """
+    tracker.reset()
+    started = time.time()
+    incident = {"id": incident_id, "workspace": workspace_path, "prompt": prompt, "traceback": traceback, "script": script}
+    _set_status(incident, "running")
+    initial_state = await asyncio.to_thread(_initial_state, incident)
+    baseline = initial_state["baseline_snapshot"]
+    if not baseline:
+        raise RuntimeError("❌ Speculative run needs a workspace snapshot to branch from")
+    main_snapshots = WorkspaceSnapshots(workspace_path)
+
+    candidates = []
+    for i, temperature in enumerate(temperatures):
+        path = os.path.abspath(os.path.join(CANDIDATES_DIR, incident_id, f"c{i}"))
+        WorkspaceSnapshots(path).discard()
+        await asyncio.to_thread(main_snapshots.branch, baseline, path)
+        candidate = {
+            "id": f"{incident_id}-c{i}", "workspace": path, "script": script, "temperature": temperature,
+            "models": models[i] if models else _candidate_models(temperature), "guard": RunGuard(),
+            "baseline_workspace": os.path.abspath(workspace_path),
+        }
+        state = dict(initial_state)
+        if prompts:
+            state["messages"] = [initial_state["messages"][0], HumanMessage(content=prompts[i])] + initial_state["messages"][2:]
+        candidates.append((candidate, state))
+    print(f"🔀 Racing {len(candidates)} candidate fixes for '{incident_id}'")
+
+    winner, summaries = None, {}
+    async with _async_graph() as (graph, saver):
+        tasks = {}
+        for candidate, state in candidates:
+            await saver.adelete_thread(candidate["id"])
+            tasks[asyncio.create_task(_run_candidate(candidate, state, graph, timeout))] = candidate
+        try:
+            for finished in asyncio.as_completed(list(tasks)):
+                summary, verified = await finished
+                summaries[summary["incident_id"]] = summary
+                print(f"🏁 Candidate {summary['incident_id']}: {summary['status']}{' (verified)' if verified else ''}")
+                if verified:
+                    winner = next(c for c in tasks.values() if c["id"] == summary["incident_id"])
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await _drain([candidate["guard"] for candidate, _ in candidates])
+
+    if winner:
+        candidate_snapshots = WorkspaceSnapshots(winner["workspace"])
+        fixed = await asyncio.to_thread(candidate_snapshots.snapshot)
+        await asyncio.to_thread(main_snapshots.adopt, candidate_snapshots, fixed)
+        await asyncio.to_thread(_restore_workspace, workspace_path, fixed)
+        print(f"🏆 Candidate {winner['id']} (temperature {winner['temperature']}) wins; fix applied to {workspace_path}")
+
+    for candidate, _ in candidates:
+        await asyncio.to_thread(release_sandbox, candidate["workspace"])
+        await asyncio.to_thread(WorkspaceSnapshots(candidate["workspace"]).discard)
+
+    if winner:
+        result = dict(summaries[winner["id"]])
+        _set_status(incident, result["status"])
+    else:
+        result = _summarize(incident, "rejected", started)
+    result.update({
+        "incident_id": incident_id,
+        "workspace": workspace_path,
+        "duration_seconds": round(time.time() - started, 2),
+        "winner": winner["id"] if winner else None,
+        "candidates": [summaries.get(c["id"], {"incident_id": c["id"], "status": "cancelled"}) for c, _ in candidates],
+    })
+    tracker.finish()
+    if winner:
+        notify_success()
+    return result
+
+def speculative_resurrection(workspace_path=DEFAULT_WORKSPACE, incident_id="default", **kwargs):
+    """Synchronous wrapper around resurrect_speculative."""
+    return asyncio.run(resurrect_speculative(workspace_path, incident_id, **kwargs))
 
 if __name__ == "__main__":
+    # Interactive runs keep the Phoenix trace server unless RESURRECTOR_TRACING says otherwise
+    engine.tracing = os.getenv("RESURRECTOR_TRACING", "phoenix")
     start_resurrection()
-    input("\n👀 Trace server is active. Press Enter to exit...")
\ No newline at end of file
+    if engine.tracer is not None:
+        input("\n👀 Trace server is active. Press Enter to exit...")
@@ -1,72 +1,300 @@
 import os
+import csv
+import glob
 import time
+import json
 import shutil
-from agent import start_resurrection
-from git_ops import GitManager
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from git import Repo, Actor
+
+import agent
+from observability import percentile
+from replay_llm import load_replay_models, RecordingChatModel, save_recording
 
 # --- CONFIGURATION ---
-TEST_CASES = [
-    {
-        "name": "Missing Dependency (Requests)",
-        "inject_bug": "echo 'import requests' >> calculator.py && sed -i '' '/requests/d' requirements.txt",
-        "expected_fix": "requests"
-    },
-    {
-        "name": "Syntax Error (Missing Colon)",
-        "inject_bug": "sed -i '' 's/def add(a, b):/def add(a, b)/' calculator.py",
-        "expected_fix": "SyntaxError"
-    },
-    {
-        "name": "Logic Error (Division by Zero)",
-        "inject_bug": "echo 'print(10/0)' >> calculator.py",
-        "expected_fix": "ZeroDivisionError"
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+RECORDINGS_DIR = os.path.join(BENCH_DIR, "recordings")
+CASES_DIR = os.path.join(BENCH_DIR, "cases")
+WORKSPACES_DIR = "bench_workspaces"
+
+PHASES = ("reason", "act", "review", "sandbox_startup", "total")
+
+# Regression thresholds for --baseline (relative increase / absolute drop)
+DEFAULT_THRESHOLDS = {"latency": 0.20, "tokens": 0.10, "success_rate": 0.0}
+
+# --- CASES ---
+def load_cases(paths=None):
+    """
+    Loads case definitions from JSON files (a case object or a list of them).
+    Defaults to every file in benchmarks/cases/.
+    """
+    files = []
+    for path in paths or [CASES_DIR]:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path])
+
+    cases = []
+    for file in files:
+        with open(file, "r") as f:
+            data = json.load(f)
+        cases.extend(data if isinstance(data, list) else [data])
+    return cases
+
+# --- FIXTURES ---
+def inject_bug(workspace, operations):
+    """Applies a case's bug to a workspace with plain file edits (no shell, no sed)."""
+    for op in operations:
+        path = os.path.join(workspace, op["file"])
+        with open(path, "r") as f:
+            content = f.read()
+        if "append" in op:
+            content += op["append"]
+        if "replace" in op:
+            old, new = op["replace"]
+            content = content.replace(old, new)
+        if "delete_lines_containing" in op:
+            content = "".join(l for l in content.splitlines(True) if op["delete_lines_containing"] not in l)
+        with open(path, "w") as f:
+            f.write(content)
+
+def build_fixture(case, workspace):
+    """
+    Copies the fixture repo into a fresh workspace, injects the bug and commits
+    it, so HEAD is the broken commit the agent has to repair (as in a real incident).
+    """
+    if os.path.exists(workspace):
+        shutil.rmtree(workspace)
+    shutil.copytree(os.path.join(FIXTURES_DIR, case["fixture"]), workspace)
+    inject_bug(workspace, case["inject_bug"])
+
+    repo = Repo.init(workspace)
+    bot = Actor("Resurrector Agent", "agent@resurrector.bot")
+    repo.index.add([p for p in os.listdir(workspace) if p != ".git"])
+    repo.index.commit(f"Broken commit: {case['name']}", author=bot, committer=bot)
+    return workspace
+
+def verify_fix(workspace, script):
+    """Re-runs the failing script; the fix counts only if it now exits 0."""
+    code, output = agent.get_sandbox(workspace).run_script(script)
+    return code == 0, output
+
+# --- RUN ---
+def _phase_timings(incident_id, startup_seconds, total):
+    calls = [c for c in agent.tracker.calls if c["incident_id"] == incident_id]
+    return {
+        "reason": sum(c["latency"] for c in calls if c["node"] == "reason"),
+        "act": sum(c["latency"] for c in calls if c["node"].startswith("tool:")),
+        "review": sum(c["latency"] for c in calls if c["node"] == "review"),
+        "sandbox_startup": sum(startup_seconds),
+        "total": total,
+    }, {
+        "input_tokens": sum(c["input_tokens"] for c in calls),
+        "output_tokens": sum(c["output_tokens"] for c in calls),
+        "llm_calls": sum(1 for c in calls if c["node"] in ("reason", "review")),
     }
-]
 
-def run_benchmark():
+def run_case(case, iteration, mode="replay", fix_cache=False):
+    """
+    Runs one case once. mode: "replay" (recorded responses), "live", or "record" (live, saved for replay).
+    Known fixes are off by default so every trial measures the agent itself.
+    """
+    incident_id = f"{case['id']}-{iteration}"
+    workspace = os.path.abspath(os.path.join(WORKSPACES_DIR, incident_id))
+    build_fixture(case, workspace)
+
+    models = None
+    if mode == "replay":
+        models = load_replay_models(os.path.join(RECORDINGS_DIR, case["recording"]))
+    elif mode == "record":
+        models = {"reason": RecordingChatModel(agent.llm_with_tools), "review": RecordingChatModel(agent.llm)}
+
+    start_time = time.time()
+    error = None
+    summary = {}
+    try:
+        summary = agent.start_resurrection(workspace, incident_id, script=case["script"], models=models, fix_cache=fix_cache)
+    except Exception as e:
+        error = str(e)
+    duration = time.time() - start_time
+
+    verified, output = verify_fix(workspace, case["script"])
+    startup = list(agent.get_sandbox(workspace).pool.startup_seconds)
+    agent.release_sandbox(workspace)
+
+    if mode == "record" and not error:
+        save_recording(os.path.join(RECORDINGS_DIR, case["recording"]), models)
+
+    phases, usage = _phase_timings(incident_id, startup, duration)
+    approved = summary.get("status") == "approved"
+    if error:
+        status = f"FAILED ({error})"
+    elif not verified:
+        status = "FAILED (script still fails)"
+    elif not approved:
+        status = "FAILED (not approved)"
+    else:
+        status = "PASSED"
+
+    return {
+        "case": case["id"],
+        "test": case["name"],
+        "iteration": iteration,
+        "status": status,
+        "passed": status == "PASSED",
+        "phases": phases,
+        "usage": usage,
+        "verification_output": output[-500:],
+    }
+
+def summarize_results(results):
+    """Per-case success rate, phase p50/p95 and mean token usage across iterations."""
+    summary = {}
+    for case_id in dict.fromkeys(r["case"] for r in results):
+        runs = [r for r in results if r["case"] == case_id]
+        summary[case_id] = {
+            "test": runs[0]["test"],
+            "runs": len(runs),
+            "success_rate": sum(r["passed"] for r in runs) / len(runs),
+            "phases": {
+                phase: {
+                    "p50": round(percentile([r["phases"][phase] for r in runs], 50), 3),
+                    "p95": round(percentile([r["phases"][phase] for r in runs], 95), 3),
+                }
+                for phase in PHASES
+            },
+            "mean_tokens": sum(r["usage"]["input_tokens"] + r["usage"]["output_tokens"] for r in runs) / len(runs),
+        }
+    return summary
+
+def print_report(summary):
+    print("\n\n📊 FINAL BENCHMARK REPORT")
+    print("| Test Case | Success | Total p50/p95 | Reason p50 | Act p50 | Review p50 | Sandbox startup p50 | Tokens |")
+    print("|-----------|---------|---------------|------------|---------|------------|---------------------|--------|")
+    for s in summary.values():
+        p = s["phases"]
+        print(
+            f"| {s['test']} | {s['success_rate']:.0%} ({s['runs']}) "
+            f"| {p['total']['p50']:.2f}s / {p['total']['p95']:.2f}s "
+            f"| {p['reason']['p50']:.2f}s | {p['act']['p50']:.2f}s | {p['review']['p50']:.2f}s "
+            f"| {p['sandbox_startup']['p50']:.2f}s | {s['mean_tokens']:.0f} |"
+        )
+
+def _run_trial(case, iteration, mode, fix_cache=False):
+    """Process pool entry point; every trial has its own workspace, sandbox and tracker records."""
+    return run_case(case, iteration, mode=mode, fix_cache=fix_cache)
+
+def run_benchmark(iterations=1, mode="replay", case_ids=None, cases=None, workers=1, fix_cache=False):
     print("🏆 STARTING SOTA AGENT EVALUATION SUITE")
     print("========================================")
-    
-    results = []
-    git_mgr = GitManager()
-    
-    for test in TEST_CASES:
-        print(f"\n🧪 Running Test Case: {test['name']}")
-        
-        # 1. Reset Environment
-        if os.path.exists("resurrector-test-repo"):
-            shutil.rmtree("resurrector-test-repo")
-        
-        # 2. Inject the Bug (Simulating a broken repo)
-        git_mgr.clone_repo("https://github.com/DHRUVBSTHAKUR/resurrector-test-repo.git")
-        os.system(f"cd resurrector-test-repo && {test['inject_bug']}")
-        print(f"⚠️  Bug Injected: {test['inject_bug']}")
-        
-        # 3. Run the Agent
-        start_time = time.time()
-        try:
-            # We call the main agent logic here
-            # Note: Ensure start_resurrection returns a status dict in agent.py
-            start_resurrection() 
-            status = "PASSED"
-        except Exception as e:
-            status = f"FAILED ({str(e)})"
-        
-        duration = time.time() - start_time
-        
-        results.append({
-            "test": test['name'],
-            "status": status,
-            "duration": f"{duration:.2f}s"
-        })
 
-    print("\n\n📊 FINAL BENCHMARK REPORT")
-    print("| Test Case | Status | Time |")
-    print("|-----------|--------|------|")
-    for r in results:
-        print(f"| {r['test']} | {r['status']} | {r['duration']} |")
+    cases = [c for c in (cases or load_cases()) if not case_ids or c["id"] in case_ids]
+    trials = [(case, iteration) for case in cases for iteration in range(iterations)]
+
+    if workers <= 1:
+        results = []
+        for case, iteration in trials:
+            print(f"\n🧪 Running Test Case: {case['name']} (iteration {iteration + 1}/{iterations})")
+            results.append(run_case(case, iteration, mode=mode, fix_cache=fix_cache))
+            print(f"   → {results[-1]['status']}")
+    else:
+        # spawn, not fork: the parent already runs trace/Docker threads
+        print(f"🧪 Running {len(trials)} trials on {workers} workers")
+        context = multiprocessing.get_context("spawn")
+        # Each worker imports agent (cheap) and compiles the graph once, reused by all its trials
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=agent.warm_up) as pool:
+            futures = [pool.submit(_run_trial, case, iteration, mode, fix_cache) for case, iteration in trials]
+            results = [future.result() for future in futures]
+        for r in results:
+            print(f"   {r['test']} #{r['iteration'] + 1} → {r['status']}")
+
+    summary = summarize_results(results)
+    print_report(summary)
+    return results, summary
+
+# --- RESULTS ---
+def write_results(output_dir, results, summary, metadata):
+    """Writes results.json (raw trials + summary) and results.csv (one row per trial)."""
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, "results.json")
+    with open(json_path, "w") as f:
+        json.dump({"metadata": metadata, "summary": summary, "results": results}, f, indent=2)
+
+    csv_path = os.path.join(output_dir, "results.csv")
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["case", "iteration", "passed", "status"] + [f"{p}_seconds" for p in PHASES] + ["input_tokens", "output_tokens", "llm_calls"])
+        for r in results:
+            writer.writerow(
+                [r["case"], r["iteration"], r["passed"], r["status"]]
+                + [round(r["phases"][p], 3) for p in PHASES]
+                + [r["usage"]["input_tokens"], r["usage"]["output_tokens"], r["usage"]["llm_calls"]]
+            )
+    return json_path, csv_path
+
+def compare_to_baseline(summary, baseline, thresholds=None):
+    """
+    Flags cases whose p50 total latency or mean tokens grew, or whose success
+    rate dropped, by more than the thresholds. Returns a list of regression strings.
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    regressions = []
+    for case_id, current in summary.items():
+        base = baseline.get(case_id)
+        if not base:
+            continue
+        base_latency = base["phases"]["total"]["p50"]
+        latency = current["phases"]["total"]["p50"]
+        if base_latency and (latency - base_latency) / base_latency > thresholds["latency"]:
+            regressions.append(f"{case_id}: p50 latency {base_latency:.2f}s → {latency:.2f}s")
+        if base["mean_tokens"] and (current["mean_tokens"] - base["mean_tokens"]) / base["mean_tokens"] > thresholds["tokens"]:
+            regressions.append(f"{case_id}: mean tokens {base['mean_tokens']:.0f} → {current['mean_tokens']:.0f}")
+        if base["success_rate"] - current["success_rate"] > thresholds["success_rate"]:
+            regressions.append(f"{case_id}: success rate {base['success_rate']:.0%} → {current['success_rate']:.0%}")
+    return regressions
 
 if __name__ == "__main__":
-    run_benchmark()
-    # 👇 ADD THIS LINE SO YOU CAN SEE THE RESULTS 👇
-    input("\n👀 Benchmark Complete. Traces are live. Press Enter to exit...")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Resurrector benchmark suite")
+    parser.add_argument("--iterations", type=int, default=3, help="Runs per case")
+    parser.add_argument("--mode", choices=["replay", "live", "record"], default="replay",
+                        help="replay recorded model responses (default), call the live model, or record new responses")
+    parser.add_argument("--cases", action="append", dest="case_files", help="Case file or directory (repeatable; default benchmarks/cases)")
+    parser.add_argument("--case", action="append", dest="cases", help="Only run this case id (repeatable)")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel worker processes")
+    parser.add_argument("--fix-cache", action="store_true", help="Let trials reuse known fixes from earlier runs")
+    parser.add_argument("--output-dir", help="Write results.json and results.csv here")
+    parser.add_argument("--baseline", help="Compare against this results.json and exit 1 on regression")
+    parser.add_argument("--latency-threshold", type=float, default=DEFAULT_THRESHOLDS["latency"])
+    parser.add_argument("--token-threshold", type=float, default=DEFAULT_THRESHOLDS["tokens"])
+    parser.add_argument("--success-threshold", type=float, default=DEFAULT_THRESHOLDS["success_rate"])
+    args = parser.parse_args()
+
+    results, summary = run_benchmark(
+        args.iterations, args.mode, args.cases,
+        cases=load_cases(args.case_files), workers=args.workers, fix_cache=args.fix_cache
+    )
+    if args.output_dir:
+        metadata = {"mode": args.mode, "iterations": args.iterations, "workers": args.workers, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        for path in write_results(args.output_dir, results, summary, metadata):
+            print(f"💾 Wrote {path}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["summary"]
+        regressions = compare_to_baseline(summary, baseline, {
+            "latency": args.latency_threshold,
+            "tokens": args.token_threshold,
+            "success_rate": args.success_threshold,
+        })
+        if regressions:
+            print("\n🚨 REGRESSIONS vs baseline:")
+            for r in regressions:
+                print(f"   - {r}")
+        else:
+            print("\n✅ No regressions vs baseline")
+
+    if args.mode != "replay":
+        input("\n👀 Benchmark Complete. Traces are live. Press Enter to exit...")
+    raise SystemExit(1 if regressions else 0)
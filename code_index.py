@@ -0,0 +1,225 @@
+import os
+import re
+import threading
+from collections import defaultdict
+
+from repo_mapper import RepoMapper
+
+FRAME_RE = re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+), in (?P<func>\S+)')
+
+# Container-side mount point of the workspace (see sandbox.py)
+CONTAINER_ROOT = "/app/"
+
+
+def module_name(rel_path):
+    parts = rel_path[:-3].split(os.sep) if rel_path.endswith(".py") else rel_path.split(os.sep)
+    if parts and parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+class CodeIndex:
+    """
+    A queryable view over RepoMapper's per-file index: qualified symbol name
+    to file/line range, a reverse import graph and call-site edges.
+    """
+
+    def __init__(self, root_dir="./agent_workspace", mapper=None):
+        self.root_dir = root_dir
+        self.mapper = mapper or RepoMapper(root_dir)
+        self._lock = threading.Lock()
+        self._stale = True
+        self._mapped = False
+
+        self.symbols = {}                      # "pkg.mod.Class.method" -> {file, start, end, kind}
+        self.file_symbols = defaultdict(list)  # rel_path -> [symbol entries]
+        self.modules = {}                      # "pkg.mod" -> rel_path
+        self.importers = defaultdict(set)      # "pkg.mod" -> {rel_path, ...}
+        self.callers = defaultdict(list)       # qualified symbol -> [{file, caller, line}]
+
+    # --- BUILD ---
+    def refresh(self):
+        """Re-maps the workspace (cheap when nothing changed) and rebuilds the graph."""
+        self.mapper.generate_map()
+        self._mapped = True
+        self._rebuild()
+
+    def refresh_file(self, file_path):
+        """Updates one file after an edit; the graph is rebuilt on the next query."""
+        self.mapper.refresh_file(file_path)
+        self._stale = True
+
+    def ensure_built(self):
+        if self._stale:
+            with self._lock:
+                if self._stale:
+                    # The on-disk cache may predate this run, so map once before trusting it
+                    if not self._mapped:
+                        self.mapper.generate_map()
+                        self._mapped = True
+                    self._rebuild()
+
+    def _rebuild(self):
+        index = self.mapper.get_index()
+        symbols, file_symbols, modules = {}, defaultdict(list), {}
+        importers, callers = defaultdict(set), defaultdict(list)
+
+        for rel_path in index:
+            modules[module_name(rel_path)] = rel_path
+
+        for rel_path, data in index.items():
+            module = module_name(rel_path)
+            for symbol in data["symbols"]:
+                entry = dict(symbol, file=rel_path, qualname=f"{module}.{symbol['name']}" if module else symbol["name"])
+                symbols[entry["qualname"]] = entry
+                file_symbols[rel_path].append(entry)
+
+            for imp in data["imports"]:
+                for target in self._resolve_import(module, rel_path, imp, modules):
+                    importers[target].add(rel_path)
+
+        by_short_name = defaultdict(list)
+        for entry in symbols.values():
+            by_short_name[entry["name"].split(".")[-1]].append(entry)
+
+        for rel_path, data in index.items():
+            module = module_name(rel_path)
+            imported = {t for imp in data["imports"] for t in self._resolve_import(module, rel_path, imp, modules)}
+            imported_files = {modules[m] for m in imported if m in modules}
+            for call in data["calls"]:
+                for target in self._resolve_call(call["callee"], rel_path, imported_files, by_short_name):
+                    callers[target["qualname"]].append({
+                        "file": rel_path,
+                        "caller": call["caller"],
+                        "line": call["line"],
+                    })
+
+        self.symbols, self.file_symbols, self.modules = symbols, file_symbols, modules
+        self.importers, self.callers = importers, callers
+        self._stale = False
+
+    def _resolve_import(self, module, rel_path, imp, modules):
+        """Workspace modules an import statement refers to (external imports are kept by name)."""
+        base = imp["module"]
+        if imp["level"]:
+            package = module.split(".")
+            # A package's __init__ is its own package; a plain module's package is its parent
+            if not rel_path.endswith("__init__.py"):
+                package = package[:-1]
+            package = package[:len(package) - (imp["level"] - 1)] if imp["level"] > 1 else package
+            base = ".".join(p for p in package + ([imp["module"]] if imp["module"] else []) if p)
+
+        targets = {base} if base else set()
+        # `from pkg import mod` imports a submodule, not a symbol
+        for name in imp["names"]:
+            candidate = f"{base}.{name}" if base else name
+            if candidate in modules:
+                targets.add(candidate)
+        return targets
+
+    def _resolve_call(self, callee, rel_path, imported_files, by_short_name):
+        """Best-effort: same file first, then files this one imports, then any unique match."""
+        candidates = by_short_name.get(callee.split(".")[-1], [])
+        if not candidates:
+            return []
+        local = [c for c in candidates if c["file"] == rel_path]
+        if local:
+            return local
+        from_imports = [c for c in candidates if c["file"] in imported_files]
+        if from_imports:
+            return from_imports
+        return candidates if len(candidates) == 1 else []
+
+    # --- QUERY ---
+    def _rel_path(self, file_path):
+        """
+        A frame's path relative to the workspace, or None if it resolves outside
+        it (`..`, symlinks), since traceback text can come from untrusted code.
+        """
+        if file_path.startswith(CONTAINER_ROOT):
+            file_path = file_path[len(CONTAINER_ROOT):]
+        root = os.path.realpath(self.root_dir)
+        full_path = os.path.realpath(os.path.join(root, file_path))
+        if not full_path.startswith(root + os.sep):
+            return None
+        return os.path.relpath(full_path, root)
+
+    def find_symbol(self, name):
+        """Exact qualified name, or every symbol whose name ends with `name`."""
+        self.ensure_built()
+        if name in self.symbols:
+            return [self.symbols[name]]
+        suffix = "." + name
+        return [s for q, s in self.symbols.items() if q.endswith(suffix)]
+
+    def enclosing_symbol(self, file_path, line):
+        """The innermost function/class in a file whose range covers `line`."""
+        self.ensure_built()
+        rel_path = self._rel_path(file_path)
+        best = None
+        for symbol in self.file_symbols.get(rel_path, []):
+            if symbol["start"] <= line <= symbol["end"]:
+                if best is None or symbol["end"] - symbol["start"] < best["end"] - best["start"]:
+                    best = symbol
+        return best
+
+    def _source(self, rel_path, start, end):
+        with open(os.path.join(self.root_dir, rel_path), "r", encoding="utf-8", errors="replace") as f:
+            lines = f.readlines()
+        return "".join(lines[max(start - 1, 0):end]), min(end, len(lines))
+
+    def lookup_frame(self, file_path, line, context=10):
+        """
+        Resolves a traceback frame to the enclosing function's source and its callers.
+        Module-level frames return a window of `context` lines instead.
+        """
+        self.ensure_built()
+        rel_path = self._rel_path(file_path)
+        if rel_path is None or not os.path.exists(os.path.join(self.root_dir, rel_path)):
+            return None
+
+        symbol = self.enclosing_symbol(rel_path, line)
+        if symbol:
+            start, end, name = symbol["start"], symbol["end"], symbol["qualname"]
+        else:
+            start, end, name = max(line - context, 1), line + context, f"{module_name(rel_path)}:<module>"
+
+        source, end = self._source(rel_path, start, end)
+        return {
+            "symbol": name,
+            "file": rel_path,
+            "line": line,
+            "start_line": start,
+            "end_line": end,
+            "source": source,
+            "callers": list(self.callers.get(name, [])) if symbol else [],
+            "importers": sorted(self.importers.get(module_name(rel_path), [])),
+        }
+
+    @staticmethod
+    def parse_traceback(text):
+        """[(file, line, function), ...] in traceback order (outermost first)."""
+        return [(m.group("file"), int(m.group("line")), m.group("func")) for m in FRAME_RE.finditer(text)]
+
+    def lookup_traceback(self, text):
+        """Looks up every workspace frame in a traceback; frames in site-packages etc. are skipped."""
+        results = []
+        for file_path, line, _ in self.parse_traceback(text):
+            frame = self.lookup_frame(file_path, line)
+            if frame:
+                results.append(frame)
+        return results
+
+
+def format_frames(frames, max_callers=5):
+    """Renders lookup_traceback results for the LLM."""
+    if not frames:
+        return "No traceback frames point into the workspace."
+    blocks = []
+    for frame in frames:
+        block = f"### {frame['symbol']} ({frame['file']}:{frame['start_line']}-{frame['end_line']}, failing line {frame['line']})\n{frame['source']}"
+        if frame["callers"]:
+            calls = ", ".join(f"{c['caller']} @ {c['file']}:{c['line']}" for c in frame["callers"][:max_callers])
+            block += f"\nCalled from: {calls}"
+        blocks.append(block)
+    return "\n\n".join(blocks)
@@ -0,0 +1,117 @@
+import os
+
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+
+from context_builder import estimate_tokens
+
+# Tools whose result (or argument) is a full copy of a file
+FILE_TOOLS = ("read_file", "edit_file")
+# read_file arguments that make its result only part of the file
+RANGE_ARGS = ("start_line", "end_line", "offset", "length")
+
+
+def _content_tokens(message):
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    tokens = estimate_tokens(content)
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(str(call.get("args", "")))
+    return tokens
+
+
+def count_tokens(messages):
+    return sum(_content_tokens(m) for m in messages)
+
+
+def _head_tail(text, max_chars):
+    half = max_chars // 2
+    return f"{text[:half]}\n[... {len(text) - 2 * half} characters elided ...]\n{text[-half:]}"
+
+
+def _file_of(call):
+    """The file a call carries a full copy of, or None (a ranged read is only part of it)."""
+    args = call.get("args") or {}
+    path = args.get("file_path")
+    if not isinstance(path, str):
+        return None
+    if call["name"] == "read_file" and any(args.get(arg) is not None for arg in RANGE_ARGS):
+        return None
+    if path.startswith("/app/"):
+        path = path[len("/app/"):]
+    return os.path.normpath(path)
+
+
+def compact_messages(messages, max_tool_chars=2000, token_ceiling=24000, keep_recent=6):
+    """
+    Returns a compacted copy of the history for one LLM call; the graph state is untouched.
+
+    1. Older copies of a file (read results and edit arguments) are elided once a
+       newer read or edit of the same file exists.
+    2. Tool results outside the last `keep_recent` messages are cut to head/tail.
+    3. If still over `token_ceiling`, the oldest messages are emptied one by one.
+
+    Messages are never dropped, so every tool call keeps its ToolMessage.
+    Returns: (messages, stats)
+    """
+    before = count_tokens(messages)
+    messages = list(messages)
+    recent_start = max(len(messages) - keep_recent, 0)
+    elided = 0
+
+    # 1. Find the newest message that carries each file's contents
+    call_files = {}
+    latest = {}
+    for i, message in enumerate(messages):
+        for call in getattr(message, "tool_calls", None) or []:
+            if call["name"] in FILE_TOOLS and _file_of(call):
+                call_files[call["id"]] = _file_of(call)
+                if call["name"] == "edit_file":
+                    latest[call_files[call["id"]]] = i
+        if isinstance(message, ToolMessage) and message.tool_call_id in call_files and message.name == "read_file":
+            latest[call_files[message.tool_call_id]] = i
+
+    for i, message in enumerate(messages):
+        if isinstance(message, ToolMessage) and message.name == "read_file":
+            path = call_files.get(message.tool_call_id)
+            if path and latest.get(path, i) > i:
+                messages[i] = message.model_copy(update={"content": f"[older contents of {path} elided; a newer version appears later]"})
+                elided += 1
+        elif isinstance(message, AIMessage) and message.tool_calls:
+            calls = []
+            changed = False
+            for call in message.tool_calls:
+                path = call_files.get(call["id"])
+                if call["name"] == "edit_file" and path and latest.get(path, i) > i:
+                    call = dict(call, args=dict(call["args"], content=f"[older edit of {path} elided]"))
+                    changed = True
+                calls.append(call)
+            if changed:
+                messages[i] = message.model_copy(update={"tool_calls": calls})
+                elided += 1
+
+    # 2. Trim big, old tool outputs
+    for i in range(recent_start):
+        message = messages[i]
+        if isinstance(message, ToolMessage) and isinstance(message.content, str) and len(message.content) > max_tool_chars:
+            messages[i] = message.model_copy(update={"content": _head_tail(message.content, max_tool_chars)})
+            elided += 1
+
+    # 3. Enforce the ceiling, oldest first; the system prompt and the task stay
+    total = count_tokens(messages)
+    protected = {i for i, m in enumerate(messages[:2]) if isinstance(m, SystemMessage) or i == 1}
+    for i in range(recent_start):
+        if total <= token_ceiling:
+            break
+        if i in protected:
+            continue
+        message = messages[i]
+        saved_before = _content_tokens(message)
+        update = {"content": "[elided to fit the context budget]"}
+        if isinstance(message, AIMessage) and message.tool_calls:
+            update["tool_calls"] = [dict(c, args={k: "[elided]" for k in (c.get("args") or {})}) for c in message.tool_calls]
+            update["content"] = ""
+        messages[i] = message.model_copy(update=update)
+        total -= saved_before - _content_tokens(messages[i])
+        elided += 1
+
+    after = count_tokens(messages)
+    return messages, {"before_tokens": before, "after_tokens": after, "elided_messages": elided}
@@ -0,0 +1,137 @@
+from code_index import CodeIndex, module_name
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token); good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def _render_signatures(rel_path, definitions):
+    if isinstance(definitions, str):
+        return f"# {rel_path}: {definitions}"
+    if not (definitions.get("functions") or definitions.get("classes")):
+        return None
+    lines = [f"# {rel_path}"]
+    for func in definitions.get("functions", []):
+        lines.append(f"def {func}")
+    for cls in definitions.get("classes", []):
+        methods = ", ".join(cls["methods"])
+        lines.append(f"class {cls['name']}: {methods}" if methods else f"class {cls['name']}")
+    return "\n".join(lines)
+
+
+class ContextBuilder:
+    """
+    Packs the code most relevant to a failure into a fixed token budget:
+    full bodies for the traceback frames, signatures for everything further out.
+    """
+
+    # Ranking weights; higher is packed first
+    SCORE_FRAME = 100
+    SCORE_CALLER = 60
+    SCORE_FRAME_FILE = 40
+    SCORE_NEIGHBOUR = 20
+    SCORE_OTHER = 1
+
+    def __init__(self, code_index=None, root_dir="./agent_workspace", budget_tokens=4000, traceback_share=0.25):
+        self.index = code_index or CodeIndex(root_dir)
+        self.budget_tokens = budget_tokens
+        self.traceback_share = traceback_share
+
+    def _candidates(self, traceback_text):
+        index = self.index
+        index.ensure_built()
+        frames = index.lookup_traceback(traceback_text) if traceback_text else []
+        repo_map = index.mapper.get_map()
+
+        items = []
+        bodies = {}
+        frame_files = []
+
+        # 1. Full bodies of the failing frames, innermost first
+        for depth, frame in enumerate(reversed(frames)):
+            key = (frame["file"], frame["start_line"])
+            if key in bodies:
+                continue
+            bodies[key] = frame["end_line"]
+            if frame["file"] not in frame_files:
+                frame_files.append(frame["file"])
+            text = f"# {frame['file']}:{frame['start_line']}-{frame['end_line']} ({frame['symbol']}, failing line {frame['line']})\n{frame['source']}"
+            items.append({"kind": "body", "ref": frame["symbol"], "score": self.SCORE_FRAME - depth, "text": text})
+
+        def in_a_body(file_path, line):
+            return any(f == file_path and start <= line <= end for (f, start), end in bodies.items())
+
+        # 2. Callers of each frame that are not already shown, as one-line references
+        for depth, frame in enumerate(reversed(frames)):
+            for caller in frame["callers"]:
+                if in_a_body(caller["file"], caller["line"]):
+                    continue
+                text = f"# {caller['file']}:{caller['line']} calls {frame['symbol']} from {caller['caller']}"
+                items.append({"kind": "caller", "ref": f"{caller['file']}:{caller['line']}", "score": self.SCORE_CALLER - depth, "text": text})
+
+        # 3. Signatures: files in the traceback, then their import neighbours, then the rest
+        neighbours = set()
+        for rel_path in frame_files:
+            module = module_name(rel_path)
+            neighbours |= index.importers.get(module, set())
+            for imported_module, path in index.modules.items():
+                if rel_path in index.importers.get(imported_module, set()):
+                    neighbours.add(path)
+
+        for rel_path in sorted(repo_map):
+            text = _render_signatures(rel_path, repo_map[rel_path])
+            if text is None:
+                continue
+            if rel_path in frame_files:
+                score = self.SCORE_FRAME_FILE
+            elif rel_path in neighbours:
+                score = self.SCORE_NEIGHBOUR
+            else:
+                score = self.SCORE_OTHER
+            items.append({
+                "kind": "signatures",
+                "ref": rel_path,
+                "score": score,
+                "text": text,
+            })
+
+        return items
+
+    def build(self, traceback_text=""):
+        """
+        Returns: (context_text, manifest). The manifest records every item that
+        was packed and how many were left out for lack of budget.
+        """
+        sections = []
+        used = 0
+
+        if traceback_text:
+            limit = int(self.budget_tokens * self.traceback_share) * 4
+            tb = traceback_text if len(traceback_text) <= limit else "...\n" + traceback_text[-limit:]
+            sections.append(f"## Failing output\n{tb}")
+            used += estimate_tokens(sections[-1])
+
+        chosen, skipped = [], 0
+        items = sorted(self._candidates(traceback_text), key=lambda item: -item["score"])
+        for item in items:
+            cost = estimate_tokens(item["text"])
+            if used + cost > self.budget_tokens:
+                skipped += 1
+                continue
+            used += cost
+            chosen.append(item)
+
+        # Keep the packed items grouped by kind so the prompt reads top-down
+        for kind, title in (("body", "Failing functions"), ("caller", "Call sites"), ("signatures", "Repository map")):
+            texts = [item["text"] for item in chosen if item["kind"] == kind]
+            if texts:
+                sections.append(f"## {title}\n" + "\n\n".join(texts))
+
+        manifest = {
+            "budget_tokens": self.budget_tokens,
+            "used_tokens": used,
+            "items": [{"kind": i["kind"], "ref": i["ref"], "score": i["score"], "tokens": estimate_tokens(i["text"])} for i in chosen],
+            "skipped": skipped,
+        }
+        return "\n\n".join(sections), manifest
@@ -2,9 +2,13 @@ import streamlit as st
 import os
 import json
 import pandas as pd
+from collections import deque
 from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
 
+from repo_mapper import SKIP_DIRS
+from run_store import RunStore
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Resurrector V2 | AI Ops", layout="wide", page_icon="🛡️")
 
@@ -24,51 +28,99 @@ st.title("🚀 Resurrector V2: Autonomous Control")
 st.caption("Live monitoring of Phase 10 Observability and Phase 7 Repository Mapping")
 st.markdown("---")
 
-# --- SIDEBAR: TELEMETRY ---
-st.sidebar.header("📊 Live Metrics")
+# --- DATA SOURCES ---
 log_dir = "logs"
+DEFAULT_WORKSPACE = "agent_workspace"
+MAX_FEED_EVENTS = 2000
+FEED_BATCH = 500
+
+@st.cache_resource
+def get_run_store():
+    return RunStore()
 
-if os.path.exists(log_dir):
+@st.cache_data(ttl=10, show_spinner=False)
+def latest_metrics_file(log_dir):
+    if not os.path.exists(log_dir):
+        return None
     m_files = sorted([f for f in os.listdir(log_dir) if f.startswith("metrics_")], reverse=True)
-    if m_files:
-        try:
-            with open(os.path.join(log_dir, m_files[0]), "r") as f:
-                data = json.load(f)
-                st.sidebar.metric("Run Duration", f"{data['duration_seconds']}s")
-                st.sidebar.metric("Total Tokens", data['usage']['total_tokens'])
-                st.sidebar.metric("Estimated Cost", data['estimated_cost_usd'])
-        except Exception as e:
-            st.sidebar.error(f"Error loading metrics: {e}")
-    else:
-        st.sidebar.info("No metrics JSON found.")
+    return os.path.join(log_dir, m_files[0]) if m_files else None
+
+@st.cache_data(ttl=30, show_spinner=False)
+def list_workspace_files(workspace):
+    files = []
+    for root, dirs, filenames in os.walk(workspace):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        files.extend({"File": os.path.relpath(os.path.join(root, f), workspace)} for f in filenames)
+    return files
+
+def tail_feed(store, incident_id):
+    """Adds only the events written since the last refresh to this session's feed."""
+    key = f"feed:{incident_id}"
+    if key not in st.session_state:
+        # A new session starts at the newest events the feed can show, not at the incident's first one
+        st.session_state[key] = {"last_id": store.start_id(MAX_FEED_EVENTS, incident_id), "lines": deque(maxlen=MAX_FEED_EVENTS)}
+    feed = st.session_state[key]
+    while True:
+        events = store.tail(after_id=feed["last_id"], incident_id=incident_id, limit=FEED_BATCH)
+        for event in events:
+            timestamp = datetime.fromtimestamp(event["ts"]).strftime("%H:%M:%S")
+            feed["lines"].append(f"[{timestamp}] [{event['kind'].upper()}] {event['message']}")
+            feed["last_id"] = event["id"]
+        if len(events) < FEED_BATCH:
+            return feed["lines"]
+
+store = get_run_store()
+incidents = store.incidents()
+
+# --- SIDEBAR: TELEMETRY ---
+st.sidebar.header("📊 Live Metrics")
+
+metrics_path = latest_metrics_file(log_dir)
+if metrics_path:
+    try:
+        with open(metrics_path, "r") as f:
+            data = json.load(f)
+            st.sidebar.metric("Run Duration", f"{data['duration_seconds']}s")
+            st.sidebar.metric("Total Tokens", data['usage']['total_tokens'])
+            st.sidebar.metric("Estimated Cost", data['estimated_cost_usd'])
+    except Exception as e:
+        st.sidebar.error(f"Error loading metrics: {e}")
+else:
+    st.sidebar.info("No metrics JSON found.")
+
+if incidents:
+    st.sidebar.subheader("🗂️ Incidents")
+    st.sidebar.dataframe(
+        pd.DataFrame([{"Incident": i["incident_id"], "Status": i["status"]} for i in incidents]),
+        width="stretch", hide_index=True
+    )
 
 # --- MAIN LAYOUT ---
 col1, col2 = st.columns([2, 1])
+selected = None
 
 with col1:
     st.subheader("📝 Reasoning Trace")
-    if os.path.exists(log_dir):
-        log_files = sorted([f for f in os.listdir(log_dir) if f.startswith("resurrector_log")], reverse=True)
-        if log_files:
-            selected_log = st.selectbox("Select History Session", log_files)
-            with open(os.path.join(log_dir, selected_log), "r") as f:
-                st.text_area("Live Terminal Feed", f.read(), height=600)
+    if incidents:
+        selected = st.selectbox("Select Incident", [i["incident_id"] for i in incidents])
+        st.text_area("Live Terminal Feed", "\n".join(tail_feed(store, selected)), height=600)
+    else:
+        st.info("No runs recorded yet.")
+
+current = next((i for i in incidents if i["incident_id"] == selected), None)
 
 with col2:
     st.subheader("🌿 Workspace Files")
-    workspace = "agent_workspace"
+    workspace = (current or {}).get("workspace") or DEFAULT_WORKSPACE
     if os.path.exists(workspace):
-        all_files = [{"File": os.path.relpath(os.path.join(root, f), workspace)} 
-                     for root, _, filenames in os.walk(workspace) for f in filenames]
+        all_files = list_workspace_files(workspace)
         if all_files:
             # ✅ FIXED: width="stretch" satisfies the Streamlit validator
             st.dataframe(pd.DataFrame(all_files), width="stretch", hide_index=True)
-    
+
     st.markdown("---")
     st.subheader("🛡️ Security Review Status")
-    if 'selected_log' in locals():
-        with open(os.path.join(log_dir, selected_log), "r") as f:
-            content = f.read().upper()
-            if "APPROVE" in content: st.success("LATEST STATUS: APPROVED")
-            elif "REJECT" in content: st.error("LATEST STATUS: REJECTED")
-            else: st.warning("LATEST STATUS: PENDING")
\ No newline at end of file
+    status = (current or {}).get("status", "pending")
+    if status == "approved": st.success("LATEST STATUS: APPROVED")
+    elif status == "rejected": st.error("LATEST STATUS: REJECTED")
+    else: st.warning(f"LATEST STATUS: {status.upper()}")
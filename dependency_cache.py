@@ -0,0 +1,150 @@
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+
+DEPS_DIR = os.path.join(".resurrector_cache", "deps")
+WHEELHOUSE_DIR = os.path.join(".resurrector_cache", "wheelhouse")
+IMAGE_REPOSITORY = "resurrector-deps"
+REQUIREMENT_PATTERNS = ("requirements*.txt", os.path.join("requirements", "*.txt"))
+
+DEPENDENCY_CACHE_ENABLED = os.getenv("RESURRECTOR_DEPENDENCY_CACHE", "1") != "0"
+# No network: images are built from the wheelhouse alone, and pip in the sandbox never reaches an index
+OFFLINE = os.getenv("RESURRECTOR_OFFLINE") == "1"
+
+
+def read_requirements(workspace_path):
+    """
+    The workspace's third-party requirements, sorted and without comments,
+    options, includes or local/editable installs, so that only a real change
+    to the dependencies changes the cache key.
+    """
+    requirements = set()
+    for pattern in REQUIREMENT_PATTERNS:
+        for path in glob.glob(os.path.join(workspace_path, pattern)):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    line = re.sub(r"(^|\s)#.*", "", line).strip()
+                    if not line or line.startswith(("-", ".", "/")) or "file:" in line:
+                        continue
+                    requirements.add(line)
+    return sorted(requirements)
+
+
+class DependencyCache:
+    """
+    Images with a workspace's requirements preinstalled, derived from a base
+    image and tagged by a hash of the requirements. Wheels are kept in a
+    wheelhouse per base image, so a new requirements set only downloads what
+    is missing and, offline, builds from the wheelhouse alone. Containers also
+    get the wheelhouse (read-only) as a pip find-links source.
+    """
+
+    # Shared by every sandbox in the process: one build per key, and no Docker round trip on a hit
+    _locks = {}
+    _built = set()
+    _failed = set()
+    _state_lock = threading.Lock()
+
+    def __init__(self, client, base_image, wheelhouse_dir=WHEELHOUSE_DIR, offline=OFFLINE):
+        self.client = client
+        self.base_image = base_image
+        self.offline = offline
+        self.wheelhouse = os.path.abspath(os.path.join(wheelhouse_dir, re.sub(r"[^\w.-]", "_", base_image)))
+        self.build_seconds = []
+
+    def key(self, requirements):
+        return hashlib.sha256("\n".join([self.base_image, *requirements]).encode("utf-8")).hexdigest()[:16]
+
+    def image_for(self, workspace_path):
+        """
+        The image to run a workspace in: its dependency image (built on the
+        first miss), or the base image if it has no requirements or the build failed.
+        """
+        requirements = read_requirements(workspace_path)
+        if not requirements:
+            return self.base_image
+        key = self.key(requirements)
+        tag = f"{IMAGE_REPOSITORY}:{key}"
+
+        with self._lock_for(key):
+            if tag in self._built:
+                return tag
+            if key in self._failed:
+                return self.base_image
+            if self._has_image(tag):
+                self._built.add(tag)
+                return tag
+            try:
+                self._build(requirements, key)
+            except Exception as e:
+                print(f"⚠️ Dependency image build failed, using {self.base_image}: {e}")
+                self._failed.add(key)
+                return self.base_image
+            self._built.add(tag)
+            return tag
+
+    def container_options(self):
+        """Extra `containers.run` mounts and environment so pip inside the sandbox finds cached wheels."""
+        os.makedirs(self.wheelhouse, exist_ok=True)
+        environment = {"PIP_FIND_LINKS": "/wheels"}
+        if self.offline:
+            environment["PIP_NO_INDEX"] = "1"
+        return {
+            "mounts": {self.wheelhouse: {"bind": "/wheels", "mode": "ro"}},
+            "environment": environment,
+        }
+
+    @classmethod
+    def _lock_for(cls, key):
+        with cls._state_lock:
+            return cls._locks.setdefault(key, threading.Lock())
+
+    def _has_image(self, tag):
+        try:
+            self.client.images.get(tag)
+            return True
+        except Exception:
+            return False
+
+    def _build(self, requirements, key):
+        """Fills the wheelhouse (unless offline), installs from it and commits the container as the image."""
+        started = time.time()
+        os.makedirs(self.wheelhouse, exist_ok=True)
+        os.makedirs(DEPS_DIR, exist_ok=True)
+        requirements_path = os.path.abspath(os.path.join(DEPS_DIR, f"{key}.txt"))
+        with open(requirements_path, "w") as f:
+            f.write("\n".join(requirements) + "\n")
+
+        steps = []
+        if not self.offline:
+            steps.append("pip wheel --quiet --find-links /wheels --wheel-dir /wheels -r /tmp/requirements.txt")
+        steps.append("pip install --quiet --no-cache-dir --no-index --find-links /wheels -r /tmp/requirements.txt")
+
+        print(f"📦 Building dependency image {IMAGE_REPOSITORY}:{key} ({len(requirements)} requirements)")
+        container = self.client.containers.run(
+            self.base_image,
+            command=["sh", "-c", " && ".join(steps)],
+            detach=True,
+            network_disabled=self.offline,
+            volumes={
+                self.wheelhouse: {'bind': '/wheels', 'mode': 'rw'},
+                requirements_path: {'bind': '/tmp/requirements.txt', 'mode': 'ro'},
+            }
+        )
+        try:
+            status = container.wait().get("StatusCode", -1)
+            if status != 0:
+                logs = container.logs(tail=20).decode("utf-8", errors="replace").strip()
+                raise RuntimeError(f"pip exited with {status}: {logs}")
+            container.commit(
+                repository=IMAGE_REPOSITORY, tag=key,
+                changes=[f"LABEL resurrector.deps={key}", 'CMD ["python3"]']
+            )
+        finally:
+            container.remove(force=True)
+
+        self.build_seconds.append(time.time() - started)
+        print(f"📦 Dependency image {IMAGE_REPOSITORY}:{key} ready in {self.build_seconds[-1]:.1f}s")
@@ -0,0 +1,156 @@
+import ast
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+
+FIX_CACHE_PATH = os.path.join(".resurrector_cache", "fix_cache.sqlite")
+
+EXCEPTION_RE = re.compile(r"^(?P<type>[A-Za-z_][\w.]*(Error|Exception|Exit|Interrupt|Warning))\b:?\s*(?P<message>.*)$")
+MISSING_MODULE_RE = re.compile(r"No module named '(?P<module>[\w.]+)'")
+# SyntaxErrors have no "in <function>" frame, only the offending line
+SYNTAX_LINE_RE = re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+)\n\s+(?P<code>.+)')
+
+
+def _fingerprint(source):
+    """Hash of the code's AST, so formatting, comments and line numbers don't matter."""
+    try:
+        text = ast.dump(ast.parse(_dedent(source)))
+    except SyntaxError:
+        text = " ".join(source.split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _dedent(source):
+    lines = source.splitlines()
+    indent = min((len(l) - len(l.lstrip()) for l in lines if l.strip()), default=0)
+    return "\n".join(l[indent:] for l in lines)
+
+
+def _frame_line(code_index, frame):
+    path = os.path.join(code_index.root_dir, frame["file"])
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        lines = f.readlines()
+    return lines[frame["line"] - 1] if 0 < frame["line"] <= len(lines) else ""
+
+
+def failure_signature(traceback, code_index):
+    """
+    Normalizes a failure to what identifies it across runs and repos: the
+    exception type, an AST fingerprint of the innermost workspace function (or
+    of the failing statement at module level) and the missing module, if any.
+    Returns None when the output has no recognizable exception.
+    """
+    exception = None
+    for line in reversed(traceback.strip().splitlines()):
+        match = EXCEPTION_RE.match(line.strip())
+        if match:
+            exception = match.group("type").split(".")[-1]
+            break
+    if exception is None:
+        return None
+
+    missing = MISSING_MODULE_RE.search(traceback)
+    fingerprint = None
+    frames = code_index.lookup_traceback(traceback)
+    if frames:
+        frame = frames[-1]
+        if frame["symbol"].endswith(":<module>"):
+            fingerprint = _fingerprint(_frame_line(code_index, frame))
+        else:
+            fingerprint = _fingerprint(frame["source"])
+    else:
+        syntax = SYNTAX_LINE_RE.search(traceback)
+        if syntax:
+            fingerprint = _fingerprint(syntax.group("code"))
+
+    signature = {
+        "exception": exception,
+        "fingerprint": fingerprint,
+        "missing_module": missing.group("module").split(".")[0] if missing else None,
+    }
+    signature["key"] = hashlib.sha256(json.dumps(signature, sort_keys=True).encode("utf-8")).hexdigest()
+    return signature
+
+
+def apply_patch(workspace_path, patch):
+    """Applies a `git diff` patch to a workspace (git repo or not). Returns (ok, error output)."""
+    with tempfile.NamedTemporaryFile("w", suffix=".patch", delete=False) as f:
+        f.write(patch)
+        patch_path = f.name
+    # Without a .git of its own, git would find an enclosing repo (e.g. workspaces/<id> inside a
+    # checkout), skip the patch's paths as outside that repo's cwd and still exit 0
+    workspace_path = os.path.abspath(workspace_path)
+    env = dict(os.environ, GIT_CEILING_DIRECTORIES=os.path.dirname(workspace_path))
+    try:
+        result = subprocess.run(
+            ["git", "apply", "--whitespace=nowarn", patch_path],
+            cwd=workspace_path, capture_output=True, text=True, env=env
+        )
+        return result.returncode == 0, result.stderr.strip()
+    finally:
+        os.remove(patch_path)
+
+
+class FixCache:
+    """
+    Approved patches keyed by failure signature. Patches that keep verifying
+    are tried first; ones that stop working sink to the bottom.
+    """
+
+    def __init__(self, path=FIX_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fixes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                signature_key TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                patch TEXT NOT NULL,
+                patch_hash TEXT NOT NULL,
+                incident_id TEXT,
+                created_at REAL NOT NULL,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (signature_key, patch_hash)
+            )
+        """)
+        self._conn.commit()
+
+    def lookup(self, signature, limit=3):
+        """[(fix_id, patch), ...] for a signature, most reliable first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, patch FROM fixes WHERE signature_key = ? ORDER BY successes - failures DESC, created_at DESC LIMIT ?",
+                (signature["key"], limit)
+            ).fetchall()
+        return rows
+
+    def record(self, signature, patch, incident_id=None):
+        """Stores the approved patch for a signature (once per distinct patch)."""
+        patch_hash = hashlib.sha256(patch.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO fixes (signature_key, signature, patch, patch_hash, incident_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (signature["key"], json.dumps(signature), patch, patch_hash, incident_id, time.time())
+            )
+            self._conn.commit()
+
+    def mark(self, fix_id, success):
+        column = "successes" if success else "failures"
+        with self._lock:
+            self._conn.execute(f"UPDATE fixes SET {column} = {column} + 1 WHERE id = ?", (fix_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
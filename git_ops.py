@@ -1,38 +1,190 @@
 import os
+import re
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from git import Repo
-from github import Github, Auth
+from github import Github, Auth, GithubRetry
 from dotenv import load_dotenv
 
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
+# Bare mirrors that clones borrow objects from (git clone --reference)
+MIRROR_DIR = os.path.join(".resurrector_cache", "mirrors")
+_mirror_locks = {}
+_mirror_locks_guard = threading.Lock()
+
+# Batch pushes: parallel workers, also the size of the GitHub client's connection pool
+MAX_PUSH_WORKERS = 4
+PUSH_ATTEMPTS = 3
+
+_github_client = None
+_github_lock = threading.Lock()
+_github_repos = {}
+
+def get_github_client():
+    """
+    One GitHub client per process. It keeps a pooled HTTP session, and its
+    GithubRetry waits out primary and secondary rate limits, so callers don't
+    each need their own backoff. Returns None without a token.
+    """
+    global _github_client
+    with _github_lock:
+        if _github_client is None and GITHUB_TOKEN:
+            _github_client = Github(
+                auth=Auth.Token(GITHUB_TOKEN),
+                pool_size=MAX_PUSH_WORKERS,
+                retry=GithubRetry(total=5, secondary_rate_wait=60, max_rate_limit_wait=900),
+            )
+        return _github_client
+
+def get_github_repo(full_name):
+    """A repo's metadata, fetched once per process."""
+    with _github_lock:
+        if full_name in _github_repos:
+            return _github_repos[full_name]
+    repo = get_github_client().get_repo(full_name)
+    with _github_lock:
+        return _github_repos.setdefault(full_name, repo)
+
+def _auth_url(repo_url):
+    """Adds the token to GitHub HTTPS URLs; local paths and other URLs are used as given."""
+    if not repo_url.startswith("https://"):
+        return repo_url
+    clean_url = repo_url.replace("https://", "")
+    return f"https://{GITHUB_TOKEN}@{clean_url}"
+
 class GitManager:
-    def __init__(self, workspace_path="./agent_workspace"):
+    def __init__(self, workspace_path="./agent_workspace", mirror_dir=MIRROR_DIR):
         self.workspace_path = workspace_path
+        self.mirror_dir = mirror_dir
         self.current_repo = None
-        
-        if GITHUB_TOKEN:
-            auth = Auth.Token(GITHUB_TOKEN)
-            self.github_client = Github(auth=auth)
-        else:
+
+        self.github_client = get_github_client()
+        if self.github_client is None:
             print("⚠️ WARNING: GITHUB_TOKEN not found.")
-        
-        self._clear_workspace()
+
+    def open_repo(self):
+        """Uses the git repo already in the workspace (e.g. after a resurrection run)."""
+        self.current_repo = Repo(self.workspace_path)
+        return self.current_repo
+
+    def has_github_remote(self):
+        try:
+            return "github.com" in self.current_repo.remote(name='origin').url
+        except Exception:
+            return False
 
     def _clear_workspace(self):
         if os.path.exists(self.workspace_path):
             shutil.rmtree(self.workspace_path)
         os.makedirs(self.workspace_path)
 
-    def clone_repo(self, repo_url: str):
+    def _existing_clone(self, auth_url):
+        """The workspace's repo if it is already a clone of `auth_url`, else None."""
+        if not os.path.isdir(os.path.join(self.workspace_path, ".git")):
+            return None
+        try:
+            repo = Repo(self.workspace_path)
+            return repo if repo.remote("origin").url == auth_url else None
+        except Exception:
+            return None
+
+    def _reset_clone(self, repo, depth=None, filter=None, sparse_paths=None, mirror=None):
+        """
+        Brings an existing clone back to the remote's default branch: only new
+        objects are downloaded, only changed files rewritten. The clone options
+        of this call replace the ones it was first cloned with.
+        """
+        if mirror:
+            alternates = os.path.join(repo.git_dir, "objects", "info", "alternates")
+            existing = open(alternates).read().split() if os.path.exists(alternates) else []
+            objects = os.path.join(mirror, "objects")
+            if objects not in existing:
+                with open(alternates, "a") as f:
+                    f.write(objects + "\n")
+        if filter:
+            # Turns a full clone into a partial one: later fetches skip the filtered objects
+            with repo.config_writer() as git_config:
+                git_config.set_value('remote "origin"', 'promisor', 'true')
+                git_config.set_value('remote "origin"', 'partialclonefilter', filter)
+        if depth:
+            repo.remote("origin").fetch(prune=True, depth=depth)
+        else:
+            repo.remote("origin").fetch(prune=True)
+        try:
+            default = repo.git.symbolic_ref("refs/remotes/origin/HEAD", short=True)
+        except Exception:
+            repo.git.remote("set-head", "origin", "--auto")
+            default = repo.git.symbolic_ref("refs/remotes/origin/HEAD", short=True)
+        repo.git.checkout("--force", "-B", default.split("/", 1)[1], default)
+        # Read through git: newer versions keep core.sparseCheckout in the worktree config
+        sparse = repo.git.config("--bool", "--default", "false", "core.sparseCheckout") == "true"
+        if sparse_paths:
+            repo.git.sparse_checkout("set", "--no-cone", *sparse_paths)
+        elif sparse:
+            repo.git.sparse_checkout("disable")
+        repo.git.clean("-ffdx")
+
+    def _mirror(self, repo_url, auth_url):
+        """
+        A bare mirror of the repo in the local cache: cloned the first time,
+        refreshed with a fetch after that. Returns its path.
+        """
+        name = re.sub(r"[^\w.-]+", "_", re.sub(r"^\w+://", "", repo_url)).strip("_")
+        path = os.path.abspath(os.path.join(self.mirror_dir, f"{name}.git"))
+        with _mirror_locks_guard:
+            lock = _mirror_locks.setdefault(path, threading.Lock())
+        with lock:
+            if os.path.exists(os.path.join(path, "HEAD")):
+                Repo(path).git.fetch("--prune", "origin")
+            else:
+                print(f"🪞 Creating mirror of {repo_url}...")
+                mirror = Repo.clone_from(auth_url, path, mirror=True)
+                # Clones borrow these objects, so they must never be pruned
+                with mirror.config_writer() as git_config:
+                    git_config.set_value('gc', 'pruneExpire', 'never')
+        return path
+
+    def clone_repo(self, repo_url: str, depth=None, filter=None, sparse_paths=None, use_mirror=False):
+        """
+        Clones `repo_url` into the workspace, or refreshes an existing clone of it.
+        - depth: shallow clone with this many commits (e.g. 1)
+        - filter: partial clone filter, e.g. "blob:none" (file contents fetched on checkout)
+        - sparse_paths: only check out these files/directories (e.g. the ones in the traceback)
+        - use_mirror: borrow objects from a local bare mirror (--reference), refreshed by a fetch
+        """
+        auth_url = _auth_url(repo_url)
+
+        existing = self._existing_clone(auth_url)
+        if existing is not None:
+            try:
+                print(f"♻️  Reusing clone of {repo_url}...")
+                mirror = self._mirror(repo_url, auth_url) if use_mirror else None
+                self._reset_clone(existing, depth=depth, filter=filter, sparse_paths=sparse_paths, mirror=mirror)
+                self.current_repo = existing
+                return f"✅ Updated existing clone of {repo_url}"
+            except Exception as e:
+                print(f"⚠️ Could not reuse clone ({e}), cloning again")
+
         print(f"📥 Cloning {repo_url}...")
         self._clear_workspace()
-        clean_url = repo_url.replace("https://", "")
-        auth_url = f"https://{GITHUB_TOKEN}@{clean_url}"
-        
         try:
-            self.current_repo = Repo.clone_from(auth_url, self.workspace_path)
+            options = {}
+            if depth:
+                options["depth"] = depth
+            if filter:
+                options["filter"] = filter
+            if sparse_paths:
+                options["no_checkout"] = True
+            if use_mirror:
+                options["reference"] = self._mirror(repo_url, auth_url)
+            self.current_repo = Repo.clone_from(auth_url, self.workspace_path, **options)
+            if sparse_paths:
+                self.current_repo.git.sparse_checkout("set", "--no-cone", *sparse_paths)
+                self.current_repo.git.checkout(self.current_repo.active_branch.name)
             with self.current_repo.config_writer() as git_config:
                 git_config.set_value('user', 'email', 'agent@resurrector.bot')
                 git_config.set_value('user', 'name', 'Resurrector Agent')
@@ -54,20 +206,67 @@ class GitManager:
             self.current_repo.index.commit(message)
             origin = self.current_repo.remote(name='origin')
             branch = self.current_repo.active_branch
-            origin.push(refspec=f'{branch}:{branch}')
-            return "🚀 Changes pushed to GitHub"
+            for attempt in range(PUSH_ATTEMPTS):
+                try:
+                    origin.push(refspec=f'{branch}:{branch}').raise_if_error()
+                    break
+                except Exception:
+                    if attempt == PUSH_ATTEMPTS - 1:
+                        raise
+                    time.sleep(2 ** attempt)
+            return "🚀 Changes pushed to GitHub" if self.has_github_remote() else "🚀 Changes pushed"
         except Exception as e:
             return f"❌ Push failed: {e}"
 
-    def create_pr(self, repo_full_name, title, body):
+    def create_pr(self, repo_full_name, title, body, base=None):
+        """Opens a PR from the current branch; `base` defaults to the repo's default branch."""
         try:
-            repo = self.github_client.get_repo(repo_full_name)
+            repo = get_github_repo(repo_full_name)
             pr = repo.create_pull(
                 title=title,
                 body=body,
                 head=str(self.current_repo.active_branch),
-                base="main" 
+                base=base or repo.default_branch
             )
             return f"🎉 PR Created: {pr.html_url}"
         except Exception as e:
-            return f"❌ PR failed: {e}"
\ No newline at end of file
+            return f"❌ PR failed: {e}"
+
+
+def _ship_fix(fix):
+    result = {"workspace": fix["workspace"], "branch": fix.get("branch", "fix/auto-repair"), "push": None, "pr": None}
+    manager = GitManager(fix["workspace"])
+    try:
+        manager.open_repo()
+    except Exception as e:
+        result["push"] = f"❌ Push failed: {e}"
+        return result
+
+    if result["branch"] != str(manager.current_repo.active_branch):
+        branch = manager.create_branch(result["branch"])
+        if branch.startswith("❌"):
+            result["push"] = branch
+            return result
+
+    result["push"] = manager.commit_and_push(fix.get("message", "Fix applied by Resurrector Agent"))
+    if result["push"].startswith("❌"):
+        return result
+    if not manager.has_github_remote():
+        result["pr"] = "⏭️ PR skipped: origin is not a GitHub remote"
+    elif fix.get("repo_full_name"):
+        result["pr"] = manager.create_pr(
+            fix["repo_full_name"], fix.get("title", "Automated fix by Resurrector"), fix.get("body", ""), base=fix.get("base")
+        )
+    return result
+
+def push_batch(fixes, max_workers=MAX_PUSH_WORKERS):
+    """
+    Commits, pushes and opens PRs for many repaired workspaces at once, at most
+    `max_workers` at a time, sharing one GitHub client and its repo metadata.
+    Each fix is a dict with a "workspace" and optionally "branch", "message",
+    "repo_full_name", "title", "body" and "base". Any git remote works for the
+    push; PRs are only opened for GitHub remotes.
+    Returns one {"workspace", "branch", "push", "pr"} result per fix, in input order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_ship_fix, fixes))
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import re
+import shlex
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from code_index import CONTAINER_ROOT, module_name
+
+TEST_IMPACT_DIR = os.path.join(".resurrector_cache", "test_impact")
+
+# A change to any of these can affect every test
+GLOBAL_FILES = {"conftest.py", "pytest.ini", "setup.cfg", "tox.ini", "pyproject.toml"}
+
+EXIT_CODE_RE = re.compile(r"^Exit Code: (-?\d+)")
+FAILED_RE = re.compile(r"^(?:FAILED|ERROR) (\S+)", re.M)
+PYTEST_EXIT_RE = re.compile(r"^PYTEST_EXIT (\d+)", re.M)
+MEASURED_PREFIX = "MEASURED "
+# The sandbox image has no pytest (it is only there if the workspace requires it)
+NO_PYTEST = "No module named pytest"
+# A test file that failed as a whole (collection error, crash) rather than per test
+WHOLE_FILE = "*"
+
+PYTEST = "PYTHONDONTWRITEBYTECODE=1 python -m pytest -q -rfE -p no:cacheprovider"
+NO_TESTS_COLLECTED = 5
+BASELINE_TIMEOUT = 300
+RUN_TIMEOUT = 600
+OUTPUT_BYTES = 16 * 1024
+
+
+def is_test_file(rel_path):
+    name = os.path.basename(rel_path)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def _exit_code(output):
+    match = EXIT_CODE_RE.match(output)
+    return int(match.group(1)) if match else -1
+
+
+def _test_file(test_id):
+    return test_id.split("::")[0]
+
+
+def _shard(tests, count, durations):
+    """Splits tests into `count` shards of about equal baseline duration (longest first)."""
+    shards = [[] for _ in range(min(count, len(tests)))]
+    loads = [0.0] * len(shards)
+    for test in sorted(tests, key=lambda t: -durations.get(t, 1.0)):
+        i = loads.index(min(loads))
+        shards[i].append(test)
+        loads[i] += durations.get(test, 1.0)
+    return shards
+
+
+class ImpactAnalyzer:
+    """
+    Picks the tests a change can affect and runs only those. On a baseline run
+    each test file is run under coverage, so a changed file maps to the tests
+    that executed it; files without coverage data (new files, no coverage in
+    the sandbox) fall back to the tests that import them, directly or not.
+    Tests run as pytest shards spread over the sandbox's container pool, and
+    only tests that pass on the baseline count as failures of the fix.
+    """
+
+    def __init__(self, workspace_path, sandbox, code_index, shards=None, cache_dir=TEST_IMPACT_DIR, baseline_workspace=None):
+        self.workspace_path = os.path.abspath(workspace_path)
+        self.sandbox = sandbox
+        self.code_index = code_index
+        self.shards = shards or sandbox.pool_size
+
+        # Like the repo map, the coverage map lives outside the workspace. A branch
+        # of a workspace (a speculative candidate) uses its parent's baseline.
+        owner = os.path.abspath(baseline_workspace or workspace_path)
+        key = hashlib.sha1(owner.encode("utf-8")).hexdigest()[:16]
+        self.cache_path = os.path.join(cache_dir, f"{key}.json")
+
+    def test_files(self):
+        self.code_index.ensure_built()
+        return sorted(p for p in self.code_index.modules.values() if is_test_file(p))
+
+    # --- BASELINE ---
+    def _load(self, snapshot_id):
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data if data.get("snapshot") == snapshot_id else None
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _measure(self, n, test):
+        """
+        Runs one test file, under coverage if the sandbox has it. Returns a dict
+        with the workspace files it executed (None without coverage; files
+        coverage only found on disk have no lines and are left out), the test
+        ids that failed, the pytest exit code (None if it could not run) and seconds.
+        """
+        data_file = f"/tmp/.resurrector_coverage_{n}"
+        log_file = f"/tmp/.resurrector_pytest_{n}"
+        report = (
+            "import coverage, json; d = coverage.CoverageData(basename=%r); d.read(); "
+            "print(%r + json.dumps(sorted(f for f in d.measured_files() if d.lines(f))))" % (data_file, MEASURED_PREFIX)
+        )
+        command = (
+            f"if python -c 'import coverage' 2>/dev/null; then RUN='python -m coverage run --source={CONTAINER_ROOT}'; else RUN=python; fi; "
+            f"COVERAGE_FILE={data_file} {PYTEST.replace('python', '$RUN', 1)} {shlex.quote(test)} >{log_file} 2>&1; "
+            f"echo \"PYTEST_EXIT $?\"; grep -E '^(FAILED|ERROR) |{NO_PYTEST}' {log_file}; "
+            f"[ -f {data_file} ] && python -c {shlex.quote(report)}; rm -f {data_file} {log_file}"
+        )
+        started = time.time()
+        output = self.sandbox.run_command(command, timeout=BASELINE_TIMEOUT, max_output=256 * 1024)
+        result = {"files": None, "failed": FAILED_RE.findall(output), "exit": None, "seconds": time.time() - started}
+
+        exit_match = PYTEST_EXIT_RE.search(output)
+        if exit_match and NO_PYTEST not in output:
+            result["exit"] = int(exit_match.group(1))
+        for line in output.splitlines():
+            if line.startswith(MEASURED_PREFIX):
+                files = json.loads(line[len(MEASURED_PREFIX):])
+                result["files"] = sorted(f[len(CONTAINER_ROOT):] for f in files if f.startswith(CONTAINER_ROOT))
+        return result
+
+    def collect_baseline(self, snapshot_id):
+        """
+        Builds the coverage map for the workspace as of `snapshot_id` (before
+        any fix), reusing the stored one if it is for the same snapshot.
+        """
+        data = self._load(snapshot_id)
+        if data is not None:
+            return data
+        tests = self.test_files()
+        # "failing": per test file, the ids already failing before the fix (WHOLE_FILE if it failed as a whole)
+        data = {"snapshot": snapshot_id, "available": bool(tests), "coverage": {}, "durations": {}, "failing": {}}
+        if tests:
+            started = time.time()
+            with ThreadPoolExecutor(max_workers=self.shards) as pool:
+                results = list(pool.map(self._measure, range(len(tests)), tests))
+            for test, result in zip(tests, results):
+                if result["exit"] is None:
+                    data["available"] = False
+                    continue
+                data["durations"][test] = round(result["seconds"], 3)
+                if result["files"] is not None:
+                    data["coverage"][test] = result["files"]
+                if result["exit"] not in (0, NO_TESTS_COLLECTED):
+                    data["failing"][test] = result["failed"] or [WHOLE_FILE]
+            if data["available"]:
+                print(f"🧪 Test baseline: {len(data['coverage'])}/{len(tests)} test files with coverage, "
+                      f"{len(data['failing'])} already failing, in {time.time() - started:.1f}s")
+            else:
+                print("🧪 Test baseline: pytest is not available in the sandbox; impacted tests are skipped")
+        self._save(data)
+        return data
+
+    # --- SELECTION ---
+    def _importing_tests(self, rel_path, tests):
+        """Tests that import a file's module, directly or through other workspace modules."""
+        seen, frontier = {rel_path}, [rel_path]
+        while frontier:
+            for importer in self.code_index.importers.get(module_name(frontier.pop()), ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    frontier.append(importer)
+        return {p for p in seen if p in tests}
+
+    def select(self, changed_files, snapshot_id=None):
+        """
+        The test files affected by `changed_files` and how they were chosen:
+        "full" (a conftest/config change), "impact" or "none" (no tests at all).
+        """
+        tests = self.test_files()
+        if not tests:
+            return [], "none"
+        changed = [os.path.normpath(p) for p in changed_files]
+        if any(os.path.basename(p) in GLOBAL_FILES or os.path.basename(p).startswith("requirements") for p in changed):
+            return tests, "full"
+
+        covered_by = defaultdict(set)
+        for test, files in ((self._load(snapshot_id) or {}).get("coverage") or {}).items():
+            for path in files:
+                covered_by[path].add(test)
+
+        test_set = set(tests)
+        selected = {p for p in changed if p in test_set}
+        for path in changed:
+            if not path.endswith(".py") or path in test_set:
+                continue
+            selected |= covered_by[path] if path in covered_by else self._importing_tests(path, test_set)
+        return sorted(selected), "impact"
+
+    # --- RUN ---
+    def _preexisting(self, failure, baseline):
+        """Whether a failing test id (or a shard's failed files) already failed on the baseline."""
+        failing = baseline.get("failing") or {}
+        if "::" in failure:
+            known = failing.get(_test_file(failure), [])
+            return failure in known or WHOLE_FILE in known
+        return all(test in failing for test in failure.split(" (exit ")[0].split())
+
+    def run(self, tests, snapshot_id=None, timeout=RUN_TIMEOUT):
+        """
+        Runs the tests as parallel pytest shards. Returns pass/fail with the test
+        ids that newly fail (`failed`) and those that failed before the fix too
+        (`preexisting`), or None if the tests could not run at all (no pytest,
+        sandbox error).
+        """
+        baseline = self._load(snapshot_id) or {}
+        shards = _shard(tests, self.shards, baseline.get("durations") or {})
+        started = time.time()
+
+        def run_shard(shard):
+            command = f"{PYTEST} {' '.join(shlex.quote(t) for t in shard)}"
+            return shard, self.sandbox.run_command(command, timeout=timeout, max_output=OUTPUT_BYTES)
+
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            results = list(pool.map(run_shard, shards))
+
+        failed, preexisting, failures = [], [], []
+        for shard, output in results:
+            code = _exit_code(output)
+            if code < 0 or NO_PYTEST in output:
+                print(f"⚠️ Impacted tests unavailable: {output[:200]}")
+                return None
+            if code in (0, NO_TESTS_COLLECTED):
+                continue
+            new = []
+            for failure in FAILED_RE.findall(output) or [f"{' '.join(shard)} (exit {code})"]:
+                (preexisting if self._preexisting(failure, baseline) else new).append(failure)
+            if new:
+                failed.extend(new)
+                failures.append(output)
+        return {
+            "passed": not failed,
+            "tests": len(tests),
+            "shards": len(shards),
+            "failed": failed,
+            "preexisting": preexisting,
+            "duration": round(time.time() - started, 2),
+            "output": "\n".join(failures)[-OUTPUT_BYTES:],
+        }
+
+    def verify(self, changed_files, snapshot_id=None):
+        """
+        Selects and runs the tests affected by a change. None if nothing needs
+        to run, or if there is no baseline to tell new failures from old ones.
+        """
+        baseline = self._load(snapshot_id)
+        if baseline is None:
+            print(f"🧪 No test baseline for snapshot {(snapshot_id or '')[:12]}; impacted tests skipped")
+            return None
+        if not baseline.get("available"):
+            return None
+        tests, strategy = self.select(changed_files, snapshot_id)
+        if not tests:
+            return None
+        result = self.run(tests, snapshot_id)
+        if result is None:
+            return None
+        result["strategy"] = strategy
+        result["selected"] = tests
+        return result
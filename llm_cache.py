@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from langchain_core.messages import messages_from_dict, message_to_dict
+
+
+def _normalize_messages(messages):
+    """
+    Reduces messages to what the model actually sees. Run-specific noise
+    (message ids, random tool-call ids, usage metadata) is dropped so that
+    re-runs of the same incident produce the same key.
+    """
+    call_ids = {}
+    normalized = []
+    for message in messages:
+        entry = {"type": message.type, "content": message.content}
+        tool_calls = getattr(message, "tool_calls", None) or []
+        if tool_calls:
+            entry["tool_calls"] = []
+            for call in tool_calls:
+                call_ids.setdefault(call.get("id"), f"call_{len(call_ids)}")
+                entry["tool_calls"].append({"name": call["name"], "args": call["args"], "id": call_ids[call.get("id")]})
+        if message.type == "tool":
+            entry["tool_call_id"] = call_ids.get(message.tool_call_id, message.tool_call_id)
+            entry["name"] = message.name
+        normalized.append(entry)
+    return normalized
+
+
+def model_fingerprint(model):
+    """Model name, sampling settings and bound tool schemas of a chat model or tool binding."""
+    bound = getattr(model, "bound", model)
+    kwargs = getattr(model, "kwargs", {}) or {}
+    return {
+        "model": getattr(bound, "model", None) or getattr(bound, "model_name", None) or type(bound).__name__,
+        "temperature": getattr(bound, "temperature", None),
+        "tools": kwargs.get("tools"),
+    }
+
+
+class LLMCache:
+    """
+    A persistent SQLite cache of chat responses, keyed on the normalized
+    prompt, the tool schema and the model. Entries expire after `ttl_seconds`
+    and the least recently used are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path=".resurrector_cache/llm_cache.sqlite", ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    def key(self, model, messages):
+        payload = {"model": model_fingerprint(model), "messages": _normalize_messages(messages)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        # Fresh ids, so a replayed response never replaces a message already in the state
+        response = messages_from_dict([json.loads(row[0])])[0]
+        tool_calls = [dict(call, id=f"call_{uuid.uuid4().hex[:12]}") for call in getattr(response, "tool_calls", None) or []]
+        return response.model_copy(update={"id": None, "tool_calls": tool_calls})
+
+    def put(self, key, response):
+        now = time.time()
+        data = json.dumps(message_to_dict(response))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, data, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,25 +1,185 @@
+import atexit
+import glob
+import gzip
+import json
 import os
-from datetime import datetime
+import queue
+import shutil
+import threading
+import time
 from langchain_core.messages import AIMessage  # ✅ Added this import
 
+
 class ThoughtLogger:
-    def __init__(self, log_dir="logs"):
+    """
+    Structured, buffered run log. Records (incident id, node, step, latency,
+    token counts, payload size and content) are queued by the caller and
+    written as JSONL by a background thread, which flushes every
+    `flush_records` records or `flush_interval` seconds. Past `max_bytes` the
+    file is gzipped into numbered backups (`backup_count` are kept).
+    """
+
+    def __init__(self, log_dir="logs", run_store=None, incident_id="default",
+                 flush_records=200, flush_interval=1.0, max_bytes=10 * 1024 * 1024, backup_count=5):
         self.log_dir = log_dir
         if not os.path.exists(self.log_dir):
-            os.makedirs(self.log_dir)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = os.path.join(self.log_dir, f"resurrector_log_{timestamp}.txt")
+            os.makedirs(self.log_dir, exist_ok=True)
+
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self.log_file = os.path.join(self.log_dir, f"resurrector_log_{timestamp}_{os.getpid()}.jsonl")
+        # Optional RunStore: records also go there (one transaction per flush) so the dashboard can tail them
+        self.run_store = run_store
+        self.incident_id = incident_id
+
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue = queue.Queue()
+        self._file = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name="thought-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Producer side (called from the agent, never blocks on I/O) ---
+    def log_record(self, category, content="", incident_id=None, node=None, step=None,
+                   latency=None, input_tokens=None, output_tokens=None, **data):
+        if self._closed:
+            return
+        content = content if isinstance(content, str) else str(content)
+        record = {
+            "ts": time.time(),
+            "incident_id": incident_id or self.incident_id,
+            "category": category,
+            "node": node,
+            "step": step,
+            "latency": latency,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "payload_bytes": len(content.encode("utf-8")),
+            "content": content,
+        }
+        record.update(data)
+        self._queue.put({k: v for k, v in record.items() if v is not None})
 
     def log_event(self, category, content):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        with open(self.log_file, "a") as f:
-            f.write(f"[{timestamp}] [{category.upper()}]\n{content}\n")
-            f.write("-" * 50 + "\n")
-
-    def log_state(self, state):
-        if state.get("messages"):
-            last_msg = state["messages"][-1]
-            # Now AIMessage is defined for this check
-            role = "AI" if isinstance(last_msg, AIMessage) else "System/Tool/Human"
-            self.log_event(role, getattr(last_msg, 'content', str(last_msg)))
\ No newline at end of file
+        self.log_record(category.lower(), content)
+
+    def log_state(self, state, node=None, step=None, incident_id=None):
+        """Logs the newest message of a graph state: role, content, tool calls and token usage."""
+        if not state.get("messages"):
+            return
+        last_msg = state["messages"][-1]
+        role = "AI" if isinstance(last_msg, AIMessage) else "System/Tool/Human"
+        usage = getattr(last_msg, "usage_metadata", None) or {}
+        self.log_record(
+            role.lower(), getattr(last_msg, 'content', str(last_msg)),
+            incident_id=incident_id, node=node, step=len(state["messages"]) if step is None else step,
+            input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"),
+            tool_calls=[c["name"] for c in getattr(last_msg, "tool_calls", None) or []] or None,
+            review_status=state.get("review_status"),
+        )
+
+    def flush(self, timeout=5.0):
+        """Blocks until every record queued so far is on disk."""
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    # --- Writer thread ---
+    def _writer(self):
+        buffer = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                item = False
+
+            if isinstance(item, dict):
+                buffer.append(item)
+                if len(buffer) < self.flush_records and time.monotonic() < deadline:
+                    continue
+            self._write(buffer)
+            buffer = []
+            deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                if self._file:
+                    self._file.close()
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.log_file, "a")
+            self._file.write("".join(json.dumps(r, default=str) + "\n" for r in records))
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            print(f"⚠️ Log write failed: {e}")
+
+        if self.run_store is not None:
+            try:
+                self.run_store.append_many([
+                    (r["ts"], r["incident_id"], r["category"], r["content"],
+                     {k: v for k, v in r.items() if k not in ("ts", "incident_id", "category", "content")})
+                    for r in records
+                ])
+            except Exception as e:
+                print(f"⚠️ Run store error: {e}")
+
+    def _backup(self, n):
+        return f"{self.log_file}.{n}.gz"
+
+    def _rotate(self):
+        """Compresses the full log into backup 1, shifting older backups up and dropping the oldest."""
+        self._file.close()
+        self._file = None
+        for n in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self._backup(n)):
+                os.replace(self._backup(n), self._backup(n + 1))
+        with open(self.log_file, "rb") as src, gzip.open(self._backup(1), "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.log_file)
+        for stale in glob.glob(f"{self.log_file}.*.gz"):
+            if int(stale.rsplit(".", 2)[1]) > self.backup_count:
+                os.remove(stale)
+
+    # --- Reading back ---
+    def records(self):
+        """Every record, oldest first, across the compressed backups and the live file."""
+        self.flush()
+        for n in range(self.backup_count, 0, -1):
+            if os.path.exists(self._backup(n)):
+                with gzip.open(self._backup(n), "rt") as f:
+                    yield from (json.loads(line) for line in f if line.strip())
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "r") as f:
+                yield from (json.loads(line) for line in f if line.strip())
+
+    def export_jsonl(self, path):
+        """Writes every record (backups included) to one uncompressed JSONL file. Returns the record count."""
+        count = 0
+        with open(path, "w") as f:
+            for record in self.records():
+                f.write(json.dumps(record, default=str) + "\n")
+                count += 1
+        return count
@@ -1,71 +1,192 @@
 import time
 import json
 import os
+import threading
+from collections import defaultdict
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize_calls(calls):
+    """Count, error/retry totals, tokens and latency p50/p95/p99 for a list of call records."""
+    latencies = [c["latency"] for c in calls]
+    return {
+        "count": len(calls),
+        "errors": sum(1 for c in calls if c["error"]),
+        "retries": sum(c["retries"] for c in calls),
+        "input_tokens": sum(c["input_tokens"] for c in calls),
+        "output_tokens": sum(c["output_tokens"] for c in calls),
+        "latency_total": round(sum(latencies), 3),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+    }
+
 
 class ResurrectorTracker:
-    def __init__(self):
-        self.start_time = time.time()
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-        
+    def __init__(self, log_dir="logs", save_interval=1.0):
+        # Reports are rewritten in place while the run is going
+        self.log_dir = log_dir
+        self.save_interval = save_interval
+        self.runs = 0
+        self._lock = threading.Lock()
+        self.reset()
+
         # Current Gemini 2.0 Flash Pricing (Approximate per 1M tokens)
         self.COST_PER_1K_INPUT = 0.0001  # $0.10 per 1M
         self.COST_PER_1K_OUTPUT = 0.0004 # $0.40 per 1M
 
+    def reset(self):
+        """Starts a new run: empty counters, status RUNNING and a report file of its own."""
+        with self._lock:
+            self.start_time = time.time()
+            self.total_input_tokens = 0
+            self.total_output_tokens = 0
+            self.compactions = 0
+            self.compaction_tokens_saved = 0
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.calls = []
+            self.status = "RUNNING"
+            self.runs += 1
+            self.report_path = None
+            self._last_save = 0.0
+
     def track_usage(self, response):
         """
         Scans the AI response for token usage across different metadata schemas.
+        Returns: (input_tokens, output_tokens) for this response.
         """
+        input_tokens, output_tokens = 0, 0
         try:
             # 1. Primary: Check for standard usage_metadata
             if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                self.total_input_tokens += response.usage_metadata.get('input_tokens', 0)
-                self.total_output_tokens += response.usage_metadata.get('output_tokens', 0)
-                return
+                input_tokens = response.usage_metadata.get('input_tokens', 0)
+                output_tokens = response.usage_metadata.get('output_tokens', 0)
 
             # 2. Fallback: Check response_metadata (common in older LangChain-Google versions)
-            if hasattr(response, 'response_metadata'):
+            elif hasattr(response, 'response_metadata'):
                 meta = response.response_metadata
                 usage = meta.get('usage') or meta.get('token_usage')
                 if usage:
-                    self.total_input_tokens += usage.get('prompt_tokens', 0)
-                    self.total_output_tokens += usage.get('completion_tokens', 0)
+                    input_tokens = usage.get('prompt_tokens', 0)
+                    output_tokens = usage.get('completion_tokens', 0)
 
         except Exception as e:
             print(f"⚠️ Telemetry Error: Could not parse tokens - {e}")
 
+        with self._lock:
+            self.total_input_tokens += input_tokens
+            self.total_output_tokens += output_tokens
+        return input_tokens, output_tokens
+
+    def record_call(self, node, latency, incident_id=None, input_tokens=0, output_tokens=0, retries=0, error=None):
+        """Records one LLM call or tool execution and refreshes the report on disk."""
+        with self._lock:
+            self.calls.append({
+                "node": node,
+                "incident_id": incident_id or "default",
+                "timestamp": time.time(),
+                "latency": latency,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "retries": retries,
+                "error": str(error) if error else None,
+            })
+        self._maybe_save()
+
+    def record_compaction(self, stats):
+        """Records how many prompt tokens history compaction saved on one call."""
+        saved = stats["before_tokens"] - stats["after_tokens"]
+        if saved > 0:
+            with self._lock:
+                self.compactions += 1
+                self.compaction_tokens_saved += saved
+
+    def record_cache(self, hit):
+        """Counts one LLM response cache lookup."""
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def _grouped(self, key):
+        groups = defaultdict(list)
+        for call in self.calls:
+            groups[call[key]].append(call)
+        return {name: summarize_calls(calls) for name, calls in sorted(groups.items())}
+
     def get_report(self):
-        """Calculates duration, total tokens, and USD cost."""
+        """Calculates duration, total tokens, USD cost and per-node/per-incident latency."""
         duration = time.time() - self.start_time
-        
+
         input_cost = (self.total_input_tokens / 1000) * self.COST_PER_1K_INPUT
         output_cost = (self.total_output_tokens / 1000) * self.COST_PER_1K_OUTPUT
         total_cost = input_cost + output_cost
-        
+
+        with self._lock:
+            nodes = self._grouped("node")
+            incidents = self._grouped("incident_id")
+
         return {
-            "status": "COMPLETED",
+            "status": self.status,
             "duration_seconds": round(duration, 2),
             "usage": {
                 "input_tokens": self.total_input_tokens,
                 "output_tokens": self.total_output_tokens,
                 "total_tokens": self.total_input_tokens + self.total_output_tokens
             },
+            "compaction": {
+                "calls_compacted": self.compactions,
+                "tokens_saved": self.compaction_tokens_saved
+            },
+            "llm_cache": {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses
+            },
+            "nodes": nodes,
+            "incidents": incidents,
             "estimated_cost_usd": f"${total_cost:.6f}"
         }
 
+    def _maybe_save(self):
+        if self.log_dir and time.time() - self._last_save >= self.save_interval:
+            self.save_report(self.log_dir)
+
+    def finish(self):
+        """Marks the run complete and writes the final report."""
+        self.status = "COMPLETED"
+        return self.save_report(self.log_dir or "logs")
+
     def save_report(self, log_dir="logs"):
         """
-        Saves the metrics to a JSON file. 
+        Saves the metrics to a JSON file.
         The Dashboard reads the latest file to display metrics in the sidebar.
+        Repeated saves overwrite the same file atomically.
         """
         if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
+            os.makedirs(log_dir, exist_ok=True)
+
         report = self.get_report()
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        report_path = os.path.join(log_dir, f"metrics_{timestamp}.json")
-        
-        with open(report_path, "w") as f:
+        with self._lock:
+            if self.report_path is None:
+                # Like the thought logs, the pid keeps parallel processes (benchmark workers) apart
+                timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.start_time))
+                self.report_path = os.path.join(log_dir, f"metrics_{timestamp}_{os.getpid()}_{self.runs}.json")
+            report_path = self.report_path
+            self._last_save = time.time()
+
+        tmp_path = f"{report_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
             json.dump(report, f, indent=4)
-        
-        return report_path
\ No newline at end of file
+        os.replace(tmp_path, report_path)
+
+        return report_path
@@ -0,0 +1,234 @@
+import ast
+import os
+import re
+import shlex
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+# Shell commands the agent must never run
+DANGEROUS_COMMANDS = [
+    (re.compile(r"\brm\s+(-[a-zA-Z]*[rf][a-zA-Z]*\s+)+(/|~|\*|\.\.?)(\s|$)"), "recursive delete of a root/home/workspace path"),
+    (re.compile(r"\bmkfs(\.\w+)?\b"), "filesystem format"),
+    (re.compile(r"\bdd\s+.*\bof=/dev/"), "raw write to a device"),
+    (re.compile(r":\(\)\s*\{\s*:\|:&\s*\};:"), "fork bomb"),
+    (re.compile(r"\b(curl|wget)\b[^|]*\|\s*(sh|bash|python)"), "piping a download into a shell"),
+    (re.compile(r"\bchmod\s+(-R\s+)?777\s+/"), "world-writable root"),
+    (re.compile(r"\bgit\s+push\b.*--force"), "force push"),
+]
+
+# Modules whose use in the fix means it talks to the network or spawns processes
+NETWORK_MODULES = {"socket", "requests", "urllib", "http", "httpx", "aiohttp", "ftplib", "smtplib", "paramiko"}
+SHELL_CALLS = {"os.system", "os.popen", "subprocess.run", "subprocess.call", "subprocess.Popen", "subprocess.check_output", "shutil.rmtree"}
+
+# Exit codes the sandbox reports (see sandbox.ExecResult)
+EXIT_CODE_RE = re.compile(r"^Exit Code: (-?\d+)")
+
+# A pipeline or command list reports the exit code of its last command, not of the script
+COMPOUND_COMMAND_RE = re.compile(r"\||;|&&|&|\n|`|\$\(")
+PYTHON_COMMANDS = {"python", "python3"}
+
+
+def _dotted(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return None
+
+
+def scan_python(source):
+    """AST checks for loops that cannot end, network use and shell-outs. Returns a list of findings."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        return [f"does not parse: {e.msg} (line {e.lineno})"]
+
+    findings = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.While) and isinstance(node.test, ast.Constant) and node.test.value:
+            exits = [n for n in ast.walk(node) if isinstance(n, (ast.Break, ast.Return, ast.Raise))]
+            calls_exit = [n for n in ast.walk(node) if isinstance(n, ast.Call) and _dotted(n.func) in ("sys.exit", "exit", "os._exit")]
+            if not exits and not calls_exit:
+                findings.append(f"infinite loop at line {node.lineno} (while True with no break/return/raise)")
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split(".")[0] in NETWORK_MODULES:
+                    findings.append(f"network import '{alias.name}' at line {node.lineno}")
+        elif isinstance(node, ast.ImportFrom) and node.module and node.module.split(".")[0] in NETWORK_MODULES:
+            findings.append(f"network import '{node.module}' at line {node.lineno}")
+        elif isinstance(node, ast.Call) and _dotted(node.func) in SHELL_CALLS:
+            findings.append(f"shell/filesystem call '{_dotted(node.func)}' at line {node.lineno}")
+    return findings
+
+
+def _strip_line(finding):
+    return re.sub(r"\s*(at )?\(?line \d+\)?", "", finding)
+
+
+def scan_command(command):
+    return [reason for pattern, reason in DANGEROUS_COMMANDS if pattern.search(command)]
+
+
+def _script_path(path):
+    if path.startswith("/app/"):
+        path = path[len("/app/"):]
+    return os.path.normpath(path)
+
+
+def runs_script(command, script=None):
+    """
+    Whether a command is exactly `python <script> [args]`, so its exit code is
+    the script's. Without a `script`, any `python <file>.py [args]` counts.
+    """
+    if COMPOUND_COMMAND_RE.search(command.replace("2>&1", "")):
+        return False
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return False
+    if len(tokens) < 2 or tokens[0] not in PYTHON_COMMANDS:
+        return False
+    if script is None:
+        return tokens[1].endswith(".py")
+    return _script_path(tokens[1]) == _script_path(script)
+
+
+class PreReview:
+    """
+    Deterministic checks that run before the LLM critic. Returns a verdict of
+    "approve", "reject" or "undecided" (ask the LLM) with the reasons behind it.
+    """
+
+    def __init__(self, workspace_path, verify_script=None):
+        self.workspace_path = workspace_path
+        self.verify_script = verify_script
+        self._repo = False
+
+    def _git(self):
+        """The workspace's git repo, or None (cached)."""
+        if self._repo is False:
+            try:
+                from git import Repo
+                self._repo = Repo(self.workspace_path)
+            except Exception:
+                self._repo = None
+        return self._repo
+
+    def original(self, file_path):
+        """A file's content at HEAD; "" for new files, None if there is no git history."""
+        repo = self._git()
+        if repo is None:
+            return None
+        if file_path.startswith("/app/"):
+            file_path = file_path[len("/app/"):]
+        try:
+            return repo.git.show(f"HEAD:{os.path.normpath(file_path)}")
+        except Exception:
+            return ""
+
+    def workspace_diff(self):
+        """
+        Changed files relative to the workspace's git HEAD, mapped to their
+        zero-context diff (None for untracked files). Returns None without git.
+        """
+        repo = self._git()
+        if repo is None:
+            return None
+        try:
+            untracked = repo.untracked_files
+            changed = {}
+            for path in repo.git.diff("HEAD", "--name-only").splitlines() + untracked:
+                if path not in changed:
+                    changed[path] = None if path in untracked else repo.git.diff("HEAD", "--unified=0", "--", path)
+            return changed
+        except Exception:
+            return None
+
+    def _edits_and_runs(self, messages):
+        """
+        Walks the conversation once: every command, every edit, and the index of
+        the last edit and of the last successful run of the verify script.
+        """
+        calls = {}
+        commands, edits = [], []
+        last_edit, last_success = -1, -1
+        for i, message in enumerate(messages):
+            if isinstance(message, AIMessage):
+                for call in message.tool_calls or []:
+                    calls[call["id"]] = call
+                    args = call.get("args") or {}
+                    if call["name"] == "run_command" and isinstance(args.get("command"), str):
+                        commands.append(args["command"])
+                    elif call["name"] == "edit_file":
+                        edits.append(args)
+                        last_edit = i
+            elif isinstance(message, ToolMessage):
+                call = calls.get(message.tool_call_id)
+                if not call or call["name"] != "run_command":
+                    continue
+                match = EXIT_CODE_RE.match(str(message.content))
+                command = (call.get("args") or {}).get("command", "")
+                if match and int(match.group(1)) == 0 and runs_script(command, self.verify_script):
+                    last_success = i
+        return commands, edits, last_edit, last_success
+
+    def assess(self, messages):
+        commands, edits, last_edit, last_success = self._edits_and_runs(messages)
+        blockers, notes = [], []
+
+        # 1. Dangerous commands
+        for command in commands:
+            for reason in scan_command(command):
+                blockers.append(f"command `{command}`: {reason}")
+
+        # 2. Dangerous code the edits introduced (findings already in the original don't count)
+        for args in edits:
+            path, content = str(args.get("file_path", "")), args.get("content")
+            if not (isinstance(content, str) and path.endswith(".py")):
+                continue
+            original = self.original(path)
+            existing = {_strip_line(f) for f in scan_python(original)} if original else set()
+            for finding in scan_python(content):
+                if _strip_line(finding) in existing:
+                    continue
+                # Without history we can't tell new from old, so let the LLM judge
+                (blockers if original is not None else notes).append(f"{path}: {finding}")
+
+        # 3. The workspace must actually differ from the original
+        diff = self.workspace_diff()
+        if diff is not None and not diff:
+            notes.append("workspace has no changes against HEAD")
+
+        # 4. A successful run must come after the last edit
+        if edits and last_success < last_edit:
+            blockers.append("no successful run of the script after the last edit")
+        elif not edits and last_success < 0:
+            blockers.append("no successful run of the script")
+
+        # 5. Without a known entry point, a passing run proves little: let the LLM judge
+        if self.verify_script is None:
+            notes.append("no verify script configured; the successful run may not exercise the failure")
+
+        if blockers:
+            return "reject", blockers
+        if notes:
+            return "undecided", notes
+        return "approve", [f"{len(edits)} edit(s), verified by a successful run after the last edit"]
+
+
+def parse_verdict(content):
+    """
+    Reads the LLM critic's verdict. Only an explicit, un-negated APPROVE counts;
+    "I cannot APPROVE" or any REJECT is a rejection.
+    """
+    text = content.upper()
+    if re.search(r"\bREJECT", text):
+        return "rejected"
+    if re.search(r"\b(NOT|CANNOT|CAN'T|CAN NOT|WON'T|DON'T|DO NOT|UNABLE TO)\s+(YET\s+)?APPROVE", text):
+        return "rejected"
+    if re.search(r"^\W*APPROVE", text) or re.search(r"\bVERDICT\W+APPROVE", text) or re.search(r"\bAPPROVED?\b\W*$", text):
+        return "approved"
+    return "rejected"
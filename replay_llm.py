@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+import uuid
+
+from langchain_core.messages import AIMessage
+
+from context_builder import estimate_tokens
+
+
+class ReplayExhausted(RuntimeError):
+    """The run asked the model for more responses than the recording holds."""
+
+
+def _message_tokens(messages):
+    return sum(estimate_tokens(str(getattr(m, "content", m))) for m in messages)
+
+
+class ReplayChatModel:
+    """
+    Stands in for a chat model by returning recorded responses in order.
+    Token usage is estimated from the prompt so tracker numbers stay meaningful.
+    """
+
+    def __init__(self, responses, name="replay"):
+        self.responses = list(responses)
+        self.name = name
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def invoke(self, messages, config=None, **kwargs):
+        with self._lock:
+            if self.calls >= len(self.responses):
+                raise ReplayExhausted(f"{self.name}: recording has only {len(self.responses)} responses")
+            recorded = self.responses[self.calls]
+            self.calls += 1
+
+        tool_calls = [
+            {"name": call["name"], "args": call.get("args", {}), "id": call.get("id") or f"call_{uuid.uuid4().hex[:12]}"}
+            for call in recorded.get("tool_calls", [])
+        ]
+        usage = recorded.get("usage") or {
+            "input_tokens": _message_tokens(messages),
+            "output_tokens": estimate_tokens(recorded.get("content", "") + json.dumps([c["args"] for c in tool_calls])),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=recorded.get("content", ""), tool_calls=tool_calls, usage_metadata=usage)
+
+
+class RecordingChatModel:
+    """Wraps a live model and appends every response to `log` (shared across bind_tools copies)."""
+
+    def __init__(self, model, log=None):
+        self.model = model
+        self.log = log if log is not None else []
+
+    def bind_tools(self, tools, **kwargs):
+        return RecordingChatModel(self.model.bind_tools(tools, **kwargs), self.log)
+
+    def invoke(self, messages, config=None, **kwargs):
+        response = self.model.invoke(messages, config=config, **kwargs)
+        self.log.append({
+            "content": response.content if isinstance(response.content, str) else str(response.content),
+            "tool_calls": [{"name": c["name"], "args": c["args"]} for c in (response.tool_calls or [])],
+        })
+        return response
+
+
+def load_replay_models(recording_path):
+    """Returns {"reason": ReplayChatModel, "review": ReplayChatModel} from a recording file."""
+    with open(recording_path, "r") as f:
+        recording = json.load(f)
+    return {role: ReplayChatModel(recording.get(role, []), name=f"{os.path.basename(recording_path)}:{role}") for role in ("reason", "review")}
+
+
+def save_recording(recording_path, recorders):
+    """Writes the responses captured by {"reason": RecordingChatModel, "review": ...} to disk."""
+    os.makedirs(os.path.dirname(recording_path) or ".", exist_ok=True)
+    with open(recording_path, "w") as f:
+        json.dump({role: recorder.log for role, recorder in recorders.items()}, f, indent=2)
@@ -1,16 +1,121 @@
 import ast
+import hashlib
 import os
 import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Directories that never contain code worth mapping
+SKIP_DIRS = {".git", "__pycache__", ".venv", "venv", "node_modules", ".tox", ".mypy_cache", ".pytest_cache"}
+
+# Below this many stale files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+
+def _file_hash(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _call_name(func):
+    """Dotted name of a call target (`foo`, `self.foo`, `mod.foo`), or None for computed calls."""
+    parts = []
+    while isinstance(func, ast.Attribute):
+        parts.append(func.attr)
+        func = func.value
+    if isinstance(func, ast.Name):
+        parts.append(func.id)
+    elif parts:
+        parts.append("?")
+    else:
+        return None
+    return ".".join(reversed(parts))
+
+
+def extract_index(tree):
+    """
+    Collects every (nested) class/function with its line range, the file's
+    imports, and call sites tagged with the enclosing symbol.
+    """
+    index = {"symbols": [], "imports": [], "calls": []}
+
+    def visit(node, prefix, scope):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = f"{prefix}{child.name}"
+                start = min([d.lineno for d in child.decorator_list] + [child.lineno])
+                index["symbols"].append({
+                    "name": qualname,
+                    "kind": "class" if isinstance(child, ast.ClassDef) else "function",
+                    "start": start,
+                    "end": child.end_lineno,
+                })
+                visit(child, qualname + ".", qualname)
+                continue
+
+            if isinstance(child, ast.Import):
+                for alias in child.names:
+                    index["imports"].append({"module": alias.name, "level": 0, "names": [], "line": child.lineno})
+            elif isinstance(child, ast.ImportFrom):
+                index["imports"].append({
+                    "module": child.module or "",
+                    "level": child.level,
+                    "names": [alias.name for alias in child.names],
+                    "line": child.lineno,
+                })
+            elif isinstance(child, ast.Call):
+                callee = _call_name(child.func)
+                if callee:
+                    index["calls"].append({"caller": scope, "callee": callee, "line": child.lineno})
+            visit(child, prefix, scope)
+
+    visit(tree, "", "<module>")
+    return index
+
+
+def parse_file(file_path):
+    """
+    Parses one file into its map entry. Module-level so process pool workers can pickle it.
+    Returns: (content_hash, definitions_or_error_string, index_or_None)
+    """
+    try:
+        content_hash = _file_hash(file_path)
+        with open(file_path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        return content_hash, RepoMapper.signatures_from_tree(tree), extract_index(tree)
+    except Exception as e:
+        return None, f"Error parsing: {str(e)}", None
+
 
 class RepoMapper:
-    def __init__(self, root_dir="./agent_workspace"):
+    CACHE_VERSION = 2
+
+    def __init__(self, root_dir="./agent_workspace", cache_dir=".resurrector_cache", workers=None):
         self.root_dir = root_dir
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._dirty = False
 
-    def get_signatures(self, file_path):
+        # The cache lives outside the workspace so it never ends up in a commit
+        self.cache_path = None
+        if cache_dir:
+            root_key = hashlib.sha1(os.path.abspath(root_dir).encode("utf-8")).hexdigest()[:16]
+            self.cache_path = os.path.join(cache_dir, f"repo_map_{root_key}.json")
+        self._entries = self._load_cache()
+
+    @staticmethod
+    def get_signatures(file_path):
         """Extracts class and function signatures using AST."""
         with open(file_path, "r", encoding="utf-8") as f:
             node = ast.parse(f.read())
+        return RepoMapper.signatures_from_tree(node)
 
+    @staticmethod
+    def signatures_from_tree(node):
         definitions = {
             "classes": [],
             "functions": [],
@@ -22,7 +127,7 @@ class RepoMapper:
             if isinstance(item, ast.FunctionDef):
                 args = [arg.arg for arg in item.args.args]
                 definitions["functions"].append(f"{item.name}({', '.join(args)})")
-            
+
             # Extract Classes
             elif isinstance(item, ast.ClassDef):
                 class_methods = [
@@ -32,28 +137,136 @@ class RepoMapper:
                     "name": item.name,
                     "methods": class_methods
                 })
-            
+
             # Extract Imports (to track dependencies)
             elif isinstance(item, (ast.Import, ast.ImportFrom)):
                 definitions["imports"].append(ast.dump(item))
 
         return definitions
 
-    def generate_map(self):
-        """Walks the repo and creates a global JSON map."""
-        repo_map = {}
-        for root, _, files in os.walk(self.root_dir):
+    # --- CACHE ---
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != self.CACHE_VERSION:
+                return {}
+            return data.get("files", {})
+        except Exception:
+            return {}
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with self._lock:
+            data = {"version": self.CACHE_VERSION, "files": dict(self._entries)}
+            self._dirty = False
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _iter_python_files(self):
+        for root, dirs, files in os.walk(self.root_dir):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
             for file in files:
                 if file.endswith(".py"):
-                    rel_path = os.path.relpath(os.path.join(root, file), self.root_dir)
-                    try:
-                        repo_map[rel_path] = self.get_signatures(os.path.join(root, file))
-                    except Exception as e:
-                        repo_map[rel_path] = f"Error parsing: {str(e)}"
-        
+                    full_path = os.path.join(root, file)
+                    yield os.path.relpath(full_path, self.root_dir), full_path
+
+    def _is_fresh(self, entry, stat):
+        return entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def _store(self, rel_path, stat, content_hash, definitions, index):
+        with self._lock:
+            self._entries[rel_path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "hash": content_hash,
+                "definitions": definitions,
+                "index": index,
+            }
+            self._dirty = True
+
+    def refresh_file(self, file_path):
+        """
+        Re-parses a single file, e.g. right after edit_file. Accepts a path
+        relative to the workspace. Deleted files are dropped from the map.
+        """
+        if file_path.startswith("/app/"):
+            file_path = file_path[len("/app/"):]
+        rel_path = os.path.normpath(file_path)
+        full_path = os.path.join(self.root_dir, rel_path)
+        if not os.path.exists(full_path):
+            with self._lock:
+                if self._entries.pop(rel_path, None) is not None:
+                    self._dirty = True
+            return None
+
+        stat = os.stat(full_path)
+        self._store(rel_path, stat, *parse_file(full_path))
+        return self._entries[rel_path]["definitions"]
+
+    def generate_map(self):
+        """Walks the repo and creates a global JSON map, re-parsing only changed files."""
+        stale = []
+        seen = set()
+        for rel_path, full_path in self._iter_python_files():
+            seen.add(rel_path)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            entry = self._entries.get(rel_path)
+            if self._is_fresh(entry, stat):
+                continue
+
+            # mtime moved but content may not have (checkout, touch): compare hashes first
+            if entry and entry.get("hash"):
+                try:
+                    if _file_hash(full_path) == entry["hash"]:
+                        self._store(rel_path, stat, entry["hash"], entry["definitions"], entry.get("index"))
+                        continue
+                except OSError:
+                    pass
+            stale.append((rel_path, full_path, stat))
+
+        # 1. Parse changed files (in parallel on a cold start)
+        if len(stale) >= PARALLEL_THRESHOLD:
+            # Not fork: the agent is multi-threaded, and a forked child can inherit a held lock
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                parsed = pool.map(parse_file, [full_path for _, full_path, _ in stale], chunksize=32)
+                for (rel_path, _, stat), result in zip(stale, parsed):
+                    self._store(rel_path, stat, *result)
+        else:
+            for rel_path, full_path, stat in stale:
+                self._store(rel_path, stat, *parse_file(full_path))
+
+        # 2. Forget files that were deleted
+        with self._lock:
+            for rel_path in [p for p in self._entries if p not in seen]:
+                del self._entries[rel_path]
+                self._dirty = True
+            repo_map = {rel_path: entry["definitions"] for rel_path, entry in self._entries.items()}
+
+        if self._dirty:
+            self.save_cache()
         return repo_map
 
+    def get_map(self):
+        """The map as of the last generate_map or refresh_file, without walking the tree."""
+        with self._lock:
+            return {rel_path: entry["definitions"] for rel_path, entry in self._entries.items()}
+
+    def get_index(self):
+        """Per-file symbol/import/call data from the last generate_map or refresh_file."""
+        with self._lock:
+            return {rel_path: entry.get("index") for rel_path, entry in self._entries.items() if entry.get("index")}
+
 # Simple test execution
 if __name__ == "__main__":
     mapper = RepoMapper()
-    print(json.dumps(mapper.generate_map(), indent=2))
\ No newline at end of file
+    print(json.dumps(mapper.generate_map(), indent=2))
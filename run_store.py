@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RUN_STORE_PATH = os.path.join(".resurrector_cache", "runs.sqlite")
+
+
+class RunStore:
+    """
+    An append-only SQLite log of run events (node steps, tool calls, verdicts)
+    plus the latest status of every incident. Readers tail it by event id, so
+    they only ever read what is new.
+    """
+
+    def __init__(self, path=RUN_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                incident_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                message TEXT NOT NULL,
+                data TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_incident ON events (incident_id, id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS incidents (
+                incident_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                workspace TEXT,
+                started_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_event_id INTEGER
+            )
+        """)
+        self._conn.commit()
+
+    def append(self, incident_id, kind, message="", **data):
+        """Records one event. Returns its id."""
+        return self.append_many([(time.time(), incident_id, kind, message, data)])
+
+    def append_many(self, events):
+        """Records (ts, incident_id, kind, message, data) events in one transaction. Returns the last id."""
+        event_id = None
+        with self._lock:
+            for ts, incident_id, kind, message, data in events:
+                cursor = self._conn.execute(
+                    "INSERT INTO events (ts, incident_id, kind, message, data) VALUES (?, ?, ?, ?, ?)",
+                    (ts, incident_id or "default", kind, message, json.dumps(data, default=str) if data else None)
+                )
+                event_id = cursor.lastrowid
+                self._conn.execute(
+                    "UPDATE incidents SET updated_at = ?, last_event_id = ? WHERE incident_id = ?",
+                    (ts, event_id, incident_id or "default")
+                )
+            self._conn.commit()
+        return event_id
+
+    def set_status(self, incident_id, status, workspace=None):
+        """Updates an incident's status (creating it on first use) and logs the change as an event."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO incidents (incident_id, status, workspace, started_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (incident_id) DO UPDATE SET
+                    status = excluded.status,
+                    workspace = COALESCE(excluded.workspace, incidents.workspace),
+                    updated_at = excluded.updated_at
+            """, (incident_id or "default", status, workspace, now, now))
+            self._conn.commit()
+        return self.append(incident_id, "status", status)
+
+    def tail(self, after_id=0, incident_id=None, limit=500):
+        """Events newer than `after_id`, oldest first, optionally for one incident."""
+        query = "SELECT * FROM events WHERE id > ?"
+        params = [after_id]
+        if incident_id:
+            query += " AND incident_id = ?"
+            params.append(incident_id)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row, data=json.loads(row["data"]) if row["data"] else {}) for row in rows]
+
+    def start_id(self, count, incident_id=None):
+        """The `after_id` that makes tail() start at the newest `count` events, optionally for one incident."""
+        query = "SELECT id FROM events"
+        params = []
+        if incident_id:
+            query += " WHERE incident_id = ?"
+            params.append(incident_id)
+        query += " ORDER BY id DESC LIMIT 1 OFFSET ?"
+        params.append(count)
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return row["id"] if row else 0
+
+    def incidents(self):
+        """Every incident's latest status, most recently updated first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM incidents ORDER BY updated_at DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,58 +1,562 @@
+import atexit
 import docker
 import os
-import tarfile
-import io
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from dependency_cache import DependencyCache, DEPENDENCY_CACHE_ENABLED
+
+# One Docker client per process. docker.from_env() opens a new connection pool
+# every time, so the sandbox and the pool share this one.
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_docker_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = docker.from_env()
+        return _client
+
+
+# Python user base shared by a pool's containers (pip installs land here)
+USER_BASE = "/deps"
+
+
+class ContainerPool:
+    """
+    A fixed-size pool of long-lived containers bound to one workspace.
+    Containers idle on `sleep infinity` and commands run through `exec_run`,
+    so the per-call cost is an exec instead of a full container start.
+    `mounts` and `environment` are passed to every container (e.g. the wheelhouse).
+
+    The containers share one volume as their Python user base, and pip installs
+    there by default. A `pip install` in one container is therefore visible to
+    the others and survives recycling, so results don't depend on which
+    container a command lands in.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, workspace_path, image="python:3.12-alpine", size=2, max_uses=25, mounts=None, environment=None):
+        self.client = get_docker_client()
+        self.workspace_path = os.path.abspath(workspace_path)
+        self.image = image
+        self.size = size
+        self.max_uses = max_uses
+        self.mounts = mounts or {}
+        self.environment = environment or {}
+
+        self._idle = queue.Queue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.startup_seconds = []
+
+        self.site_volume = self.client.volumes.create(
+            name=f"resurrector-site-{uuid.uuid4().hex[:12]}",
+            labels={"resurrector.pool": self.workspace_path}
+        )
+
+        for _ in range(self.size):
+            self._idle.put(self._start_container())
+
+    @classmethod
+    def for_workspace(cls, workspace_path, **kwargs):
+        """
+        Returns the shared pool for a workspace, creating it on first use. A
+        pool on a different image (e.g. the requirements changed) is replaced.
+        """
+        key = os.path.abspath(workspace_path)
+        stale = None
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is not None and not pool._closed and pool.image != kwargs.get("image", pool.image):
+                stale, pool = pool, None
+            if pool is None or pool._closed:
+                pool = cls(key, **kwargs)
+                cls._pools[key] = pool
+        if stale is not None:
+            stale.close()
+        return pool
+
+    @classmethod
+    def shutdown(cls, workspace_path):
+        """Closes the pool for one workspace, if any."""
+        with cls._pools_lock:
+            pool = cls._pools.pop(os.path.abspath(workspace_path), None)
+        if pool is not None:
+            pool.close()
+
+    @classmethod
+    def shutdown_all(cls):
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+            cls._pools.clear()
+        for pool in pools:
+            pool.close()
+
+    def _start_container(self):
+        started = time.time()
+        container = self.client.containers.run(
+            self.image,
+            command=["sleep", "infinity"],
+            working_dir="/app",
+            detach=True,
+            labels={"resurrector.pool": self.workspace_path},
+            environment={"PYTHONUSERBASE": USER_BASE, "PIP_USER": "1", **self.environment},
+            volumes={
+                self.workspace_path: {'bind': '/app', 'mode': 'rw'},
+                self.site_volume.name: {'bind': USER_BASE, 'mode': 'rw'},
+                **self.mounts
+            }
+        )
+        self.startup_seconds.append(time.time() - started)
+        with self._lock:
+            self._uses[container.id] = 0
+        return container
+
+    def _discard(self, container):
+        with self._lock:
+            self._uses.pop(container.id, None)
+            last = self._closed and not self._uses
+        try:
+            container.remove(force=True)
+        except Exception:
+            pass
+        if last:
+            self._remove_volume()
+
+    def _remove_volume(self):
+        # Only once no container mounts it; leased containers are discarded on release
+        try:
+            self.site_volume.remove(force=True)
+        except Exception:
+            pass
+
+    def is_healthy(self, container):
+        try:
+            container.reload()
+            return container.status == "running"
+        except Exception:
+            return False
+
+    @contextmanager
+    def acquire(self, timeout=60):
+        """
+        Checks out a healthy container. Yields a lease; set `lease.dirty = True`
+        when the command left the container in an unknown state (timeout,
+        killed process) and it will be replaced instead of reused.
+        """
+        if self._closed:
+            raise RuntimeError("Container pool is closed")
+
+        try:
+            container = self._idle.get_nowait()
+        except queue.Empty:
+            # A failed recycle can leave the pool short; top it back up
+            with self._lock:
+                short = len(self._uses) < self.size
+            container = self._start_container() if short else self._idle.get(timeout=timeout)
+
+        if not self.is_healthy(container):
+            self._discard(container)
+            container = self._start_container()
+
+        lease = _Lease(container)
+        try:
+            yield lease
+        finally:
+            self._release(lease)
+
+    def _release(self, lease):
+        container = lease.container
+        with self._lock:
+            self._uses[container.id] = self._uses.get(container.id, 0) + 1
+            worn_out = self._uses[container.id] >= self.max_uses
+
+        if self._closed:
+            self._discard(container)
+            return
+
+        # Recycle after N uses or on dirty state
+        if lease.dirty or worn_out:
+            self._discard(container)
+            try:
+                container = self._start_container()
+            except Exception as e:
+                print(f"⚠️ Sandbox: could not recycle container - {e}")
+                return
+        self._idle.put(container)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                container = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(container)
+        with self._lock:
+            unused = not self._uses
+        if unused:
+            self._remove_volume()
+
+
+atexit.register(ContainerPool.shutdown_all)
+
+
+class _Lease:
+    def __init__(self, container):
+        self.container = container
+        self.dirty = False
+
+
+class BoundedOutput:
+    """
+    Keeps the first `head_size` and last `tail_size` bytes of a stream.
+    Everything in between is counted in `dropped` and discarded, so memory
+    stays fixed no matter how much a runaway process prints.
+    """
+
+    def __init__(self, head_size, tail_size):
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        room = self.head_size - len(self.head)
+        if room > 0:
+            self.head.extend(chunk[:room])
+            chunk = chunk[room:]
+        if not chunk:
+            return
+        self.tail.extend(chunk)
+        overflow = len(self.tail) - self.tail_size
+        if overflow > 0:
+            del self.tail[:overflow]
+            self.dropped += overflow
+
+    def getvalue(self):
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped:
+            return f"{head}\n[... {self.dropped} bytes truncated ...]\n{tail}"
+        return head + tail
+
+
+class ExecResult:
+    def __init__(self, exit_code, stdout, stderr="", dropped_bytes=0, timed_out=False, duration=0.0):
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.dropped_bytes = dropped_bytes
+        self.timed_out = timed_out
+        self.duration = duration
+
+    def text(self):
+        """The captured stdout/stderr plus a timeout note."""
+        text = self.stdout
+        if self.stderr:
+            text += ("\n" if text and not text.endswith("\n") else "") + f"--- stderr ---\n{self.stderr}"
+        if self.timed_out:
+            text += f"\n[⏱️ Timed out after {self.duration:.1f}s and was killed]"
+        return text
+
+    def __str__(self):
+        return f"Exit Code: {self.exit_code}\n{self.text()}"
+
+
+def _capture(stream, stdout, stderr, deadline):
+    """Drains a demuxed (stdout, stderr) stream into bounded buffers. Returns False on deadline."""
+    for out_chunk, err_chunk in stream:
+        stdout.write(out_chunk)
+        stderr.write(err_chunk)
+        if time.time() > deadline:
+            return False
+    return True
+
 
 class Sandbox:
-    def __init__(self, workspace_path="./agent_workspace"):
-        self.client = docker.from_env()
+    # Defaults sized for an LLM context window, not for a terminal
+    DEFAULT_TIMEOUT = 60
+    MAX_OUTPUT_BYTES = 32 * 1024
+    MAX_READ_BYTES = 64 * 1024
+    # Seconds past the timeout before a stream that is still open counts as hung
+    STREAM_GRACE = 5
+
+    def __init__(self, workspace_path="./agent_workspace", pool_size=2, max_uses=25, dependency_cache=DEPENDENCY_CACHE_ENABLED):
+        self.client = get_docker_client()
         self.image = "python:3.12-alpine"
         self.workspace_path = os.path.abspath(workspace_path)
-        
-    def run_script(self, script_name="broken.py"):
+        self.pool_size = pool_size
+        self.max_uses = max_uses
+        # Requirements are baked into cached images, so verification runs don't reinstall them
+        self.dependencies = DependencyCache(self.client, self.image) if dependency_cache else None
+
+    def runtime_image(self):
+        """The base image, or the cached one with the workspace's current requirements installed."""
+        if self.dependencies is None:
+            return self.image
+        return self.dependencies.image_for(self.workspace_path)
+
+    def _container_options(self):
+        return self.dependencies.container_options() if self.dependencies else {}
+
+    @property
+    def pool(self):
+        return ContainerPool.for_workspace(
+            self.workspace_path,
+            image=self.runtime_image(),
+            size=self.pool_size,
+            max_uses=self.max_uses,
+            **self._container_options()
+        )
+
+    def _resolve(self, file_path):
+        """Maps a workspace-relative (or /app/...) path to a host path inside the workspace."""
+        if file_path.startswith("/app/"):
+            file_path = file_path[len("/app/"):]
+        full_path = os.path.realpath(os.path.join(self.workspace_path, file_path))
+        root = os.path.realpath(self.workspace_path)
+        if full_path != root and not full_path.startswith(root + os.sep):
+            raise ValueError(f"Path escapes the workspace: {file_path}")
+        return full_path
+
+    def _buffers(self, max_output):
+        # Split the cap between the two streams, half head and half tail each
+        half = max_output // 2
+        return BoundedOutput(half // 2, half // 2), BoundedOutput(half // 2, half // 2)
+
+    def _exec(self, command, timeout=None, max_output=None):
         """
-        Runs a script inside a secure Docker container.
-        Returns: (exit_code, logs)
+        Streams a shell command's stdout/stderr from a pooled container into
+        bounded head/tail buffers.
+        """
+        timeout = timeout or self.DEFAULT_TIMEOUT
+        max_output = max_output or self.MAX_OUTPUT_BYTES
+        api = self.client.api
+        started = time.time()
+        stdout, stderr = self._buffers(max_output)
+
+        with self.pool.acquire() as lease:
+            # `timeout` inside the container kills the command itself. A child it
+            # left in the background can keep the stream open without printing, so
+            # a watchdog kills the whole (leased, about to be discarded) container.
+            killed = threading.Event()
+
+            def _kill():
+                killed.set()
+                lease.dirty = True
+                try:
+                    lease.container.kill()
+                except Exception:
+                    pass
+
+            watchdog = threading.Timer(timeout + self.STREAM_GRACE, _kill)
+            watchdog.daemon = True
+            watchdog.start()
+            try:
+                exec_id = api.exec_create(
+                    lease.container.id,
+                    ["timeout", "-s", "KILL", str(int(timeout)), "sh", "-c", command],
+                    workdir="/app"
+                )["Id"]
+                stream = api.exec_start(exec_id, stream=True, demux=True)
+                finished = _capture(stream, stdout, stderr, started + timeout + self.STREAM_GRACE)
+            finally:
+                watchdog.cancel()
+            if not finished:
+                _kill()
+
+            try:
+                exit_code = api.exec_inspect(exec_id).get("ExitCode")
+            except Exception:
+                exit_code = None
+            timed_out = killed.is_set() or exit_code is None or exit_code == 137
+            if timed_out:
+                lease.dirty = True
+
+        return ExecResult(
+            exit_code if exit_code is not None else -1,
+            stdout.getvalue(),
+            stderr.getvalue(),
+            dropped_bytes=stdout.dropped + stderr.dropped,
+            timed_out=timed_out,
+            duration=time.time() - started
+        )
+
+    def _run_isolated(self, command, timeout=None, max_output=None):
         """
+        Runs a command in a throwaway container, streaming its logs into
+        bounded buffers. A watchdog kills the container at the wall-clock timeout.
+        """
+        timeout = timeout or self.DEFAULT_TIMEOUT
+        max_output = max_output or self.MAX_OUTPUT_BYTES
+        started = time.time()
+        stdout, stderr = self._buffers(max_output)
+
+        options = self._container_options()
+        container = self.client.containers.run(
+            self.runtime_image(),
+            command=["sh", "-c", command],
+            working_dir="/app",
+            detach=True,
+            environment=options.get("environment"),
+            volumes={self.workspace_path: {'bind': '/app', 'mode': 'rw'}, **options.get("mounts", {})}
+        )
+        killed = threading.Event()
+
+        def _kill():
+            killed.set()
+            try:
+                container.kill()
+            except Exception:
+                pass
+
+        watchdog = threading.Timer(timeout, _kill)
+        watchdog.daemon = True
+        watchdog.start()
         try:
-            # 1. Prepare the build context (tar the workspace)
-            # We tar the local workspace to send it into the container
-            tar_stream = io.BytesIO()
-            with tarfile.open(fileobj=tar_stream, mode='w') as tar:
-                tar.add(self.workspace_path, arcname=".")
-            tar_stream.seek(0)
-
-            # 2. Start the container
-            container = self.client.containers.run(
-                self.image,
-                command=f"python {script_name}",
-                working_dir="/app",
-                detach=True,
-                tty=True,
-                # We simply mount the volume for speed in V2
-                volumes={self.workspace_path: {'bind': '/app', 'mode': 'rw'}} 
-            )
-
-            # 3. Wait for result
-            result = container.wait()
-            logs = container.logs().decode("utf-8")
-            
-            # 4. Cleanup
-            container.remove()
-            
-            return result['StatusCode'], logs
+            stream = container.attach(stdout=True, stderr=True, stream=True, logs=True, demux=True)
+            if not _capture(stream, stdout, stderr, started + timeout + self.STREAM_GRACE):
+                _kill()
+            result = container.wait(timeout=10)
+        finally:
+            watchdog.cancel()
+            container.remove(force=True)
+
+        return ExecResult(
+            result.get("StatusCode", -1),
+            stdout.getvalue(),
+            stderr.getvalue(),
+            dropped_bytes=stdout.dropped + stderr.dropped,
+            timed_out=killed.is_set(),
+            duration=time.time() - started
+        )
 
+    def run_script(self, script_name="broken.py", isolated=False, timeout=None):
+        """
+        Runs a script inside a pooled Docker container, or a fresh one if `isolated`.
+        Returns: (exit_code, logs)
+        """
+        try:
+            run = self._run_isolated if isolated else self._exec
+            result = run(f"python {script_name}", timeout=timeout)
+            if result.dropped_bytes:
+                print(f"✂️  Sandbox: dropped {result.dropped_bytes} bytes of output from {script_name}")
+            return result.exit_code, result.text()
         except Exception as e:
             return -1, f"🐳 Sandbox Error: {str(e)}"
 
+    def run_command(self, command, timeout=None, max_output=None):
+        """Runs a shell command in the workspace. Output is capped and time-limited."""
+        try:
+            return str(self._exec(command, timeout=timeout, max_output=max_output))
+        except Exception as e:
+            return f"🐳 Sandbox Error: {str(e)}"
+
+    def read_file(self, file_path, start_line=None, end_line=None, offset=None, length=None):
+        """
+        Reads a workspace file straight from the bind mount.
+        Supports 1-based inclusive line ranges or a byte range; output is capped at MAX_READ_BYTES.
+        """
+        try:
+            full_path = self._resolve(file_path)
+            size = os.path.getsize(full_path)
+
+            # 1. Byte range
+            if offset is not None or length is not None:
+                offset = offset or 0
+                length = min(length or self.MAX_READ_BYTES, self.MAX_READ_BYTES)
+                with open(full_path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(length)
+                text = data.decode("utf-8", errors="replace")
+                end = offset + len(data)
+                if offset > 0 or end < size:
+                    text += f"\n[bytes {offset}-{end} of {size}]"
+                return text
+
+            # 2. Line range (whole file by default)
+            start_line = max(start_line or 1, 1)
+            lines = []
+            used = 0
+            truncated = False
+            long_line = None
+            with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+                for number, line in enumerate(f, start=1):
+                    if number < start_line:
+                        continue
+                    if end_line is not None and number > end_line:
+                        break
+                    used += len(line)
+                    if used > self.MAX_READ_BYTES:
+                        truncated = True
+                        if not lines:
+                            # A single line over the cap: its head, rather than nothing
+                            lines.append(line[:self.MAX_READ_BYTES])
+                            long_line = number
+                        break
+                    lines.append(line)
+
+            text = "".join(lines)
+            if long_line is not None:
+                text += f"\n[... line {long_line} truncated after {len(text)} characters; file is {size} bytes. Read a byte range (offset/length) to see more ...]"
+            elif truncated:
+                last = start_line + len(lines) - 1
+                text += f"\n[... truncated at line {last}; file is {size} bytes. Read a line range to see more ...]"
+            return text
+
+        except Exception as e:
+            return f"❌ Read failed: {e}"
+
+    def edit_file(self, file_path, content):
+        """Atomically replaces a workspace file (write to a temp file, then rename)."""
+        try:
+            full_path = self._resolve(file_path)
+            directory = os.path.dirname(full_path)
+            os.makedirs(directory, exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".resurrector-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(full_path):
+                    os.chmod(tmp_path, os.stat(full_path).st_mode & 0o7777)
+                else:
+                    os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            return f"✅ Wrote {len(content.encode('utf-8'))} bytes to {file_path}"
+        except Exception as e:
+            return f"❌ Edit failed: {e}"
+
 # --- TEST BLOCK ---
 if __name__ == "__main__":
     # Create a dummy file to test
     os.makedirs("./agent_workspace", exist_ok=True)
     with open("./agent_workspace/test.py", "w") as f:
         f.write("print('Hello from inside Docker!')")
-    
+
     sb = Sandbox()
     code, output = sb.run_script("test.py")
     print(f"Exit Code: {code}")
-    print(f"Output: {output}")
\ No newline at end of file
+    print(f"Output: {output}")
+    ContainerPool.shutdown_all()
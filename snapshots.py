@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+
+SNAPSHOT_ROOT = os.path.join(".resurrector_cache", "snapshots")
+
+# Never part of a snapshot (on top of the workspace's own .gitignore files)
+EXCLUDES = ["__pycache__/", "*.py[cod]", ".resurrector_cache/"]
+
+
+class SnapshotError(RuntimeError):
+    pass
+
+
+class WorkspaceSnapshots:
+    """
+    Content-addressed snapshots of a workspace's files, kept in a shadow git
+    repository outside the workspace, so the workspace's own git state is
+    never touched. A snapshot id is the git tree hash of the files.
+
+    The shadow index keeps stat info between calls, so after the first
+    snapshot, snapshot and restore only hash and write the files that changed.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, workspace_path, root=SNAPSHOT_ROOT):
+        self.root = root
+        self.workspace_path = os.path.abspath(workspace_path)
+        name = hashlib.sha1(self.workspace_path.encode("utf-8")).hexdigest()[:16]
+        self.git_dir = os.path.abspath(os.path.join(root, f"{name}.git"))
+        self.index_file = os.path.join(self.git_dir, "index")
+        with self._locks_guard:
+            self._lock = self._locks.setdefault(self.git_dir, threading.Lock())
+
+    def _git(self, *args, strip=True):
+        env = dict(os.environ, GIT_DIR=self.git_dir, GIT_WORK_TREE=self.workspace_path, GIT_INDEX_FILE=self.index_file)
+        result = subprocess.run(["git", *args], cwd=self.workspace_path, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SnapshotError(f"git {args[0]} failed: {result.stderr.strip()}")
+        return result.stdout.strip() if strip else result.stdout
+
+    def _ensure_repo(self, alternate=None):
+        if os.path.exists(os.path.join(self.git_dir, "HEAD")):
+            return
+        os.makedirs(self.git_dir, exist_ok=True)
+        subprocess.run(["git", "init", "--quiet", "--bare", self.git_dir], check=True, capture_output=True)
+        with open(os.path.join(self.git_dir, "info", "exclude"), "a") as f:
+            f.write("\n".join(EXCLUDES) + "\n")
+        if alternate:
+            # A branch reads its parent's snapshots in place instead of copying them
+            with open(os.path.join(self.git_dir, "objects", "info", "alternates"), "w") as f:
+                f.write(os.path.join(alternate, "objects") + "\n")
+
+    def snapshot(self):
+        """Records the workspace's current files. Returns the snapshot id."""
+        if not os.path.isdir(self.workspace_path):
+            raise SnapshotError(f"workspace {self.workspace_path} does not exist")
+        with self._lock:
+            self._ensure_repo()
+            self._git("add", "--all", "--", ".")
+            tree = self._git("write-tree")
+            # Keep the tree reachable so gc never prunes it
+            self._git("update-ref", f"refs/snapshots/{tree}", tree)
+            return tree
+
+    def restore(self, snapshot_id):
+        """
+        Puts the workspace back to a snapshot: changed files are rewritten, files
+        the snapshot doesn't have are deleted. Ignored files are left alone.
+        """
+        with self._lock:
+            self._ensure_repo()
+            self._git("cat-file", "-e", f"{snapshot_id}^{{tree}}")
+            # Sync the index with the files first, so the two-way merge only touches what differs
+            self._git("add", "--all", "--", ".")
+            self._git("read-tree", "--reset", "-u", snapshot_id)
+            return snapshot_id
+
+    def exists(self, snapshot_id):
+        try:
+            self._git("cat-file", "-e", f"{snapshot_id}^{{tree}}")
+            return True
+        except SnapshotError:
+            return False
+
+    def changed_files(self, from_id, to_id):
+        """Paths that differ between two snapshots."""
+        return self._git("diff-tree", "-r", "--name-only", from_id, to_id).splitlines()
+
+    def branch(self, snapshot_id, dest_path):
+        """
+        Materializes a snapshot as a new, independent workspace at `dest_path`
+        and returns its WorkspaceSnapshots. If this workspace is a git clone the
+        branch is a detached `git worktree` of it, so it shares the clone's
+        history and remotes without copying them.
+        """
+        dest_path = os.path.abspath(dest_path)
+        if os.path.exists(dest_path) and os.listdir(dest_path):
+            raise SnapshotError(f"branch target {dest_path} is not empty")
+        if not self.exists(snapshot_id):
+            raise SnapshotError(f"unknown snapshot {snapshot_id}")
+
+        if os.path.isdir(os.path.join(self.workspace_path, ".git")):
+            subprocess.run(
+                ["git", "-C", self.workspace_path, "worktree", "add", "--quiet", "--detach", "--no-checkout", dest_path],
+                check=True, capture_output=True
+            )
+        else:
+            os.makedirs(dest_path, exist_ok=True)
+
+        branch = WorkspaceSnapshots(dest_path, root=self.root)
+        with branch._lock:
+            branch._ensure_repo(alternate=self.git_dir)
+        branch.restore(snapshot_id)
+        if os.path.exists(os.path.join(dest_path, ".git")):
+            # Index the worktree against HEAD so `git diff`/`git status` see only the snapshot's changes
+            subprocess.run(["git", "-C", dest_path, "reset", "--quiet", "--mixed"], check=True, capture_output=True)
+        return branch
+
+    def discard(self):
+        """Deletes this workspace and its snapshots (for branches that are no longer needed)."""
+        workspace_git = os.path.join(self.workspace_path, ".git")
+        if os.path.isfile(workspace_git):
+            # A worktree: unregister it from the clone it belongs to
+            subprocess.run(["git", "-C", self.workspace_path, "worktree", "remove", "--force", self.workspace_path], capture_output=True)
+        shutil.rmtree(self.workspace_path, ignore_errors=True)
+        shutil.rmtree(self.git_dir, ignore_errors=True)
+
+    def adopt(self, other, snapshot_id):
+        """Copies a snapshot taken in another workspace (e.g. a branch) into this one's store, so it can be restored here."""
+        with self._lock:
+            self._ensure_repo()
+            ref = f"refs/snapshots/{snapshot_id}"
+            self._git("fetch", "--quiet", "--no-tags", other.git_dir, f"{ref}:{ref}")
+        return snapshot_id
+
+    def diff(self, from_id, to_id):
+        """A `git diff` patch between two snapshots, appliable with `git apply` to any copy of the workspace."""
+        # Unstripped: a patch ends in context lines that may be whitespace-only
+        return self._git("diff", "--binary", "--no-color", "--full-index", from_id, to_id, strip=False)
@@ -0,0 +1,24 @@
+import pytest
+
+from code_index import CodeIndex
+from repo_mapper import RepoMapper
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """Writes {rel_path: source} into a temporary workspace and returns its path."""
+    def write(files):
+        for rel_path, source in files.items():
+            path = tmp_path / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(source)
+        return str(tmp_path)
+    return write
+
+
+@pytest.fixture
+def make_index():
+    """A CodeIndex over a workspace, without the on-disk repo map cache."""
+    def build(root_dir):
+        return CodeIndex(root_dir, mapper=RepoMapper(root_dir, cache_dir=None))
+    return build
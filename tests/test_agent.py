@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import agent
+
+
+class SlowSandbox:
+    """run_command hangs until released; file tools answer at once."""
+
+    workspace_path = "/nonexistent"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+        self.threads = []
+
+    def run_command(self, command, timeout=None):
+        self.calls.append(("run_command", command))
+        self.threads.append(threading.current_thread())
+        self.release.wait(5)
+        return "Exit Code: 0\n"
+
+    def read_file(self, file_path, **kwargs):
+        self.calls.append(("read_file", file_path))
+        return "contents"
+
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    sandbox = SlowSandbox()
+    monkeypatch.setattr(agent, "get_sandbox", lambda workspace_path=None: sandbox)
+    monkeypatch.setattr(agent, "_snapshot", lambda workspace_path: None)
+    monkeypatch.setattr(agent, "_event", lambda *args, **kwargs: None)
+    monkeypatch.setattr(agent.tracker, "log_dir", None)
+    yield sandbox
+    # Let abandoned tool threads finish while the patches are still in place
+    sandbox.release.set()
+    for thread in sandbox.threads:
+        thread.join(5)
+
+
+def tool_calls(*calls):
+    return {"messages": [AIMessage(content="", tool_calls=[{"name": n, "args": a, "id": str(i)} for i, (n, a) in enumerate(calls)])]}
+
+
+def test_calls_waiting_on_a_timed_out_call_are_not_run(sandbox, monkeypatch):
+    monkeypatch.setattr(agent, "_tool_timeout", lambda call: 0.5 if call["name"] == "run_command" else 30)
+    state = tool_calls(
+        ("run_command", {"command": "python app.py"}),
+        ("read_file", {"file_path": "app.py"}),
+    )
+
+    started = time.time()
+    results = agent.action_node(state, {})["messages"]
+
+    assert time.time() - started < 3
+    assert results[0].content == "Tool Execution Error: timed out after 0.5s"
+    assert results[1].content == "Tool Execution Error: blocked by timed-out call run_command"
+    # The read never overlapped the command that may still be running
+    assert sandbox.calls == [("run_command", "python app.py")]
+
+
+def test_independent_calls_run_concurrently(sandbox):
+    sandbox.release.set()
+    state = tool_calls(("read_file", {"file_path": "a.py"}), ("read_file", {"file_path": "b.py"}))
+
+    results = agent.action_node(state, {})["messages"]
+
+    assert [r.content for r in results] == ["contents", "contents"]
+
+
+class ShellSandbox:
+    """run_command rewrites a file on the host, like `sed -i` in the container would."""
+
+    def __init__(self, workspace_path):
+        self.workspace_path = workspace_path
+
+    def run_command(self, command, timeout=None):
+        with open(f"{self.workspace_path}/calc.py", "w") as f:
+            f.write("\n\n\ndef divide(a, b):\n    return a / b if b else 0\n")
+        return "Exit Code: 0\n"
+
+
+def test_files_changed_by_commands_are_reindexed(workspace, monkeypatch, tmp_path_factory):
+    monkeypatch.chdir(tmp_path_factory.mktemp("cwd"))
+    root = workspace({"calc.py": "def divide(a, b):\n    return a / b\n"})
+    monkeypatch.setattr(agent, "get_sandbox", lambda workspace_path=None: ShellSandbox(root))
+    monkeypatch.setattr(agent, "_event", lambda *args, **kwargs: None)
+    monkeypatch.setattr(agent.tracker, "log_dir", None)
+    index = agent.get_code_index(root)
+    assert index.find_symbol("calc.divide")[0]["start"] == 1
+
+    state = tool_calls(("run_command", {"command": "sed -i '1i\\\\n\\\\n' calc.py"}))
+    state["workspace_snapshot"] = agent._snapshot(root)
+    update = agent.action_node(state, {"configurable": {"workspace": root}})
+
+    assert update["workspace_snapshot"] != state["workspace_snapshot"]
+    assert index.find_symbol("calc.divide")[0]["start"] == 4
+    agent.release_sandbox(root)
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+APP = '''\
+def divide(a, b):
+    return a / b
+'''
+
+
+def frame(path, line=1, func="<module>"):
+    return f'  File "{path}", line {line}, in {func}\n'
+
+
+@pytest.mark.parametrize("path", [
+    "/app/../../etc/passwd",
+    "../../../../etc/passwd",
+    "/etc/passwd",
+    "/app/../outside.py",
+])
+def test_lookup_traceback_stays_in_the_workspace(workspace, make_index, path):
+    index = make_index(workspace({"app.py": APP}))
+
+    assert index.lookup_traceback(frame(path)) == []
+
+
+def test_lookup_traceback_does_not_follow_symlinks_out(workspace, make_index, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("host") / "secret.py"
+    outside.write_text("TOKEN = 'secret'\n")
+    root = workspace({"app.py": APP})
+    os.symlink(outside, os.path.join(root, "link.py"))
+
+    assert make_index(root).lookup_traceback(frame("/app/link.py")) == []
+
+
+def test_lookup_traceback_resolves_workspace_frames(workspace, make_index):
+    root = workspace({"app.py": APP})
+    index = make_index(root)
+
+    for path in ("/app/app.py", "/app/./sub/../app.py", os.path.join(root, "app.py"), "app.py"):
+        frames = index.lookup_traceback(frame(path, 2, "divide"))
+        assert [f["symbol"] for f in frames] == ["app.divide"], path
+
+
+CALC = '''\
+import os
+
+
+def divide(a, b):
+    return a / b
+
+
+def average(values):
+    return divide(sum(values), len(values))
+'''
+
+MAIN = '''\
+from calc import average
+
+print(average([]))
+'''
+
+TRACEBACK = '''\
+Traceback (most recent call last):
+  File "/app/main.py", line 3, in <module>
+    print(average([]))
+  File "/app/calc.py", line 9, in average
+    return divide(sum(values), len(values))
+  File "/usr/local/lib/python3.12/site-packages/wrapt/wrappers.py", line 10, in __call__
+    return self._wrapped(*args)
+  File "/app/calc.py", line 5, in divide
+    return a / b
+ZeroDivisionError: division by zero
+'''
+
+
+def test_lookup_traceback_returns_workspace_frames_in_order(workspace, make_index):
+    index = make_index(workspace({"calc.py": CALC, "main.py": MAIN}))
+
+    frames = index.lookup_traceback(TRACEBACK)
+
+    assert [f["symbol"] for f in frames] == ["main:<module>", "calc.average", "calc.divide"]
+    divide = frames[-1]
+    assert (divide["file"], divide["line"], divide["start_line"], divide["end_line"]) == ("calc.py", 5, 4, 5)
+    assert divide["source"] == "def divide(a, b):\n    return a / b\n"
+
+
+def test_lookup_traceback_lists_callers_and_importers(workspace, make_index):
+    index = make_index(workspace({"calc.py": CALC, "main.py": MAIN}))
+
+    average, divide = index.lookup_traceback(TRACEBACK)[1:]
+
+    assert [(c["file"], c["line"], c["caller"]) for c in divide["callers"]] == [("calc.py", 9, "average")]
+    assert [(c["file"], c["line"]) for c in average["callers"]] == [("main.py", 3)]
+    assert divide["importers"] == ["main.py"]
+
+
+def test_lookup_traceback_shows_a_window_for_module_level_frames(workspace, make_index):
+    index = make_index(workspace({"calc.py": CALC, "main.py": MAIN}))
+
+    module = index.lookup_traceback(TRACEBACK)[0]
+
+    assert (module["start_line"], module["end_line"]) == (1, 3)
+    assert module["callers"] == []
+
+
+def test_lookup_traceback_sees_edits_after_refresh_file(workspace, make_index):
+    root = workspace({"calc.py": CALC, "main.py": MAIN})
+    index = make_index(root)
+    index.lookup_traceback(TRACEBACK)
+
+    workspace({"calc.py": "\n\n" + CALC})
+    index.refresh_file("calc.py")
+
+    frames = index.lookup_traceback('  File "/app/calc.py", line 7, in divide\n')
+    assert [(f["symbol"], f["start_line"]) for f in frames] == [("calc.divide", 6)]
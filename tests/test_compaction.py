@@ -0,0 +1,92 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from compaction import compact_messages, count_tokens
+
+
+def read(call_id, path, content):
+    return [
+        AIMessage(content="", tool_calls=[{"name": "read_file", "args": {"file_path": path}, "id": call_id}]),
+        ToolMessage(content=content, tool_call_id=call_id, name="read_file"),
+    ]
+
+
+def command(call_id, output):
+    return [
+        AIMessage(content="", tool_calls=[{"name": "run_command", "args": {"command": "python app.py"}, "id": call_id}]),
+        ToolMessage(content=output, tool_call_id=call_id, name="run_command"),
+    ]
+
+
+HEAD = [SystemMessage(content="You are a developer."), HumanMessage(content="Fix app.py")]
+
+
+def test_compaction_elides_older_copies_of_a_file():
+    messages = HEAD + read("1", "app.py", "old contents") + read("2", "/app/app.py", "new contents")
+
+    compacted, stats = compact_messages(messages)
+
+    assert "elided" in compacted[3].content
+    assert compacted[5].content == "new contents"
+    assert stats["elided_messages"] == 1
+
+
+def test_compaction_elides_reads_superseded_by_an_edit():
+    edit = AIMessage(content="", tool_calls=[{"name": "edit_file", "args": {"file_path": "app.py", "content": "fixed"}, "id": "2"}])
+    messages = HEAD + read("1", "app.py", "old contents") + [edit, ToolMessage(content="✅", tool_call_id="2", name="edit_file")]
+
+    compacted, _ = compact_messages(messages)
+
+    assert "elided" in compacted[3].content
+    assert compacted[4].tool_calls[0]["args"]["content"] == "fixed"
+
+
+def test_compaction_trims_old_tool_output_but_not_recent_output():
+    big = "x" * 10000
+    messages = HEAD + command("1", big) + command("2", "ok") + command("3", "ok") + command("4", big)
+
+    compacted, _ = compact_messages(messages, max_tool_chars=2000, keep_recent=6)
+
+    assert len(compacted[3].content) < 2100
+    assert "characters elided" in compacted[3].content
+    assert compacted[-1].content == big
+
+
+def test_compaction_enforces_the_token_ceiling_but_keeps_the_task():
+    messages = HEAD + [m for i in range(10) for m in command(str(i), "y" * 1500)]
+
+    compacted, stats = compact_messages(messages, token_ceiling=1500, keep_recent=2)
+
+    assert stats["after_tokens"] <= 1500
+    assert compacted[:2] == HEAD
+    assert compacted[-1].content == "y" * 1500
+    assert compacted[2].content == "" and compacted[2].tool_calls[0]["args"] == {"command": "[elided]"}
+
+
+def test_compaction_keeps_every_message_and_leaves_the_input_alone():
+    messages = HEAD + read("1", "app.py", "old") + read("2", "app.py", "new") + command("3", "z" * 5000)
+    before = count_tokens(messages)
+
+    compacted, _ = compact_messages(messages, token_ceiling=10, keep_recent=0)
+
+    assert len(compacted) == len(messages)
+    assert [type(m) for m in compacted] == [type(m) for m in messages]
+    assert count_tokens(messages) == before
+    assert messages[3].content == "old"
+
+
+def test_compaction_keeps_full_reads_a_ranged_read_follows():
+    ranged = [
+        AIMessage(content="", tool_calls=[{"name": "read_file", "args": {"file_path": "app.py", "start_line": 1, "end_line": 2}, "id": "2"}]),
+        ToolMessage(content="line 1\nline 2\n", tool_call_id="2", name="read_file"),
+    ]
+    messages = HEAD + read("1", "app.py", "full contents") + ranged + read("3", "app.py", "newer full contents")
+
+    compacted, _ = compact_messages(messages)
+
+    # The ranged read neither replaces the full copy before it nor is replaced by the one after it
+    assert compacted[3].content == "[older contents of app.py elided; a newer version appears later]"
+    assert compacted[5].content == "line 1\nline 2\n"
+    assert compacted[7].content == "newer full contents"
+
+    compacted, _ = compact_messages(HEAD + read("1", "app.py", "full contents") + ranged)
+    assert compacted[3].content == "full contents"
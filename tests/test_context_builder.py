@@ -0,0 +1,80 @@
+from context_builder import ContextBuilder, estimate_tokens
+
+CALC = '''\
+def divide(a, b):
+    return a / b
+
+
+def average(values):
+    return divide(sum(values), len(values))
+'''
+
+MAIN = '''\
+from calc import average
+
+print(average([]))
+'''
+
+UTILS = '''\
+def unrelated(x):
+    return x
+'''
+
+TRACEBACK = '''\
+Traceback (most recent call last):
+  File "/app/main.py", line 3, in <module>
+    print(average([]))
+  File "/app/calc.py", line 6, in average
+    return divide(sum(values), len(values))
+  File "/app/calc.py", line 2, in divide
+    return a / b
+ZeroDivisionError: division by zero
+'''
+
+
+def builder(workspace, make_index, **kwargs):
+    root = workspace({"calc.py": CALC, "main.py": MAIN, "utils.py": UTILS})
+    return ContextBuilder(make_index(root), **kwargs)
+
+
+def test_build_packs_failing_frames_first(workspace, make_index):
+    context, manifest = builder(workspace, make_index).build(TRACEBACK)
+
+    assert context.startswith("## Failing output\n")
+    assert "## Failing functions" in context and "## Repository map" in context
+    kinds = [item["kind"] for item in manifest["items"]]
+    assert kinds[:2] == ["body", "body"]
+    assert manifest["items"][0]["ref"] == "calc.divide"
+    assert manifest["skipped"] == 0
+
+
+def test_build_ranks_traceback_files_above_the_rest(workspace, make_index):
+    _, manifest = builder(workspace, make_index).build(TRACEBACK)
+
+    signatures = [item["ref"] for item in manifest["items"] if item["kind"] == "signatures"]
+    assert signatures.index("calc.py") < signatures.index("utils.py")
+
+
+def test_build_stays_within_the_budget(workspace, make_index):
+    context, manifest = builder(workspace, make_index, budget_tokens=80).build(TRACEBACK)
+
+    assert manifest["used_tokens"] <= 80
+    assert manifest["skipped"] > 0
+    assert sum(item["tokens"] for item in manifest["items"]) <= manifest["used_tokens"]
+
+
+def test_build_truncates_a_long_traceback_to_its_share(workspace, make_index):
+    noise = "".join(f"log line {i}\n" for i in range(2000))
+    context, _ = builder(workspace, make_index, budget_tokens=1000).build(noise + TRACEBACK)
+
+    failing = context.split("\n\n## ")[0]
+    assert failing.startswith("## Failing output\n...\n")
+    assert estimate_tokens(failing) <= 1000 * 0.25 + 10
+    assert failing.endswith("ZeroDivisionError: division by zero\n")
+
+
+def test_build_without_a_traceback_lists_signatures(workspace, make_index):
+    context, manifest = builder(workspace, make_index).build()
+
+    assert context.startswith("## Repository map")
+    assert {item["kind"] for item in manifest["items"]} == {"signatures"}
@@ -0,0 +1,135 @@
+import subprocess
+
+import pytest
+
+from fix_cache import apply_patch, failure_signature
+
+APP = '''\
+def divide(a, b):
+    return a / b
+'''
+
+# The same function, reformatted and moved down
+APP_REFORMATTED = '''\
+import math
+
+
+def divide(a, b):
+    # Plain division
+    return a/b
+'''
+
+
+def traceback(line, exception="ZeroDivisionError: division by zero"):
+    return (
+        "Traceback (most recent call last):\n"
+        f'  File "/app/app.py", line {line}, in divide\n'
+        "    return a / b\n"
+        f"{exception}\n"
+    )
+
+
+def signature(workspace, make_index, files, output):
+    return failure_signature(output, make_index(workspace(files)))
+
+
+def test_signature_ignores_formatting_and_line_numbers(tmp_path_factory, make_index):
+    # Two repos with the same bug: the signature must match across them
+    indexes = []
+    for source in (APP, APP_REFORMATTED):
+        root = tmp_path_factory.mktemp("repo")
+        (root / "app.py").write_text(source)
+        indexes.append(make_index(str(root)))
+
+    first = failure_signature(traceback(2), indexes[0])
+    second = failure_signature(traceback(6), indexes[1])
+
+    assert first["exception"] == "ZeroDivisionError"
+    assert first["fingerprint"] is not None
+    assert first["key"] == second["key"]
+
+
+def test_signature_differs_by_exception(workspace, make_index):
+    root = workspace({"app.py": APP})
+    index = make_index(root)
+
+    zero = failure_signature(traceback(2), index)
+    type_error = failure_signature(traceback(2, "TypeError: unsupported operand type(s)"), index)
+
+    assert type_error["exception"] == "TypeError"
+    assert zero["key"] != type_error["key"]
+
+
+def test_signature_records_the_missing_module(workspace, make_index):
+    output = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/app.py", line 1, in <module>\n'
+        "    import requests.adapters\n"
+        "ModuleNotFoundError: No module named 'requests.adapters'\n"
+    )
+
+    result = signature(workspace, make_index, {"app.py": "import requests.adapters\n"}, output)
+
+    assert result["exception"] == "ModuleNotFoundError"
+    assert result["missing_module"] == "requests"
+
+
+def test_signature_of_a_syntax_error_uses_the_offending_line(workspace, make_index):
+    output = (
+        '  File "/app/app.py", line 1\n'
+        "    def divide(a, b)\n"
+        "                    ^\n"
+        "SyntaxError: expected ':'\n"
+    )
+
+    result = signature(workspace, make_index, {"app.py": "def divide(a, b)\n    return a / b\n"}, output)
+
+    assert result["exception"] == "SyntaxError"
+    assert result["fingerprint"] is not None
+
+
+def test_signature_needs_an_exception(workspace, make_index):
+    assert signature(workspace, make_index, {"app.py": APP}, "all good\n") is None
+
+
+PATCH = '''\
+diff --git a/app.py b/app.py
+--- a/app.py
++++ b/app.py
+@@ -1,2 +1,2 @@
+ def divide(a, b):
+-    return a / b
++    return a / b if b else 0
+'''
+
+
+def git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.mark.parametrize("layout", ["plain", "own_repo", "nested_in_repo"])
+def test_apply_patch(tmp_path, layout):
+    # nested_in_repo is workspaces/<id> inside a checkout, with no .git of its own
+    workspace = tmp_path / "workspaces" / "incident"
+    workspace.mkdir(parents=True)
+    (workspace / "app.py").write_text(APP)
+    if layout == "own_repo":
+        git(workspace, "init", "-q")
+    elif layout == "nested_in_repo":
+        git(tmp_path, "init", "-q")
+        git(tmp_path, "add", ".")
+        git(tmp_path, "commit", "-qm", "init")
+
+    ok, error = apply_patch(str(workspace), PATCH)
+
+    assert (ok, error) == (True, "")
+    assert (workspace / "app.py").read_text() == "def divide(a, b):\n    return a / b if b else 0\n"
+
+
+def test_apply_patch_reports_a_patch_that_does_not_fit(tmp_path):
+    (tmp_path / "app.py").write_text("something else\n")
+
+    ok, error = apply_patch(str(tmp_path), PATCH)
+
+    assert not ok
+    assert "patch does not apply" in error
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from impact_analysis import ImpactAnalyzer
+
+FILES = {
+    "pkg/__init__.py": "",
+    "pkg/core.py": "def add(a, b):\n    return a + b\n",
+    "pkg/api.py": "from pkg.core import add\n\ndef total(values):\n    return add(*values)\n",
+    "pkg/other.py": "def noop():\n    pass\n",
+    "tests/test_api.py": "from pkg.api import total\n\ndef test_total():\n    assert total([1, 2]) == 3\n",
+    "tests/test_other.py": "from pkg.other import noop\n\ndef test_noop():\n    noop()\n",
+}
+
+
+@pytest.fixture
+def analyzer(workspace, make_index, tmp_path_factory):
+    root = workspace(FILES)
+    return ImpactAnalyzer(root, sandbox=None, code_index=make_index(root), shards=1, cache_dir=str(tmp_path_factory.mktemp("impact")))
+
+
+def test_select_follows_imports_without_coverage(analyzer):
+    # pkg/core.py is imported by pkg/api.py, which tests/test_api.py imports
+    assert analyzer.select(["pkg/core.py"]) == (["tests/test_api.py"], "impact")
+    assert analyzer.select(["pkg/other.py"]) == (["tests/test_other.py"], "impact")
+
+
+def test_select_prefers_baseline_coverage(analyzer):
+    analyzer._save({"snapshot": "s1", "available": True, "coverage": {
+        "tests/test_api.py": ["pkg/api.py"],
+        "tests/test_other.py": ["pkg/core.py", "pkg/other.py"],
+    }, "durations": {}, "failing": {}})
+
+    assert analyzer.select(["pkg/core.py"], "s1") == (["tests/test_other.py"], "impact")
+    # A baseline for another snapshot is ignored
+    assert analyzer.select(["pkg/core.py"], "s2") == (["tests/test_api.py"], "impact")
+
+
+def test_select_includes_changed_tests(analyzer):
+    assert analyzer.select(["tests/test_other.py", "pkg/api.py"]) == (["tests/test_api.py", "tests/test_other.py"], "impact")
+
+
+@pytest.mark.parametrize("changed", [["conftest.py"], ["tests/conftest.py"], ["pyproject.toml"], ["requirements-dev.txt"]])
+def test_select_runs_everything_for_global_changes(analyzer, changed):
+    assert analyzer.select(changed) == (["tests/test_api.py", "tests/test_other.py"], "full")
+
+
+def test_select_skips_files_nothing_tests(analyzer):
+    assert analyzer.select(["README.md", "pkg/new.py"]) == ([], "impact")
+
+
+def test_select_without_tests(workspace, make_index, tmp_path_factory):
+    root = workspace({"app.py": "print(1)\n"})
+    analyzer = ImpactAnalyzer(root, sandbox=None, code_index=make_index(root), shards=1, cache_dir=str(tmp_path_factory.mktemp("impact")))
+
+    assert analyzer.select(["app.py"]) == ([], "none")
+
+
+def test_a_branch_uses_its_parents_baseline(analyzer, make_index, tmp_path_factory):
+    analyzer._save({"snapshot": "s1", "available": True, "coverage": {
+        "tests/test_other.py": ["pkg/core.py"],
+    }, "durations": {}, "failing": {}})
+    # A speculative candidate: a copy of the workspace at the same snapshot
+    branch = tmp_path_factory.mktemp("branch")
+    for rel_path, source in FILES.items():
+        (branch / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (branch / rel_path).write_text(source)
+    branch_root = str(branch)
+
+    branch = ImpactAnalyzer(
+        branch_root, sandbox=None, code_index=make_index(branch_root), shards=1,
+        cache_dir=os.path.dirname(analyzer.cache_path), baseline_workspace=analyzer.workspace_path
+    )
+
+    assert branch.cache_path == analyzer.cache_path
+    assert branch.select(["pkg/core.py"], "s1") == (["tests/test_other.py"], "impact")
@@ -0,0 +1,99 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import llm_cache
+from llm_cache import LLMCache
+
+
+class Model:
+    model = "gemini-2.0-flash"
+    temperature = 0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite"), ttl_seconds=100, max_entries=2)
+    yield cache
+    cache.close()
+
+
+def conversation(call_id):
+    return [
+        HumanMessage(content="Fix app.py", id="run-1"),
+        AIMessage(content="", tool_calls=[{"name": "read_file", "args": {"file_path": "app.py"}, "id": call_id}]),
+        ToolMessage(content="print(1)", tool_call_id=call_id, name="read_file"),
+    ]
+
+
+def test_key_ignores_run_specific_ids(cache):
+    assert cache.key(Model(), conversation("call_a")) == cache.key(Model(), conversation("call_b"))
+
+
+def test_key_depends_on_the_model_and_prompt(cache):
+    hot = Model()
+    hot.temperature = 1.0
+
+    assert cache.key(Model(), conversation("a")) != cache.key(hot, conversation("a"))
+    assert cache.key(Model(), conversation("a")) != cache.key(Model(), conversation("a")[:1])
+
+
+def test_hit_returns_a_copy_with_fresh_ids(cache, clock):
+    response = AIMessage(content="", id="resp-1", tool_calls=[{"name": "run_command", "args": {"command": "ls"}, "id": "call_1"}])
+    cache.put("k", response)
+
+    cached = cache.get("k")
+
+    assert cached.tool_calls[0]["args"] == {"command": "ls"}
+    assert cached.id is None
+    assert cached.tool_calls[0]["id"] != "call_1"
+    assert cache.stats() == {"hits": 1, "misses": 0, "entries": 1}
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.put("k", AIMessage(content="cached"))
+
+    clock.now += 100
+    assert cache.get("k").content == "cached"
+    clock.now += 1
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0}
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    cache.put("a", AIMessage(content="a"))
+    clock.now += 1
+    cache.put("b", AIMessage(content="b"))
+    clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.put("c", AIMessage(content="c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").content == "a"
+    assert cache.get("c").content == "c"
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    first = LLMCache(path)
+    first.put("k", AIMessage(content="kept"))
+    first.close()
+
+    second = LLMCache(path)
+    assert second.get("k").content == "kept"
+    second.close()
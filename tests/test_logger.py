@@ -0,0 +1,93 @@
+import glob
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from logger import ThoughtLogger
+
+
+class Store:
+    def __init__(self):
+        self.batches = []
+
+    def append_many(self, rows):
+        self.batches.append(rows)
+
+
+@pytest.fixture
+def make_logger(tmp_path):
+    loggers = []
+
+    def build(**kwargs):
+        loggers.append(ThoughtLogger(log_dir=str(tmp_path / "logs"), **kwargs))
+        return loggers[-1]
+
+    yield build
+    for logger in loggers:
+        logger.close()
+
+
+def test_records_are_structured_jsonl(make_logger):
+    logger = make_logger(incident_id="inc-1")
+    logger.log_record("tool", "output", node="act", step=3, latency=0.25, ok=True)
+    logger.log_state({"messages": [AIMessage(content="thinking", tool_calls=[{"name": "read_file", "args": {}, "id": "1"}])]}, node="reason")
+
+    tool, state = list(logger.records())
+
+    assert tool["incident_id"] == "inc-1"
+    assert (tool["category"], tool["node"], tool["step"], tool["ok"], tool["payload_bytes"]) == ("tool", "act", 3, True, 6)
+    assert "input_tokens" not in tool
+    assert (state["category"], state["tool_calls"], state["step"]) == ("ai", ["read_file"], 1)
+    with open(logger.log_file) as f:
+        assert [json.loads(line)["category"] for line in f] == ["tool", "ai"]
+
+
+def test_flush_writes_in_batches_to_the_run_store(make_logger):
+    store = Store()
+    logger = make_logger(run_store=store, flush_records=1000, flush_interval=60)
+    for i in range(5):
+        logger.log_record("log", str(i))
+
+    logger.flush()
+
+    assert len(store.batches) == 1
+    assert [row[3] for row in store.batches[0]] == ["0", "1", "2", "3", "4"]
+
+
+def test_rotation_keeps_backup_count_gzipped_files(make_logger):
+    logger = make_logger(flush_records=1, max_bytes=200, backup_count=2)
+    for i in range(20):
+        logger.log_record("log", f"record {i:02d}")
+        logger.flush()
+
+    backups = sorted(glob.glob(logger.log_file + ".*.gz"))
+    assert [b.rsplit(".", 2)[1] for b in backups] == ["1", "2"]
+    contents = [r["content"] for r in logger.records()]
+    # Oldest first, with what rotated past the last backup gone
+    assert contents == sorted(contents)
+    assert contents[-1] == "record 19"
+    assert "record 00" not in contents
+
+
+def test_export_jsonl_joins_backups_and_the_live_file(make_logger, tmp_path):
+    logger = make_logger(flush_records=1, max_bytes=200, backup_count=5)
+    for i in range(10):
+        logger.log_record("log", f"record {i:02d}")
+        logger.flush()
+
+    count = logger.export_jsonl(str(tmp_path / "export.jsonl"))
+
+    with open(tmp_path / "export.jsonl") as f:
+        exported = [json.loads(line)["content"] for line in f]
+    assert count == 10
+    assert exported == [f"record {i:02d}" for i in range(10)]
+
+
+def test_closed_logger_drops_records(make_logger):
+    logger = make_logger()
+    logger.log_record("log", "kept")
+    logger.close()
+    logger.log_record("log", "dropped")
+
+    assert [r["content"] for r in logger.records()] == ["kept"]
@@ -0,0 +1,129 @@
+import subprocess
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from pre_review import PreReview, parse_verdict, runs_script
+
+
+def call(name, call_id, **args):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+def result(call_id, content, name="run_command"):
+    return ToolMessage(content=content, tool_call_id=call_id, name=name)
+
+
+def edit(call_id, path, content):
+    return [call("edit_file", call_id, file_path=path, content=content), result(call_id, "✅ Edited", name="edit_file")]
+
+
+def run(call_id, command, exit_code=0):
+    return [call("run_command", call_id, command=command), result(call_id, f"Exit Code: {exit_code}\n")]
+
+
+TASK = [HumanMessage(content="Fix app.py")]
+FIXED = "def divide(a, b):\n    return a / b if b else 0\n"
+
+
+@pytest.mark.parametrize("content, verdict", [
+    ("APPROVE", "approved"),
+    ("Approve - the fix is verified.", "approved"),
+    ("Verdict: APPROVE", "approved"),
+    ("The script passes. APPROVED", "approved"),
+    ("REJECT: no test run", "rejected"),
+    ("I cannot approve this yet.", "rejected"),
+    ("APPROVE... actually, REJECT", "rejected"),
+    ("Looks fine to me", "rejected"),
+])
+def test_parse_verdict(content, verdict):
+    assert parse_verdict(content) == verdict
+
+
+@pytest.mark.parametrize("command, script, expected", [
+    ("python app.py", "app.py", True),
+    ("python3 /app/app.py --fast", "app.py", True),
+    ("python app.py 2>&1", "app.py", True),
+    ("python other.py", "app.py", False),
+    ("python app.py || true", "app.py", False),
+    ("python app.py; echo ok", "app.py", False),
+    ("python app.py | tail -5", "app.py", False),
+    ("echo $(python app.py)", "app.py", False),
+    ("python -c 'print(1)'", "app.py", False),
+    ("python app.py", None, True),
+    ("python -m pytest", None, False),
+    ("python 'unterminated", None, False),
+])
+def test_runs_script(command, script, expected):
+    assert runs_script(command, script) is expected
+
+
+def test_assess_approves_a_verified_edit(workspace):
+    root = workspace({"app.py": "def divide(a, b):\n    return a / b\n"})
+    messages = TASK + edit("1", "app.py", FIXED) + run("2", "python app.py")
+
+    verdict, reasons = PreReview(root, verify_script="app.py").assess(messages)
+
+    assert verdict == "approve"
+    assert "1 edit(s)" in reasons[0]
+
+
+def test_assess_rejects_a_run_before_the_last_edit(workspace):
+    root = workspace({"app.py": ""})
+    messages = TASK + run("1", "python app.py") + edit("2", "app.py", FIXED)
+
+    verdict, reasons = PreReview(root, verify_script="app.py").assess(messages)
+
+    assert verdict == "reject"
+    assert reasons == ["no successful run of the script after the last edit"]
+
+
+def test_assess_rejects_a_failed_run(workspace):
+    root = workspace({"app.py": ""})
+    messages = TASK + edit("1", "app.py", FIXED) + run("2", "python app.py", exit_code=1)
+
+    assert PreReview(root, verify_script="app.py").assess(messages)[0] == "reject"
+
+
+def test_assess_ignores_runs_that_hide_the_exit_code(workspace):
+    root = workspace({"app.py": ""})
+    messages = TASK + edit("1", "app.py", FIXED) + run("2", "python app.py || true")
+
+    assert PreReview(root, verify_script="app.py").assess(messages)[0] == "reject"
+
+
+def test_assess_rejects_dangerous_commands(workspace):
+    root = workspace({"app.py": ""})
+    messages = TASK + run("1", "rm -rf /") + edit("2", "app.py", FIXED) + run("3", "python app.py")
+
+    verdict, reasons = PreReview(root, verify_script="app.py").assess(messages)
+
+    assert verdict == "reject"
+    assert any("recursive delete" in r for r in reasons)
+
+
+def test_assess_is_undecided_without_a_verify_script(workspace):
+    root = workspace({"app.py": ""})
+    messages = TASK + edit("1", "app.py", FIXED) + run("2", "python app.py")
+
+    verdict, reasons = PreReview(root).assess(messages)
+
+    assert verdict == "undecided"
+    assert any("no verify script" in r for r in reasons)
+
+
+def test_assess_flags_only_findings_the_edit_introduced(workspace):
+    root = workspace({"app.py": "import requests\n\ndef fetch():\n    return requests.get('http://x')\n"})
+    for args in (["init", "-q"], ["add", "."], ["-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init"]):
+        subprocess.run(["git", *args], cwd=root, check=True)
+    kept = "import requests\n\ndef fetch():\n    return requests.get('http://x', timeout=5)\n"
+    added = kept + "\nimport os\nos.system('ls')\n"
+
+    # The edits land on disk too, so the workspace differs from HEAD
+    workspace({"app.py": kept})
+    assert PreReview(root, verify_script="app.py").assess(TASK + edit("1", "app.py", kept) + run("2", "python app.py"))[0] == "approve"
+
+    workspace({"app.py": added})
+    verdict, reasons = PreReview(root, verify_script="app.py").assess(TASK + edit("1", "app.py", added) + run("2", "python app.py"))
+    assert verdict == "reject"
+    assert any("os.system" in r for r in reasons)
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+import repo_mapper
+from repo_mapper import RepoMapper
+
+FILES = {
+    "app.py": "def main(argv):\n    pass\n",
+    "pkg/__init__.py": "",
+    "pkg/util.py": "class Helper:\n    def run(self):\n        pass\n",
+}
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """The files parse_file is called on, in order."""
+    calls = []
+    parse_file = repo_mapper.parse_file
+
+    def counting(full_path):
+        calls.append(os.path.basename(full_path))
+        return parse_file(full_path)
+
+    monkeypatch.setattr(repo_mapper, "parse_file", counting)
+    return calls
+
+
+@pytest.fixture
+def mapper_for(tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp("cache"))
+    return lambda root: RepoMapper(root, cache_dir=cache_dir)
+
+
+def test_map_lists_signatures(workspace, mapper_for):
+    repo_map = mapper_for(workspace(FILES)).generate_map()
+
+    assert repo_map["app.py"]["functions"] == ["main(argv)"]
+    assert repo_map[os.path.join("pkg", "util.py")]["classes"] == [{"name": "Helper", "methods": ["run"]}]
+
+
+def test_cache_skips_unchanged_files(workspace, mapper_for, parsed):
+    root = workspace(FILES)
+    first = mapper_for(root).generate_map()
+    parsed.clear()
+
+    # A new mapper (a new process) reads the cache from disk
+    assert mapper_for(root).generate_map() == first
+    assert parsed == []
+
+
+def test_cache_reparses_changed_files(workspace, mapper_for, parsed):
+    root = workspace(FILES)
+    mapper_for(root).generate_map()
+    parsed.clear()
+
+    workspace({"app.py": "def main(argv, env):\n    pass\n"})
+    repo_map = mapper_for(root).generate_map()
+
+    assert parsed == ["app.py"]
+    assert repo_map["app.py"]["functions"] == ["main(argv, env)"]
+
+
+def test_cache_does_not_reparse_touched_files(workspace, mapper_for, parsed):
+    root = workspace(FILES)
+    mapper_for(root).generate_map()
+    parsed.clear()
+
+    path = os.path.join(root, "app.py")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    mapper_for(root).generate_map()
+
+    assert parsed == []
+
+
+def test_cache_drops_deleted_files(workspace, mapper_for):
+    root = workspace(FILES)
+    mapper_for(root).generate_map()
+
+    os.remove(os.path.join(root, "app.py"))
+
+    assert "app.py" not in mapper_for(root).generate_map()
+
+
+def test_cache_of_another_version_is_ignored(workspace, mapper_for, parsed):
+    root = workspace(FILES)
+    mapper = mapper_for(root)
+    mapper.generate_map()
+    with open(mapper.cache_path) as f:
+        data = json.load(f)
+    data["version"] = RepoMapper.CACHE_VERSION - 1
+    with open(mapper.cache_path, "w") as f:
+        json.dump(data, f)
+    parsed.clear()
+
+    mapper_for(root).generate_map()
+
+    assert sorted(parsed) == ["__init__.py", "app.py", "util.py"]
+
+
+def test_refresh_file_updates_one_entry(workspace, mapper_for):
+    root = workspace(FILES)
+    mapper = mapper_for(root)
+    mapper.generate_map()
+
+    workspace({"app.py": "def other():\n    pass\n"})
+    assert mapper.refresh_file("/app/app.py")["functions"] == ["other()"]
+    assert mapper.get_map()["app.py"]["functions"] == ["other()"]
+
+    os.remove(os.path.join(root, "app.py"))
+    assert mapper.refresh_file("app.py") is None
+    assert "app.py" not in mapper.get_map()
+
+
+def test_cold_start_parses_in_worker_processes(workspace, mapper_for):
+    files = {f"m{i}.py": f"def f{i}(x):\n    return x\n" for i in range(repo_mapper.PARALLEL_THRESHOLD)}
+    repo_map = mapper_for(workspace(files)).generate_map()
+
+    assert len(repo_map) == repo_mapper.PARALLEL_THRESHOLD
+    assert repo_map["m7.py"]["functions"] == ["f7(x)"]
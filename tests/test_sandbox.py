@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from sandbox import BoundedOutput, Sandbox
+
+
+def test_bounded_output_keeps_everything_under_the_limit():
+    output = BoundedOutput(head_size=10, tail_size=10)
+    output.write(b"hello ")
+    output.write(b"world")
+
+    assert output.getvalue() == "hello world"
+    assert output.dropped == 0
+
+
+def test_bounded_output_keeps_head_and_tail():
+    output = BoundedOutput(head_size=4, tail_size=4)
+    for chunk in (b"HEAD", b"middle" * 100, b"TAIL"):
+        output.write(chunk)
+
+    assert output.dropped == 600
+    assert output.getvalue() == "HEAD\n[... 600 bytes truncated ...]\nTAIL"
+
+
+def test_bounded_output_splits_a_chunk_across_head_and_tail():
+    output = BoundedOutput(head_size=3, tail_size=3)
+    output.write(b"abcdefghij")
+
+    assert bytes(output.head) == b"abc"
+    assert bytes(output.tail) == b"hij"
+    assert output.dropped == 4
+
+
+def test_bounded_output_ignores_empty_chunks():
+    output = BoundedOutput(head_size=2, tail_size=2)
+    output.write(b"")
+    output.write(None)
+
+    assert output.getvalue() == ""
+
+
+def test_bounded_output_survives_a_cut_multibyte_character():
+    output = BoundedOutput(head_size=1, tail_size=1)
+    output.write("é".encode("utf-8") * 3)
+
+    assert output.dropped == 4
+    assert "�" in output.getvalue()
+
+
+class HangingExec:
+    """A docker API whose exec stream stays open and silent until the container is killed."""
+
+    def __init__(self):
+        self.killed = threading.Event()
+
+    def exec_create(self, container_id, command, workdir=None):
+        return {"Id": "exec"}
+
+    def exec_start(self, exec_id, stream=False, demux=False):
+        yield b"started\n", None
+        self.killed.wait(10)
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": 137 if self.killed.is_set() else None}
+
+
+class FakePool:
+    def __init__(self, api):
+        self.lease = SimpleNamespace(container=SimpleNamespace(id="c1", kill=api.killed.set), dirty=False)
+
+    @contextmanager
+    def acquire(self):
+        yield self.lease
+
+
+def test_exec_watchdog_kills_a_stream_that_never_closes(monkeypatch):
+    api = HangingExec()
+    pool = FakePool(api)
+    monkeypatch.setattr(Sandbox, "pool", property(lambda self: pool))
+    sandbox = Sandbox.__new__(Sandbox)
+    sandbox.client = SimpleNamespace(api=api)
+    sandbox.STREAM_GRACE = 0
+
+    started = time.time()
+    result = sandbox._exec("sleep 100 & python app.py", timeout=1)
+
+    assert time.time() - started < 5
+    assert result.timed_out
+    assert result.stdout == "started\n"
+    assert pool.lease.dirty
+
+
+@pytest.fixture
+def sandbox(workspace):
+    # File tools read and write the bind mount directly; no Docker needed
+    box = Sandbox.__new__(Sandbox)
+    box.workspace_path = workspace({"app.py": "".join(f"line {i}\n" for i in range(1, 11))})
+    return box
+
+
+@pytest.mark.parametrize("path", ["../outside.py", "/app/../../etc/passwd", "/etc/passwd"])
+def test_resolve_rejects_paths_outside_the_workspace(sandbox, path):
+    with pytest.raises(ValueError):
+        sandbox._resolve(path)
+    assert sandbox.read_file(path).startswith("❌ Read failed: Path escapes the workspace")
+    assert sandbox.edit_file(path, "x").startswith("❌ Edit failed")
+
+
+def test_resolve_rejects_symlinks_out_of_the_workspace(sandbox, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("host") / "secret.txt"
+    outside.write_text("secret")
+    os.symlink(outside, os.path.join(sandbox.workspace_path, "link.txt"))
+
+    assert sandbox.read_file("link.txt").startswith("❌ Read failed")
+
+
+def test_read_file_by_lines(sandbox):
+    assert sandbox.read_file("/app/app.py") == "".join(f"line {i}\n" for i in range(1, 11))
+    assert sandbox.read_file("app.py", start_line=3, end_line=4) == "line 3\nline 4\n"
+    assert sandbox.read_file("app.py", start_line=10) == "line 10\n"
+
+
+def test_read_file_by_bytes(sandbox):
+    assert sandbox.read_file("app.py", offset=7, length=7) == "line 2\n\n[bytes 7-14 of 71]"
+
+
+def test_read_file_caps_output(sandbox, monkeypatch):
+    monkeypatch.setattr(Sandbox, "MAX_READ_BYTES", 20)
+
+    text = sandbox.read_file("app.py")
+
+    assert text.startswith("line 1\nline 2\n")
+    assert "[... truncated at line 2; file is 71 bytes" in text
+
+
+def test_read_file_returns_the_head_of_an_oversized_line(sandbox, monkeypatch):
+    monkeypatch.setattr(Sandbox, "MAX_READ_BYTES", 10)
+    sandbox.edit_file("min.js", "x" * 50 + "\n")
+
+    text = sandbox.read_file("min.js")
+
+    assert text.startswith("x" * 10 + "\n[... line 1 truncated after 10 characters")
+
+
+def test_edit_file_writes_atomically(sandbox):
+    os.chmod(os.path.join(sandbox.workspace_path, "app.py"), 0o755)
+
+    assert sandbox.edit_file("/app/app.py", "print('fixed')\n") == "✅ Wrote 15 bytes to /app/app.py"
+    assert sandbox.edit_file("pkg/new.py", "x = 1\n").startswith("✅")
+
+    assert sandbox.read_file("app.py") == "print('fixed')\n"
+    assert sandbox.read_file("pkg/new.py") == "x = 1\n"
+    assert os.stat(os.path.join(sandbox.workspace_path, "app.py")).st_mode & 0o777 == 0o755
+    assert not [f for f in os.listdir(sandbox.workspace_path) if f.startswith(".resurrector-")]
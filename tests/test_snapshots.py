@@ -0,0 +1,155 @@
+import os
+import subprocess
+
+import pytest
+
+from snapshots import SnapshotError, WorkspaceSnapshots
+
+FILES = {"app.py": "print(1 / 0)\n", "pkg/util.py": "X = 1\n", ".gitignore": "*.log\n"}
+
+
+@pytest.fixture
+def snapshots_for(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("snapshots"))
+    return lambda workspace_path: WorkspaceSnapshots(workspace_path, root=root)
+
+
+def read(root, rel_path):
+    with open(os.path.join(root, rel_path)) as f:
+        return f.read()
+
+
+def test_snapshot_id_depends_only_on_the_files(workspace, snapshots_for):
+    root = workspace(FILES)
+    snapshots = snapshots_for(root)
+
+    first = snapshots.snapshot()
+    assert snapshots.snapshot() == first
+
+    workspace({"app.py": "print(1)\n"})
+    assert snapshots.snapshot() != first
+
+
+def test_snapshot_leaves_out_ignored_and_cache_files(workspace, snapshots_for):
+    root = workspace(FILES)
+    snapshots = snapshots_for(root)
+    clean = snapshots.snapshot()
+
+    workspace({"run.log": "noise", "__pycache__/app.cpython-312.pyc": "x"})
+
+    assert snapshots.snapshot() == clean
+
+
+def test_restore_puts_the_files_back(workspace, snapshots_for):
+    root = workspace(FILES)
+    snapshots = snapshots_for(root)
+    original = snapshots.snapshot()
+
+    workspace({"app.py": "print(1)\n", "new.py": "Y = 2\n", "run.log": "keep me"})
+    os.remove(os.path.join(root, "pkg", "util.py"))
+    edited = snapshots.snapshot()
+
+    snapshots.restore(original)
+
+    assert read(root, "app.py") == FILES["app.py"]
+    assert read(root, "pkg/util.py") == FILES["pkg/util.py"]
+    assert not os.path.exists(os.path.join(root, "new.py"))
+    # Ignored files are not the snapshot's to delete
+    assert read(root, "run.log") == "keep me"
+
+    snapshots.restore(edited)
+    assert read(root, "app.py") == "print(1)\n"
+    assert not os.path.exists(os.path.join(root, "pkg", "util.py"))
+
+
+def test_changed_files_between_snapshots(workspace, snapshots_for):
+    root = workspace(FILES)
+    snapshots = snapshots_for(root)
+    before = snapshots.snapshot()
+
+    workspace({"app.py": "print(1)\n", "new.py": ""})
+
+    assert sorted(snapshots.changed_files(before, snapshots.snapshot())) == ["app.py", "new.py"]
+
+
+def test_restore_of_an_unknown_snapshot_fails(workspace, snapshots_for):
+    snapshots = snapshots_for(workspace(FILES))
+
+    with pytest.raises(SnapshotError):
+        snapshots.restore("0" * 40)
+    assert not snapshots.exists("0" * 40)
+
+
+def test_snapshots_leave_the_workspace_git_state_alone(workspace, snapshots_for):
+    root = workspace(FILES)
+    snapshots_for(root).snapshot()
+
+    assert not os.path.exists(os.path.join(root, ".git"))
+
+
+def git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *args], cwd=cwd, check=True, capture_output=True)
+
+
+def test_branch_materializes_a_snapshot(workspace, snapshots_for, tmp_path_factory):
+    root = workspace(FILES)
+    snapshots = snapshots_for(root)
+    baseline = snapshots.snapshot()
+    workspace({"app.py": "print('later edit')\n"})
+    dest = str(tmp_path_factory.mktemp("branches") / "c0")
+
+    branch = snapshots.branch(baseline, dest)
+
+    assert read(dest, "app.py") == FILES["app.py"]
+    # The branch reads its parent's objects and can snapshot on its own
+    assert branch.snapshot() == baseline
+    # The parent workspace keeps its own files
+    assert read(root, "app.py") == "print('later edit')\n"
+
+
+def test_branch_of_a_clone_is_a_worktree(workspace, snapshots_for, tmp_path_factory):
+    root = workspace(FILES)
+    git(root, "init", "-q")
+    git(root, "add", ".")
+    git(root, "commit", "-qm", "broken")
+    snapshots = snapshots_for(root)
+    workspace({"app.py": "print(1)\n"})
+    fixed = snapshots.snapshot()
+    dest = str(tmp_path_factory.mktemp("branches") / "c0")
+
+    branch = snapshots.branch(fixed, dest)
+
+    assert os.path.isfile(os.path.join(dest, ".git"))
+    status = subprocess.run(["git", "status", "--short"], cwd=dest, capture_output=True, text=True).stdout
+    assert status.split() == ["M", "app.py"]
+
+    branch.discard()
+    assert not os.path.exists(dest)
+    worktrees = subprocess.run(["git", "worktree", "list"], cwd=root, capture_output=True, text=True).stdout
+    assert dest not in worktrees
+
+
+def test_branch_target_must_be_empty(workspace, snapshots_for, tmp_path_factory):
+    snapshots = snapshots_for(workspace(FILES))
+    dest = tmp_path_factory.mktemp("branches")
+    (dest / "x").write_text("")
+
+    with pytest.raises(SnapshotError):
+        snapshots.branch(snapshots.snapshot(), str(dest))
+
+
+def test_adopt_brings_a_branch_snapshot_back(workspace, snapshots_for, tmp_path_factory):
+    root = workspace(FILES)
+    snapshots = snapshots_for(root)
+    dest = str(tmp_path_factory.mktemp("branches") / "c0")
+    branch = snapshots.branch(snapshots.snapshot(), dest)
+    with open(os.path.join(dest, "app.py"), "w") as f:
+        f.write("print('fixed')\n")
+    fixed = branch.snapshot()
+
+    assert not snapshots.exists(fixed)
+    snapshots.adopt(branch, fixed)
+    branch.discard()
+    snapshots.restore(fixed)
+
+    assert read(root, "app.py") == "print('fixed')\n"
@@ -0,0 +1,54 @@
+import os
+import time
+
+# "none", "file" (OTel spans as JSONL under logs/) or "phoenix" (local Phoenix app)
+TRACING_ENV = "RESURRECTOR_TRACING"
+PHOENIX_ENDPOINT = "http://localhost:6006/v1/traces"
+
+
+def _file_tracer(log_dir="logs"):
+    """Exports LangChain/LangGraph spans as one JSON object per line, without a trace server."""
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from openinference.instrumentation.langchain import LangChainInstrumentor
+
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, f"traces_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+    exporter = ConsoleSpanExporter(out=open(path, "a"), formatter=lambda span: span.to_json(indent=None) + "\n")
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    LangChainInstrumentor().instrument(tracer_provider=provider)
+    print(f"🕵️  Traces written to: {path}")
+    return provider
+
+
+def _phoenix_tracer():
+    import phoenix as px
+    from phoenix.otel import register
+
+    # 1. Launch Dashboard
+    session = px.launch_app()
+
+    # 2. Connect Pipe
+    register(
+        project_name="default",
+        endpoint=PHOENIX_ENDPOINT,
+        auto_instrument=True
+    )
+    print(f"🕵️  Trace Server Live at: {session.url}")
+    return session
+
+
+def setup_tracing(mode=None):
+    """
+    Turns on tracing for the process. `mode` defaults to RESURRECTOR_TRACING
+    ("none" if unset). Returns the Phoenix session, the tracer provider, or None.
+    """
+    mode = (mode or os.getenv(TRACING_ENV) or "none").lower()
+    if mode == "none":
+        return None
+    if mode == "file":
+        return _file_tracer()
+    if mode == "phoenix":
+        return _phoenix_tracer()
+    raise ValueError(f"Unknown tracing mode '{mode}' (expected none, file or phoenix)")